@@ -0,0 +1,9 @@
+"""
+Benchmarks for shutter.
+
+Run all of them against the simulated camera with
+
+    python -m benchmarks
+
+or one at a time, ie. python -m benchmarks.bench_capture
+"""
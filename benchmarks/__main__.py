@@ -0,0 +1,16 @@
+import gc
+
+from benchmarks import bench_binding
+from benchmarks import bench_capture
+from benchmarks import bench_instrument
+from benchmarks import bench_memory
+from benchmarks import bench_preview
+
+for module in (bench_binding, bench_capture, bench_preview, bench_memory,
+               bench_instrument):
+    print(module.__doc__.strip())
+    module.main()
+    # free the cameras of this run, ie. ones kept in a cycle by their
+    # config, before the next run loads another simulated library
+    gc.collect()
+    print('')
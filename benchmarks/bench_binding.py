@@ -0,0 +1,96 @@
+"""
+Per-call overhead of libgphoto2 calls.
+
+Compares calls through shutter's bound functions with functions looked up
+on the library on every call, as shutter used to.  Against the simulated
+library this measures the Python side of a call: the gp proxy and the
+lookups.  Given a libgphoto2 to load, it also compares the prototyped
+functions with untyped CDLL calls whose restype is reassigned before use.
+
+    python -m benchmarks.bench_binding [path/to/libgphoto2.so]
+"""
+import ctypes
+import sys
+import timeit
+
+from benchmarks.common import simulated
+from shutter import shutter as core
+
+PTR = ctypes.pointer
+NUMBER = 100000
+ENTRIES = 100
+
+
+def report(label, seconds, number):
+    print('%-44s %10.0f ns/call' % (label, seconds / number * 1e9))
+
+
+def main(path=None):
+    if path is None:
+        raw = simulated()
+    else:
+        core.load(path)
+        raw = ctypes.CDLL(path)
+    gp = core.gp
+
+    cl = core.CameraList()
+    for i in range(ENTRIES):
+        cl.append('camera %d' % i, 'usb:001,%03d' % i)
+    ptr = cl.pointer
+    name = ctypes.c_char_p()
+    pname = PTR(name)
+
+    def lookup_get_name():
+        raw.gp_list_get_name(ptr, 7, PTR(name))
+
+    def proxy_get_name():
+        gp.gp_list_get_name(ptr, 7, pname)
+
+    get_name = gp.gp_list_get_name
+
+    def bound_get_name():
+        get_name(ptr, 7, pname)
+
+    def untyped_result_as_string():
+        raw.gp_result_as_string.restype = ctypes.c_char_p
+        raw.gp_result_as_string(-6)
+
+    result_as_string = gp.gp_result_as_string
+
+    def typed_result_as_string():
+        result_as_string(-6)
+
+    def old_as_list():
+        count = raw.gp_list_count(ptr)
+        for i in range(count):
+            value = ctypes.c_char_p()
+            raw.gp_list_get_name(ptr, i, PTR(value))
+            str(value.value, encoding='ascii')
+            value = ctypes.c_char_p()
+            raw.gp_list_get_value(ptr, i, PTR(value))
+            str(value.value, encoding='ascii')
+
+    benches = [
+        ('gp_list_get_name, looked up per call', lookup_get_name, NUMBER),
+        ('gp_list_get_name, through gp', proxy_get_name, NUMBER),
+        ('gp_list_get_name, bound', bound_get_name, NUMBER),
+    ]
+    if path is not None:
+        benches += [
+            ('gp_result_as_string, untyped', untyped_result_as_string,
+             NUMBER),
+            ('gp_result_as_string, prototyped', typed_result_as_string,
+             NUMBER),
+        ]
+    benches += [
+        ('as_list of %d, looked up per call' % ENTRIES, old_as_list,
+         NUMBER // 100),
+        ('as_list of %d, CameraList' % ENTRIES, cl.as_list, NUMBER // 100),
+    ]
+    for label, func, number in benches:
+        report(label, min(timeit.repeat(func, number=number, repeat=3)),
+               number)
+
+
+if __name__ == '__main__':
+    main(*sys.argv[1:])
@@ -0,0 +1,53 @@
+"""
+Capture and download throughput against the simulated camera.
+"""
+import tempfile
+
+import shutter
+from benchmarks.common import MB
+from benchmarks.common import report
+from benchmarks.common import simulated
+from benchmarks.common import timed
+
+IMAGE_SIZE = 24 * MB
+NUMBER = 20
+
+
+def main():
+    sim = simulated(image_size=IMAGE_SIZE)
+    camera = shutter.Camera()
+
+    seconds = timed(camera.capture_image, NUMBER)
+    report('capture_image, bytes', NUMBER / seconds, 'frames/s')
+
+    seconds = timed(lambda: camera.capture_image(return_buffer=True), NUMBER)
+    report('capture_image, buffer', NUMBER / seconds, 'frames/s')
+
+    folder, name = '/store_00010001/DCIM/100SIMUL', 'IMG_0001.JPG'
+    with tempfile.TemporaryFile() as fp:
+        def download():
+            fp.seek(0)
+            camera.download_to(folder, name, fp)
+        seconds = timed(download, NUMBER)
+    report('download_to, file', NUMBER * IMAGE_SIZE / MB / seconds, 'MB/s')
+
+    def download():
+        camera.download(folder, name).get_buffer()
+    seconds = timed(download, NUMBER)
+    report('download, buffer', NUMBER * IMAGE_SIZE / MB / seconds, 'MB/s')
+
+    seconds = timed(lambda: list(camera.burst(5)), NUMBER // 5)
+    report('burst', NUMBER / seconds, 'frames/s')
+
+    # a body that takes 50 ms to write each image to its card
+    sim.cameras[0].card_write_time = 0.05
+    seconds = timed(camera.capture_image, NUMBER)
+    report('capture_image, card 50 ms', NUMBER / seconds, 'frames/s')
+
+    camera.capture_to_ram = True
+    seconds = timed(camera.capture_image, NUMBER)
+    report('capture_image, RAM', NUMBER / seconds, 'frames/s')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,38 @@
+"""
+Cost of instrumentation on small calls, off and on.
+"""
+import shutter
+from benchmarks.common import report
+from benchmarks.common import simulated
+from benchmarks.common import timed
+from shutter import instrument
+
+NUMBER = 2000
+
+
+def main():
+    simulated(preview_size=4096)
+    camera = shutter.Camera()
+    camfile = shutter.CameraFile()
+
+    def preview():
+        camera.capture_preview(camfile=camfile, return_buffer=True)
+
+    seconds = timed(preview, NUMBER)
+    report('capture_preview, instrumentation off', NUMBER / seconds,
+           'frames/s')
+
+    instrument.enable()
+    try:
+        seconds = timed(preview, NUMBER)
+    finally:
+        instrument.disable()
+    report('capture_preview, instrumentation on', NUMBER / seconds,
+           'frames/s')
+
+    stats = instrument.snapshot()['functions']['gp_camera_capture_preview']
+    report('gp_camera_capture_preview p99', stats['p99'] * 1e6, 'us')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,51 @@
+"""
+Python memory allocated per captured frame, measured with tracemalloc.
+"""
+import tracemalloc
+
+import shutter
+from benchmarks.common import MB
+from benchmarks.common import report
+from benchmarks.common import simulated
+
+IMAGE_SIZE = 16 * MB
+NUMBER = 5
+
+
+def measure(func):
+    """ Return peak bytes allocated by one call of func, averaged
+    """
+    total = 0
+    for i in range(NUMBER):
+        tracemalloc.start()
+        result = func()
+        del result
+        total += tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return total / NUMBER
+
+
+def main():
+    sim = simulated(image_size=IMAGE_SIZE)
+    camera = shutter.Camera()
+
+    # the simulated card and transfer allocate too; subtract their share
+    baseline = measure(lambda: sim.cameras[0].read(
+        *sim.cameras[0].capture(), type=shutter.shutter.GP_FILE_TYPE_NORMAL))
+
+    peak = measure(camera.capture_image)
+    report('capture_image, bytes', (peak - baseline) / MB, 'MB/frame')
+
+    peak = measure(lambda: camera.capture_image(return_buffer=True))
+    report('capture_image, buffer', (peak - baseline) / MB, 'MB/frame')
+
+    # a tethering daemon polling status; the first call allocates the
+    # camera's scratch structures
+    camera.summary
+    peak = measure(lambda: (camera.summary, camera.abilities,
+                            camera.list_folders('/')))
+    report('summary + abilities + list_folders', peak / 1024, 'KB/poll')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,37 @@
+"""
+Live view frame rate against the simulated camera.
+"""
+import shutter
+from benchmarks.common import report
+from benchmarks.common import simulated
+from benchmarks.common import timed
+
+PREVIEW_SIZE = 200 * 1024
+NUMBER = 500
+
+# seconds the simulated camera takes to produce a frame
+FRAME_TIME = 0.002
+
+
+def main():
+    simulated(preview_size=PREVIEW_SIZE,
+              latency={'gp_camera_capture_preview': FRAME_TIME})
+    camera = shutter.Camera()
+
+    seconds = timed(camera.capture_preview, NUMBER)
+    report('capture_preview, bytes', NUMBER / seconds, 'fps')
+
+    live = shutter.LiveView(camera, threaded=False)
+    with live:
+        seconds = timed(live.get, NUMBER)
+    report('LiveView, unthreaded', NUMBER / seconds, 'fps')
+
+    live = shutter.LiveView(camera, threaded=True, buffer_size=2)
+    with live:
+        seconds = timed(live.get, NUMBER)
+    report('LiveView, threaded', NUMBER / seconds, 'fps')
+    report('LiveView, threaded, dropped', live.dropped, 'frames')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,36 @@
+"""
+Helpers shared by the benchmarks.
+"""
+import time
+
+import shutter
+from shutter.simulator import SimulatedCamera
+from shutter.simulator import SimulatedLibrary
+
+MB = 1024 * 1024
+
+
+def simulated(count=1, latency=None, transfer_rate=None, **kwargs):
+    """ Load a simulated library with count cameras and return it
+
+    Keyword arguments are passed on to each SimulatedCamera.
+    """
+    cameras = [SimulatedCamera('Simulated Camera %d' % i, **kwargs)
+               for i in range(count)]
+    sim = SimulatedLibrary(cameras, latency=latency,
+                           transfer_rate=transfer_rate)
+    shutter.load(backend=sim)
+    return sim
+
+
+def timed(func, number):
+    """ Call func number times; return seconds taken
+    """
+    start = time.perf_counter()
+    for i in range(number):
+        func()
+    return time.perf_counter() - start
+
+
+def report(label, value, unit):
+    print('%-44s %10.2f %s' % (label, value, unit))
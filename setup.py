@@ -11,7 +11,8 @@ setup(name='shutter',
       author_email='leif.theden@gmail.com',
       keywords=['gphoto', 'libgphoto2', 'capture', 'shutter'],
       packages=['shutter'],
-      requires=['six'],
+      python_requires='>=3.8',
+      extras_require={'numpy': ['numpy', 'simplejpeg']},
       license='GPLv3',
       long_description='https://github.com/bitcraft/shutter',
       classifiers=[
@@ -19,7 +20,8 @@ setup(name='shutter',
           'Development Status :: 3 - Alpha',
           'License :: OSI Approved :: GNU Lesser General Public License v3 (GPLv3)',
           'Topic :: Multimedia :: Graphics :: Capture :: Digital Camera',
-          'Programming Language :: Python :: 2.7',
-          'Programming Language :: Python :: 3.4',
+          'Programming Language :: Python :: 3',
+          'Programming Language :: Python :: 3 :: Only',
+          'Programming Language :: Python :: 3.8',
       ],
 )
@@ -1,5 +1,13 @@
 __version__ = '0.0.8'
 
 from .shutter import Camera
+from .shutter import CameraConfig
 from .shutter import CameraFile
 from .shutter import ShutterError
+from .shutter import load
+from .discovery import discover
+from .group import CameraGroup
+from .intervalometer import Intervalometer
+from .liveview import LiveView
+from .pool import CameraPool
+from .worker import CameraWorker
@@ -0,0 +1,133 @@
+"""
+asyncio interface to shutter.
+
+Each AsyncCamera hands its work to a CameraWorker, so one event loop can
+drive many cameras while the blocking libgphoto2 calls run on the workers'
+threads.
+
+    camera = await AsyncCamera.open(re.compile('canon'))
+    async with camera:
+        data = await asyncio.wait_for(camera.capture_image(), 10)
+        async for event in camera.events():
+            ...
+
+Cancelling an awaited call removes it from the worker's queue if it hasn't
+started yet.  Cancelling the task does not stop a call that is already
+running in libgphoto2: it keeps the camera until it completes on the
+worker, and its result is discarded.  Timeouts are applied with
+asyncio.wait_for and behave the same way.
+
+To stop a running transfer too, make the calls under an Operation with a
+CancelToken (see shutter.operation), and cancel the token along with the
+task; libgphoto2 then ends the call with GP_ERROR_CANCEL:
+
+    token = CancelToken()
+
+    def fetch(cam):
+        with cam.operation(token=token):
+            return cam.download(folder, name)
+
+    try:
+        cfile = await asyncio.wait_for(camera.run(fetch), 30)
+    except asyncio.TimeoutError:
+        token.cancel()
+"""
+import asyncio
+
+from .shutter import Camera
+from .shutter import GP_EVENT_TIMEOUT
+from .worker import CameraWorker
+
+__all__ = ['AsyncCamera']
+
+
+class AsyncCamera(object):
+    """ Awaitable wrapper around a CameraWorker
+
+    Use AsyncCamera.open to create one without blocking the event loop.
+    """
+
+    def __init__(self, worker):
+        self._worker = worker
+
+    @classmethod
+    async def open(cls, regex=None, maxsize=0):
+        """ Open a camera on a new worker thread
+
+        :rtype: AsyncCamera
+        """
+        loop = asyncio.get_running_loop()
+        worker = await loop.run_in_executor(
+            None, lambda: CameraWorker(regex, maxsize))
+        return cls(worker)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.close()
+
+    @property
+    def worker(self):
+        """
+        :rtype: CameraWorker
+        """
+        return self._worker
+
+    def run(self, func, *args, **kwargs):
+        """ Run func(camera, *args, **kwargs) on the worker
+
+        :rtype: asyncio.Future
+        """
+        return asyncio.wrap_future(self._worker.submit(func, *args, **kwargs))
+
+    async def capture_image(self, destpath=None, return_buffer=False):
+        """ See Camera.capture_image
+        """
+        return await self.run(Camera.capture_image, destpath, return_buffer)
+
+    async def capture_preview(self, destpath=None):
+        """ See Camera.capture_preview
+        """
+        return await self.run(Camera.capture_preview, destpath)
+
+    async def download(self, srcfolder, srcfilename):
+        """ See Camera.download
+
+        :rtype: CameraFile
+        """
+        return await self.run(Camera.download, srcfolder, srcfilename)
+
+    async def download_to(self, srcfolder, srcfilename, dest, **kwargs):
+        """ See Camera.download_to
+
+        A progress callback runs on the worker thread, not the event loop.
+        """
+        return await self.run(Camera.download_to, srcfolder, srcfilename,
+                              dest, **kwargs)
+
+    async def wait_for_event(self, timeout=1000):
+        """ See Camera.wait_for_event
+        """
+        return await self.run(Camera.wait_for_event, timeout)
+
+    async def events(self, timeout=1000):
+        """ Yield camera events as they arrive
+
+        Kwargs:
+            timeout (int): milliseconds for each poll of the camera.  Other
+                calls queued on this camera run between polls.
+
+        Timeouts are not yielded.  The stream ends when the caller stops
+        iterating or the task is cancelled.
+        """
+        while True:
+            event = await self.wait_for_event(timeout)
+            if event.type != GP_EVENT_TIMEOUT:
+                yield event
+
+    async def close(self):
+        """ Finish queued calls and close the camera
+        """
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, self._worker.close)
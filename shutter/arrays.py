@@ -0,0 +1,211 @@
+"""
+Decode JPEG frames straight into NumPy arrays.
+
+Going from a preview to an array through bytes and PIL copies every frame
+three times.  decode() reads the JPEG from the CameraFile's own memory and
+writes the pixels into an array you provide, or one taken from an
+ArrayPool, so a live view loop allocates nothing once it is running:
+
+    pool = ArrayPool()
+    camfile = CameraFile()
+    while True:
+        frame = camera.capture_preview(camfile=camfile, as_array=True,
+                                       pool=pool)
+        analyse(frame)
+        pool.release(frame)
+
+NumPy is required.  JPEGs are decoded with simplejpeg when it is installed,
+which decodes in place and releases the GIL, so decode_batch() runs on
+several cores.  Otherwise PIL is used, at the cost of a copy per frame.
+"""
+import collections
+import io
+import threading
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+try:
+    import simplejpeg
+except ImportError:
+    simplejpeg = None
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+__all__ = ['ArrayPool', 'decode', 'decode_batch', 'jpeg_shape']
+
+# channels for each colorspace decode() supports
+CHANNELS = {
+    'RGB': 3,
+    'BGR': 3,
+    'GRAY': 1,
+}
+
+
+def _require():
+    if numpy is None:
+        raise ImportError('numpy is required to decode frames into arrays')
+    if simplejpeg is None and Image is None:
+        raise ImportError('simplejpeg or PIL is required to decode JPEGs')
+
+
+class ArrayPool(object):
+    """ Arrays kept for reuse, so decoding doesn't allocate
+
+    Kwargs:
+        max_arrays (int): arrays kept of each shape; more are dropped
+
+    Safe to share between threads.
+    """
+
+    def __init__(self, max_arrays=4):
+        self.max_arrays = max_arrays
+        self._free = collections.defaultdict(list)
+        self._lock = threading.Lock()
+
+    def get(self, shape, dtype='uint8'):
+        """ Return an array of shape, reused if one was released
+
+        Its contents are undefined.
+
+        :rtype: numpy.ndarray
+        """
+        key = tuple(shape), numpy.dtype(dtype).str
+        with self._lock:
+            free = self._free.get(key)
+            if free:
+                return free.pop()
+        return numpy.empty(shape, dtype)
+
+    def release(self, array):
+        """ Give an array back for reuse
+
+        Don't use the array afterwards.
+        """
+        key = array.shape, array.dtype.str
+        with self._lock:
+            free = self._free[key]
+            if len(free) < self.max_arrays:
+                free.append(array)
+
+
+def jpeg_shape(data, colorspace='RGB'):
+    """ Shape of the array a JPEG decodes to, read from its header
+
+    :rtype: tuple
+    """
+    _require()
+    if simplejpeg is not None:
+        height, width = simplejpeg.decode_jpeg_header(data)[:2]
+    else:
+        width, height = Image.open(io.BytesIO(data)).size
+    return height, width, CHANNELS[colorspace]
+
+
+def _output(shape, out, pool):
+    if out is None:
+        if pool is not None:
+            return pool.get(shape)
+        return numpy.empty(shape, numpy.uint8)
+    if out.shape != shape or out.dtype != numpy.uint8:
+        raise ValueError('out has shape %s, frame needs %s of uint8' % (
+            out.shape, shape))
+    return out
+
+
+def _decode_into(data, out, colorspace):
+    if simplejpeg is not None:
+        simplejpeg.decode_jpeg(data, colorspace=colorspace, buffer=out)
+        return
+    image = Image.open(io.BytesIO(data))
+    if colorspace == 'GRAY':
+        image = image.convert('L')
+        out[:, :, 0] = numpy.asarray(image)
+        return
+    image = image.convert('RGB')
+    if colorspace == 'BGR':
+        out[...] = numpy.asarray(image)[:, :, ::-1]
+    else:
+        out[...] = numpy.asarray(image)
+
+
+def decode(data, out=None, pool=None, colorspace='RGB'):
+    """ Decode a JPEG into an array of shape (height, width, channels)
+
+    Args:
+        data: the JPEG; bytes, or a memoryview such as the one from
+            CameraFile.get_buffer
+
+    Kwargs:
+        out (numpy.ndarray): array of uint8 to decode into; it must have
+            the frame's shape
+        pool (ArrayPool): take the array from here when out isn't given
+        colorspace (str): 'RGB', 'BGR' or 'GRAY'
+
+    Returns:
+        array (numpy.ndarray)
+
+    Raises:
+        ImportError: if numpy, or both simplejpeg and PIL, are missing
+        ValueError: if out has the wrong shape
+    """
+    _require()
+    out = _output(jpeg_shape(data, colorspace), out, pool)
+    _decode_into(data, out, colorspace)
+    return out
+
+
+def _buffer(frame):
+    if hasattr(frame, 'get_buffer'):
+        return frame.get_buffer()
+    return getattr(frame, 'data', frame)
+
+
+def decode_batch(frames, out=None, pool=None, colorspace='RGB',
+                 executor=None):
+    """ Decode JPEGs of the same size into one array
+
+    Args:
+        frames (list): JPEGs, as for decode(); CameraFile objects and
+            LiveView frames are decoded from their buffers
+
+    Kwargs:
+        out (numpy.ndarray): array of shape (len(frames), height, width,
+            channels) to decode into
+        pool (ArrayPool): take the array from here when out isn't given
+        colorspace (str): 'RGB', 'BGR' or 'GRAY'
+        executor (concurrent.futures.Executor): decode the frames on it.
+            With simplejpeg the decoding runs in parallel.
+
+    Returns:
+        array (numpy.ndarray)
+
+    Raises:
+        ValueError: if the frames differ in size
+    """
+    _require()
+    frames = [_buffer(frame) for frame in frames]
+    if not frames:
+        raise ValueError('no frames to decode')
+    shape = jpeg_shape(frames[0], colorspace)
+    out = _output((len(frames),) + shape, out, pool)
+
+    def run(i):
+        data = frames[i]
+        if i and jpeg_shape(data, colorspace) != shape:
+            raise ValueError('frame %d is not %dx%d' % (i, shape[1],
+                                                        shape[0]))
+        _decode_into(data, out[i], colorspace)
+
+    if executor is None:
+        for i in range(len(frames)):
+            run(i)
+    else:
+        for future in [executor.submit(run, i) for i in range(len(frames))]:
+            future.result()
+    return out
@@ -0,0 +1,84 @@
+"""
+Size-bounded caches.
+"""
+import collections
+import threading
+
+__all__ = ['LRUCache']
+
+
+class LRUCache(object):
+    """ Least recently used cache, bounded by the total size of its values
+
+    Args:
+        max_size (int): total size the values may take up
+
+    Each value is stored with its size, ie. the length of a bytes object.
+    When an insertion takes the total over max_size, the least recently
+    used values are evicted.  Values larger than max_size are not kept.
+
+    Safe to share between threads.
+    """
+
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self._items = collections.OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._items)
+
+    def __contains__(self, key):
+        return key in self._items
+
+    @property
+    def size(self):
+        """ Total size of the values held
+
+        :rtype: int
+        """
+        return self._size
+
+    def get(self, key, default=None):
+        """ Return the value for key and mark it as recently used
+        """
+        with self._lock:
+            try:
+                value, size = self._items.pop(key)
+            except KeyError:
+                self.misses += 1
+                return default
+            self._items[key] = value, size
+            self.hits += 1
+            return value
+
+    def put(self, key, value, size):
+        """ Store value under key
+        """
+        with self._lock:
+            old = self._items.pop(key, None)
+            if old is not None:
+                self._size -= old[1]
+            if size > self.max_size:
+                return
+            self._items[key] = value, size
+            self._size += size
+            while self._size > self.max_size:
+                evicted, (value, size) = self._items.popitem(last=False)
+                self._size -= size
+
+    def discard(self, key):
+        """ Remove key if present
+        """
+        with self._lock:
+            old = self._items.pop(key, None)
+            if old is not None:
+                self._size -= old[1]
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+            self._size = 0
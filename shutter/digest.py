@@ -0,0 +1,190 @@
+"""
+Hash files while they are downloaded, and remember what was downloaded.
+
+Hashing a file after saving it reads it back from disk.  Camera.download,
+download_to and capture_image take digests=('sha256',) instead, and hash
+the data as it arrives: over the CameraFile's own memory, or chunk by chunk
+as download_to streams it.  They then return (result, digests), where
+digests maps each algorithm to its hex digest.
+
+A DigestIndex remembers the digests of downloaded files, by folder, name,
+size and modification time on the camera.  Passed as index=, files it
+already knows are not transferred again, so a card offloaded twice only
+costs a file listing:
+
+    with DigestIndex('offload.db') as index:
+        for name, value in camera.list_files(folder):
+            cfile, digests = camera.download(folder, name, index=index)
+            if cfile is not None:       # None if downloaded before
+                cfile.save(os.path.join(dest, digests['sha256']))
+"""
+import hashlib
+import sqlite3
+import threading
+
+from .shutter import GP_FILE_INFO_MTIME
+from .shutter import GP_FILE_INFO_SIZE
+
+__all__ = ['DEFAULT_ALGORITHMS', 'DigestIndex', 'Hasher', 'algorithms',
+           'file_key']
+
+DEFAULT_ALGORITHMS = ('sha256',)
+
+
+def algorithms(digests=None):
+    """ Algorithm names from a digests argument
+
+    Args:
+        digests: name, sequence of names, or None for DEFAULT_ALGORITHMS
+
+    :rtype: tuple
+    """
+    if digests is None:
+        return DEFAULT_ALGORITHMS
+    if isinstance(digests, str):
+        return (digests,)
+    return tuple(digests)
+
+
+class Hasher(object):
+    """ Several hashlib digests fed the same data
+
+    Kwargs:
+        digests: name, or sequence of names, known to hashlib.new
+
+    Raises:
+        ValueError: if an algorithm is unknown
+    """
+
+    def __init__(self, digests=None):
+        names = algorithms(digests)
+        if not names:
+            raise ValueError('no digest algorithms given')
+        self._hashes = [(name, hashlib.new(name)) for name in names]
+
+    @property
+    def algorithms(self):
+        """
+        :rtype: tuple
+        """
+        return tuple(name for name, h in self._hashes)
+
+    def update(self, data):
+        """ Hash more data; buffers are hashed without copying them
+        """
+        for name, h in self._hashes:
+            h.update(data)
+
+    def wrap(self, write):
+        """ Return a write function that hashes what it writes
+        """
+        hashes = [h.update for name, h in self._hashes]
+
+        def hashing_write(data):
+            for update in hashes:
+                update(data)
+            return write(data)
+
+        return hashing_write
+
+    def hexdigests(self):
+        """
+        :rtype: dict
+        """
+        return dict((name, h.hexdigest()) for name, h in self._hashes)
+
+
+def file_key(folder, name, info):
+    """ Key a file on the camera by folder, name, size and mtime
+
+    Args:
+        info (CameraFileInfo): the file's information
+
+    Returns:
+        key (str), or None if the driver doesn't report the size
+    """
+    if not info.fields & GP_FILE_INFO_SIZE:
+        return None
+    if isinstance(folder, bytes):
+        folder = folder.decode('ascii')
+    if isinstance(name, bytes):
+        name = name.decode('ascii')
+    mtime = info.mtime if info.fields & GP_FILE_INFO_MTIME else ''
+    return '%s/%s:%d:%s' % (folder.rstrip('/'), name, info.size, mtime)
+
+
+class DigestIndex(object):
+    """ Digests of downloaded files, kept in an SQLite database
+
+    Kwargs:
+        path (str): database file; ':memory:' keeps the index for this
+            process only
+
+    Safe to share between threads.  Use as a context manager, or call
+    close() when finished.
+    """
+
+    def __init__(self, path=':memory:'):
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        with self._db:
+            self._db.execute('CREATE TABLE IF NOT EXISTS digests ('
+                             'key TEXT, algorithm TEXT, digest TEXT, '
+                             'PRIMARY KEY (key, algorithm))')
+            self._db.execute('CREATE INDEX IF NOT EXISTS by_digest '
+                             'ON digests (algorithm, digest)')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def __len__(self):
+        with self._lock:
+            return self._db.execute(
+                'SELECT COUNT(DISTINCT key) FROM digests').fetchone()[0]
+
+    def __contains__(self, key):
+        return self.get(key) is not None
+
+    def get(self, key):
+        """ Digests known for a file
+
+        Returns:
+            digests (dict), or None if the file is unknown
+        """
+        with self._lock:
+            rows = self._db.execute(
+                'SELECT algorithm, digest FROM digests WHERE key = ?',
+                (key,)).fetchall()
+        return dict(rows) if rows else None
+
+    def add(self, key, digests):
+        """ Remember the digests of a file
+
+        Args:
+            key (str): see file_key
+            digests (dict): hex digest by algorithm
+        """
+        with self._lock, self._db:
+            self._db.executemany(
+                'INSERT OR REPLACE INTO digests VALUES (?, ?, ?)',
+                [(key, algorithm, digest)
+                 for algorithm, digest in digests.items()])
+
+    def find(self, algorithm, digest):
+        """ Keys of the files with this digest, ie. to spot duplicates
+
+        :rtype: list
+        """
+        with self._lock:
+            rows = self._db.execute(
+                'SELECT key FROM digests WHERE algorithm = ? AND digest = ?',
+                (algorithm, digest)).fetchall()
+        return [row[0] for row in rows]
+
+    def close(self):
+        with self._lock:
+            self._db.close()
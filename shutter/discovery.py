@@ -0,0 +1,214 @@
+"""
+Find the cameras attached to the system.
+
+discover() runs a single gp_camera_autodetect and resolves the abilities and
+port of every camera found, so several cameras can be opened without
+repeating the search for each one.
+
+The libgphoto2 driver database holds thousands of models.  AbilitiesIndex
+loads it once per process and indexes it by model name and USB id.  Given a
+cache directory, it also keeps a copy on disk, keyed on the libgphoto2
+version, so later processes skip gp_abilities_list_load entirely.
+"""
+import ctypes
+import hashlib
+import os
+import tempfile
+
+from .shutter import Camera
+from .shutter import CameraAbilities
+from .shutter import CameraAbilitiesList
+from .shutter import CameraAbilitiesStruct
+from .shutter import CameraList
+from .shutter import PortInfoList
+from .shutter import gp
+from .shutter import gp_library_version
+
+__all__ = ['AbilitiesIndex', 'CameraInfo', 'discover']
+
+CACHE_MAGIC = b'shutter-abilities\n'
+
+
+class CameraInfo(object):
+    """ A camera found by discover()
+    """
+
+    def __init__(self, model, path, abilities, port_info):
+        self.model = model
+        self.path = path
+        self.abilities = abilities
+        self.port_info = port_info
+
+    def __repr__(self):
+        return '<CameraInfo %s at %s>' % (self.model, self.path)
+
+    def open(self, context=None):
+        """ Open the camera, without searching for it again
+
+        :rtype: Camera
+        """
+        return Camera(context=context, abilities=self.abilities,
+                      port_info=self.port_info)
+
+
+class AbilitiesIndex(object):
+    """ The libgphoto2 driver database, indexed by model and USB id
+
+    Kwargs:
+        cache_dir (str): directory to keep a copy of the database in
+
+    Use AbilitiesIndex.get to share one index within the process.
+    """
+    _shared = dict()
+
+    def __init__(self, cache_dir=None):
+        self._size = ctypes.sizeof(CameraAbilitiesStruct)
+        self._data = None
+        self._by_model = dict()
+        self._by_usb = dict()
+
+        path = None
+        if cache_dir is not None:
+            path = os.path.join(cache_dir, 'abilities-%s.bin' % self._key())
+            self._data = self._read_cache(path)
+
+        if self._data is None:
+            self._data = self._load()
+            if path is not None:
+                self._write_cache(path)
+
+        self._build()
+
+    @classmethod
+    def get(cls, cache_dir=None):
+        """ Return the index shared by this process
+
+        :rtype: AbilitiesIndex
+        """
+        key = cache_dir, gp.generation
+        try:
+            return cls._shared[key]
+        except KeyError:
+            index = cls(cache_dir)
+            cls._shared[key] = index
+            return index
+
+    def __len__(self):
+        return len(self._data) // self._size
+
+    def __contains__(self, model):
+        return model in self._by_model
+
+    def _key(self):
+        version = gp_library_version(verbose=False)
+        key = '%s %d' % (version, self._size)
+        return hashlib.sha1(key.encode('utf-8')).hexdigest()[:16]
+
+    def _load(self):
+        al = CameraAbilitiesList()
+        ab = CameraAbilities()
+        chunks = list()
+        for i in range(al.count()):
+            al.get_abilities(i, ab)
+            chunks.append(ab.to_bytes())
+        return b''.join(chunks)
+
+    def _read_cache(self, path):
+        try:
+            with open(path, 'rb') as fp:
+                data = fp.read()
+        except (IOError, OSError):
+            return None
+        if not data.startswith(CACHE_MAGIC):
+            return None
+        data = data[len(CACHE_MAGIC):]
+        if len(data) % self._size:
+            return None
+        return data
+
+    def _write_cache(self, path):
+        folder = os.path.dirname(path)
+        try:
+            if not os.path.isdir(folder):
+                os.makedirs(folder)
+            fd, tmp = tempfile.mkstemp(dir=folder)
+            with os.fdopen(fd, 'wb') as fp:
+                fp.write(CACHE_MAGIC)
+                fp.write(self._data)
+            os.rename(tmp, path)
+        except (IOError, OSError):
+            # the cache is only an optimisation
+            pass
+
+    def _build(self):
+        size = self._size
+        for offset in range(0, len(self._data), size):
+            s = CameraAbilitiesStruct.from_buffer_copy(self._data, offset)
+            self._by_model.setdefault(str(s.model, encoding='ascii'), offset)
+            if s.usb_vendor or s.usb_product:
+                key = (s.usb_vendor, s.usb_product)
+                self._by_usb.setdefault(key, offset)
+
+    def _get(self, offset):
+        return CameraAbilities.from_bytes(
+            self._data[offset:offset + self._size])
+
+    def models(self):
+        """
+        :rtype: list
+        """
+        return list(self._by_model)
+
+    def lookup_model(self, model):
+        """ Return the abilities of a model, or None
+
+        :type model: str
+        :rtype: CameraAbilities
+        """
+        offset = self._by_model.get(model)
+        if offset is None:
+            return None
+        return self._get(offset)
+
+    def lookup_usb(self, vendor, product):
+        """ Return the abilities for a USB vendor and product id, or None
+
+        :type vendor: int
+        :type product: int
+        :rtype: CameraAbilities
+        """
+        offset = self._by_usb.get((vendor, product))
+        if offset is None:
+            return None
+        return self._get(offset)
+
+
+def discover(regex=None, cache_dir=None, context=None):
+    """ Return every camera attached to the system
+
+    Kwargs:
+        regex: only return models this matches (lowercase)
+        cache_dir (str): keep the driver database here; see AbilitiesIndex
+        context: GPContext for autodetection
+
+    Returns:
+        cameras (list): CameraInfo for each camera, in autodetect order
+
+    :rtype: list
+    """
+    cl = CameraList(autodetect=True, context=context)
+    found = [(model, path) for model, path in cl.as_list()
+             if not regex or regex.search(model.lower())]
+    if not found:
+        return list()
+
+    index = AbilitiesIndex.get(cache_dir)
+    ports = PortInfoList()
+    cameras = list()
+    for model, path in found:
+        abilities = index.lookup_model(model)
+        if abilities is None:
+            continue
+        port_info = ports.get_info(ports.lookup_path(path))
+        cameras.append(CameraInfo(model, path, abilities, port_info))
+    return cameras
@@ -0,0 +1,487 @@
+"""
+Drive many cameras from a pool of worker processes.
+
+Every worker process loads libgphoto2 for itself and opens its own share
+of the cameras, so a driver that crashes or hangs takes down one worker,
+not the program, and capture work spreads across cores.
+
+    farm = CaptureFarm()
+    frames = farm.capture_all()
+    for path, frame in frames.items():
+        with frame:
+            save(path, frame.data)
+    farm.close()
+
+Image data comes back through shared memory.  Each worker owns a block of
+`slots` buffers of `slot_size` bytes; a Frame holds one of them until it is
+released, and a worker with every buffer held waits for one to be released
+before it captures again.  Files larger than a buffer are sent through the
+worker's pipe instead.
+
+A worker that doesn't answer within `timeout` seconds is killed and
+started again, and the call raises ShutterError(GP_ERROR_TIMEOUT).  A
+worker that exits is started again the same way.  Give ping_interval to
+also check idle workers in the background.
+
+Workers are started with the 'spawn' method by default, so nothing of the
+parent's libgphoto2 state reaches them.
+"""
+import collections
+import multiprocessing
+import threading
+import time
+
+from multiprocessing import shared_memory
+
+from .shutter import GP_ERROR
+from .shutter import GP_ERROR_IO
+from .shutter import GP_ERROR_MODEL_NOT_FOUND
+from .shutter import GP_ERROR_TIMEOUT
+from .shutter import CameraFile
+from .shutter import ShutterError
+from .shutter import load
+
+__all__ = ['CaptureFarm', 'Frame']
+
+# bytes in each shared buffer; big enough for most raw files
+DEFAULT_SLOT_SIZE = 64 * 1024 * 1024
+
+
+def _bus(path):
+    """ USB bus of a port path, ie. 'usb:001,005' -> 'usb:001'
+    """
+    if path.startswith('usb:') and ',' in path:
+        return path.split(',', 1)[0]
+    return path
+
+
+def _serve(paths, conn, shm_name, slot_size, loader):
+    """ Main function of a worker process
+    """
+    from .discovery import discover
+
+    if loader is None:
+        load()
+    else:
+        loader()
+
+    shm = shared_memory.SharedMemory(shm_name)
+    cameras = dict()
+    camfiles = dict()
+    try:
+        try:
+            for info in discover():
+                if info.path in paths:
+                    cameras[info.path] = info.open()
+                    camfiles[info.path] = CameraFile()
+        except ShutterError as e:
+            conn.send(('error', e.result, e.message))
+            return
+        conn.send(('ready', sorted(cameras)))
+
+        while True:
+            try:
+                message = conn.recv()
+            except EOFError:
+                break
+            op = message[0]
+            if op == 'stop':
+                break
+            if op == 'ping':
+                conn.send(('ok', None))
+                continue
+            try:
+                conn.send(_handle(message, cameras, camfiles, shm,
+                                  slot_size))
+            except ShutterError as e:
+                conn.send(('error', e.result, e.message))
+            except Exception as e:
+                # a bad request mustn't take the worker down
+                conn.send(('error', GP_ERROR, '%s: %s' % (
+                    type(e).__name__, e)))
+    finally:
+        for camera in cameras.values():
+            camera.close()
+        shm.close()
+
+
+def _handle(message, cameras, camfiles, shm, slot_size):
+    """ Run one request in a worker process; return the reply
+    """
+    op, path, slot, args = message
+    camera = cameras.get(path)
+    if camera is None:
+        raise ShutterError(GP_ERROR_MODEL_NOT_FOUND,
+                           'no camera at %s' % path)
+    if op == 'capture_image':
+        view = camera.capture_image(return_buffer=True)
+    elif op == 'capture_preview':
+        view = camera.capture_preview(camfile=camfiles[path],
+                                      return_buffer=True)
+    elif op == 'download':
+        view = camera.download(*args).get_buffer()
+    else:
+        raise ValueError('unknown operation: %r' % op)
+
+    length = len(view)
+    if length <= slot_size:
+        start = slot * slot_size
+        shm.buf[start:start + length] = view
+        return 'frame', length
+    return 'bytes', bytes(view)
+
+
+class Frame(object):
+    """ Image data returned by a CaptureFarm
+
+    data is a read-only memoryview.  For data in shared memory it is only
+    valid until release() is called; use as a context manager, or copy it
+    with bytes(frame.data) to keep it.
+    """
+
+    def __init__(self, path, data, worker=None, slot=None):
+        self.path = path
+        self.data = data
+        self._worker = worker
+        self._slot = slot
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.release()
+
+    def __del__(self):
+        self.release()
+
+    def __len__(self):
+        return len(self.data)
+
+    def release(self):
+        """ Hand the shared buffer back to the worker
+        """
+        if self._worker is None:
+            return
+        worker, self._worker = self._worker, None
+        self.data.release()
+        worker.release(self._slot)
+
+
+class _Worker(object):
+    """ Parent side of a worker process
+    """
+
+    def __init__(self, farm, paths):
+        self.farm = farm
+        self.paths = list(paths)
+        self.lock = threading.Lock()
+        self.cond = threading.Condition()
+        self.free = collections.deque(range(farm.slots))
+        self.shm = shared_memory.SharedMemory(
+            create=True, size=farm.slot_size * farm.slots)
+        self.process = None
+        self.conn = None
+        self.restarts = 0
+        try:
+            self.start()
+        except BaseException:
+            self.shm.close()
+            self.shm.unlink()
+            raise
+
+    def start(self):
+        farm = self.farm
+        conn, child = farm._mp.Pipe()
+        self.process = farm._mp.Process(
+            target=_serve, name='shutter-farm',
+            args=(self.paths, child, self.shm.name, farm.slot_size,
+                  farm.loader))
+        self.process.daemon = True
+        self.process.start()
+        child.close()
+        self.conn = conn
+        try:
+            if conn.poll(farm.start_timeout):
+                reply = conn.recv()
+            else:
+                reply = ('error', GP_ERROR_TIMEOUT,
+                         'camera worker did not start')
+        except (EOFError, OSError):
+            reply = ('error', GP_ERROR_IO, 'camera worker exited')
+        if reply[0] == 'error':
+            self.stop(0)
+            raise ShutterError(reply[1], reply[2])
+
+    def stop(self, wait=1.0):
+        process = self.process
+        if process is None:
+            return
+        self.process = None
+        if process.is_alive():
+            try:
+                self.conn.send(('stop',))
+            except (OSError, ValueError):
+                pass
+            process.join(wait)
+        if process.is_alive():
+            process.terminate()
+            process.join(wait)
+        if process.is_alive():
+            process.kill()
+            process.join()
+        self.conn.close()
+
+    def restart(self):
+        self.stop(0)
+        self.restarts += 1
+        self.start()
+
+    def send(self, message):
+        """ Send to the worker, starting it again first if it exited
+        """
+        if self.process is None:
+            raise ValueError('farm is closed')
+        if not self.process.is_alive():
+            self.restart()
+        try:
+            self.conn.send(message)
+        except OSError:
+            self.restart()
+            raise ShutterError(GP_ERROR_IO, 'camera worker exited')
+
+    def receive(self, timeout):
+        """ Wait for the worker's reply; restart it if none comes
+        """
+        try:
+            if self.conn.poll(timeout):
+                return self.conn.recv()
+        except (EOFError, OSError):
+            self.restart()
+            raise ShutterError(GP_ERROR_IO, 'camera worker exited')
+        self.restart()
+        raise ShutterError(GP_ERROR_TIMEOUT, 'camera worker hung')
+
+    def acquire_slot(self):
+        with self.cond:
+            while not self.free:
+                self.cond.wait()
+            return self.free.popleft()
+
+    def release(self, slot):
+        with self.cond:
+            self.free.append(slot)
+            self.cond.notify()
+
+    def call(self, op, path, args=()):
+        slot = self.acquire_slot()
+        try:
+            with self.lock:
+                self.send((op, path, slot, args))
+                reply = self.receive(self.farm.timeout)
+        except BaseException:
+            self.release(slot)
+            raise
+
+        kind = reply[0]
+        if kind == 'frame':
+            start = slot * self.farm.slot_size
+            view = self.shm.buf[start:start + reply[1]].toreadonly()
+            return Frame(path, view, self, slot)
+        self.release(slot)
+        if kind == 'bytes':
+            return Frame(path, memoryview(reply[1]))
+        raise ShutterError(reply[1], reply[2])
+
+    def ping(self):
+        """ Check an idle worker answers; restart it if it doesn't
+        """
+        if not self.lock.acquire(False):
+            return
+        try:
+            if self.process is None:
+                return
+            self.send(('ping',))
+            self.receive(self.farm.timeout)
+        except ShutterError:
+            pass
+        finally:
+            self.lock.release()
+
+    def close(self):
+        with self.lock:
+            self.stop()
+        self.shm.close()
+        self.shm.unlink()
+
+
+class CaptureFarm(object):
+    """ Cameras driven from worker processes
+
+    Kwargs:
+        paths (list): port paths of the cameras; every camera found by
+            discover() if None
+        per (str): 'camera' for a worker per camera, or 'bus' for a worker
+            per USB bus
+        slot_size (int): bytes in each shared buffer
+        slots (int): shared buffers per worker
+        timeout (float): seconds a worker has to answer a call
+        start_timeout (float): seconds a worker has to open its cameras
+        ping_interval (float): seconds between checks of idle workers;
+            None for no background checks
+        loader (callable): called in each worker to load libgphoto2
+            instead of shutter.load(); it must be picklable, ie. a module
+            level function
+        start_method (str): multiprocessing start method
+
+    Raises:
+        ShutterError: if a worker cannot open its cameras
+    """
+
+    def __init__(self, paths=None, per='camera',
+                 slot_size=DEFAULT_SLOT_SIZE, slots=4, timeout=30.0,
+                 start_timeout=60.0, ping_interval=None, loader=None,
+                 start_method='spawn'):
+        if per not in ('camera', 'bus'):
+            raise ValueError("per must be 'camera' or 'bus'")
+        if paths is None:
+            from .discovery import discover
+            paths = [info.path for info in discover()]
+
+        self.slot_size = slot_size
+        self.slots = slots
+        self.timeout = timeout
+        self.start_timeout = start_timeout
+        self.loader = loader
+        self._mp = multiprocessing.get_context(start_method)
+        self._workers = dict()
+        self._closed = False
+
+        groups = collections.OrderedDict()
+        for path in paths:
+            key = path if per == 'camera' else _bus(path)
+            groups.setdefault(key, list()).append(path)
+        try:
+            for group in groups.values():
+                worker = _Worker(self, group)
+                for path in group:
+                    self._workers[path] = worker
+        except BaseException:
+            self.close()
+            raise
+
+        self._supervisor = None
+        if ping_interval is not None:
+            self._supervisor = threading.Thread(
+                target=self._supervise, args=(ping_interval,),
+                name='CaptureFarm')
+            self._supervisor.daemon = True
+            self._supervisor.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    @property
+    def paths(self):
+        """
+        :rtype: list
+        """
+        return list(self._workers)
+
+    @property
+    def restarts(self):
+        """ Number of times a worker was started again
+
+        :rtype: int
+        """
+        return sum(worker.restarts for worker in self._unique_workers())
+
+    def _unique_workers(self):
+        seen = list()
+        for worker in self._workers.values():
+            if worker not in seen:
+                seen.append(worker)
+        return seen
+
+    def _worker(self, path):
+        if self._closed:
+            raise ValueError('farm is closed')
+        try:
+            return self._workers[path]
+        except KeyError:
+            raise ShutterError(GP_ERROR_MODEL_NOT_FOUND,
+                               'no camera at %s in the farm' % path)
+
+    def capture_image(self, path):
+        """ Capture an image on the camera at path
+
+        :rtype: Frame
+        """
+        return self._worker(path).call('capture_image', path)
+
+    def capture_preview(self, path):
+        """ Capture a preview frame on the camera at path
+
+        :rtype: Frame
+        """
+        return self._worker(path).call('capture_preview', path)
+
+    def download(self, path, srcfolder, srcfilename, kind='normal'):
+        """ Download a file from the camera at path; see Camera.download
+
+        :rtype: Frame
+        """
+        return self._worker(path).call('download', path,
+                                       (srcfolder, srcfilename, kind))
+
+    def capture_all(self, preview=False):
+        """ Capture on every camera at once
+
+        Workers run in parallel; cameras that share a worker take turns.
+
+        Kwargs:
+            preview (bool): capture previews instead of images
+
+        Returns:
+            frames (dict): Frame or ShutterError, by port path
+        """
+        op = 'capture_preview' if preview else 'capture_image'
+        results = dict()
+
+        def run(path):
+            try:
+                results[path] = self._worker(path).call(op, path)
+            except ShutterError as e:
+                results[path] = e
+
+        threads = [threading.Thread(target=run, args=(path,))
+                   for path in self._workers]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return results
+
+    def _supervise(self, interval):
+        while not self._closed:
+            time.sleep(interval)
+            for worker in self._unique_workers():
+                if self._closed:
+                    break
+                worker.ping()
+
+    def close(self):
+        """ Stop every worker
+
+        Frames still held are no longer valid afterwards.
+        """
+        self._closed = True
+        for worker in self._unique_workers():
+            try:
+                worker.close()
+            except BufferError:
+                # frames still hold views of the shared memory
+                worker.shm.unlink()
+        self._workers.clear()
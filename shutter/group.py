@@ -0,0 +1,257 @@
+"""
+Fire several cameras at once.
+
+Capturing on one camera after another makes the last fire a whole capture
+time after the first.  A CameraGroup gives each camera a CameraWorker, so
+every camera has its own thread.  To trigger, each worker is armed, then
+the workers wait at a barrier and all call gp_camera_trigger_capture the
+moment it opens.  Each worker then waits for its camera's files and
+downloads them, all in parallel.
+
+    with CameraGroup(re.compile('canon')) as group:
+        result = group.trigger(dest_dir='/srv/bullet/take1')
+        print(result.skew)
+
+The time each trigger call starts is measured with time.perf_counter, so
+the reported skew is the spread of the calls into libgphoto2.  Shutter lag
+inside the camera bodies comes on top of it.
+"""
+import os
+import threading
+import time
+
+from .discovery import discover
+from .shutter import GP_ERROR_MODEL_NOT_FOUND
+from .shutter import GP_ERROR_TIMEOUT
+from .shutter import GP_EVENT_FILE_ADDED
+from .shutter import GP_EVENT_TIMEOUT
+from .shutter import ShutterError
+from .worker import CameraWorker
+
+__all__ = ['CameraGroup', 'CameraShot', 'TriggerResult']
+
+# most events drained from a camera when arming it
+MAX_DRAIN = 100
+
+
+class CameraShot(object):
+    """ What one camera of a group did for a trigger
+
+    start and end are time.perf_counter() around the trigger call; offset
+    is how long after the first camera's this one's call started.  files
+    holds (CameraEvent, data) for each file, where data is bytes, or the
+    local path when the files were saved.  error is the exception that
+    stopped the camera, if any.
+    """
+
+    def __init__(self, path, index):
+        self.path = path
+        self.index = index
+        self.start = None
+        self.end = None
+        self.offset = None
+        self.files = list()
+        self.error = None
+
+    def __repr__(self):
+        if self.offset is None:
+            return '<CameraShot %s: %r>' % (self.path, self.error)
+        return '<CameraShot %s: +%.3f ms, %d files>' % (
+            self.path, self.offset * 1000, len(self.files))
+
+    @property
+    def latency(self):
+        """ Seconds the trigger call took
+
+        :rtype: float
+        """
+        if self.start is None or self.end is None:
+            return None
+        return self.end - self.start
+
+
+class TriggerResult(object):
+    """ CameraShot of every camera in a group, by port path
+    """
+
+    def __init__(self, shots):
+        self.shots = shots
+
+    def __repr__(self):
+        return '<TriggerResult %d shots, skew %.3f ms>' % (
+            len(self.shots), self.skew * 1000)
+
+    @property
+    def skew(self):
+        """ Seconds between the first and last trigger call
+
+        :rtype: float
+        """
+        offsets = [shot.offset for shot in self.shots.values()
+                   if shot.offset is not None]
+        return max(offsets) if offsets else 0.0
+
+    @property
+    def errors(self):
+        """ Exceptions of the cameras that failed, by port path
+
+        :rtype: dict
+        """
+        return dict((path, shot.error) for path, shot in self.shots.items()
+                    if shot.error is not None)
+
+
+def _arm(camera):
+    """ Get a camera ready to fire without delay
+    """
+    # apply queued settings now, not between the trigger and the exposure
+    if camera._config is not None:
+        camera.config.apply()
+    # old events would be taken for files of the new shot
+    for i in range(MAX_DRAIN):
+        if camera.wait_for_event(1).type == GP_EVENT_TIMEOUT:
+            break
+
+
+def _shoot(camera, shot, barrier, files_per_shot, timeout, poll, dest_dir):
+    """ Job run on each camera's worker thread
+    """
+    try:
+        _arm(camera)
+    except BaseException:
+        barrier.abort()
+        raise
+    barrier.wait()
+
+    shot.start = time.perf_counter()
+    camera.trigger_capture()
+    shot.end = time.perf_counter()
+
+    deadline = time.monotonic() + timeout / 1000.0
+    while len(shot.files) < files_per_shot:
+        if time.monotonic() >= deadline:
+            raise ShutterError(GP_ERROR_TIMEOUT,
+                               'timed out waiting for capture')
+        event = camera.wait_for_event(poll)
+        if event.type != GP_EVENT_FILE_ADDED:
+            continue
+        folder, name = event.folder, event.name
+        if dest_dir is None:
+            data = camera.download(folder, name).get_data()
+        else:
+            data = os.path.join(dest_dir, '%02d' % shot.index, name)
+            with open(data, 'wb') as fp:
+                camera.download_to(folder, name, fp)
+        shot.files.append((event, data))
+    return shot
+
+
+class CameraGroup(object):
+    """ Cameras fired together
+
+    Kwargs:
+        regex: only use models this matches (lowercase)
+        paths (list): port paths of the cameras to use; all found if None
+
+    Raises:
+        ShutterError: if no camera is found, or one cannot be opened
+
+    Use as a context manager, or call close() when finished.
+    """
+
+    def __init__(self, regex=None, paths=None):
+        infos = discover(regex)
+        if paths is not None:
+            by_path = dict((info.path, info) for info in infos)
+            missing = [path for path in paths if path not in by_path]
+            if missing:
+                raise ShutterError(GP_ERROR_MODEL_NOT_FOUND,
+                                   'no camera at %s' % ', '.join(missing))
+            infos = [by_path[path] for path in paths]
+        if not infos:
+            raise ShutterError(GP_ERROR_MODEL_NOT_FOUND, 'no camera found')
+
+        self._workers = list()
+        try:
+            for i, info in enumerate(infos):
+                worker = CameraWorker(info=info, name='CameraGroup-%d' % i)
+                self._workers.append((info.path, worker))
+        except BaseException:
+            self.close()
+            raise
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def __len__(self):
+        return len(self._workers)
+
+    @property
+    def paths(self):
+        """
+        :rtype: list
+        """
+        return [path for path, worker in self._workers]
+
+    def trigger(self, files_per_shot=1, timeout=10000, poll=100,
+                dest_dir=None, arm_timeout=10.0):
+        """ Fire every camera at once, then fetch the new files
+
+        Kwargs:
+            files_per_shot (int): files each camera adds, ie. 2 for
+                RAW+JPEG
+            timeout (int): milliseconds to wait for a camera's files
+            poll (int): milliseconds for each wait for camera events
+            dest_dir (str): save the files here, in a folder per camera
+                named by its position in the group; None to return bytes
+            arm_timeout (float): seconds to wait for every camera to be
+                ready to fire
+
+        Returns:
+            result (TriggerResult)
+
+        Raises:
+            ShutterError: if a camera could not be armed; none are fired
+        """
+        if dest_dir is not None:
+            for i in range(len(self._workers)):
+                folder = os.path.join(dest_dir, '%02d' % i)
+                if not os.path.isdir(folder):
+                    os.makedirs(folder)
+
+        barrier = threading.Barrier(len(self._workers), timeout=arm_timeout)
+        shots = dict()
+        futures = list()
+        for i, (path, worker) in enumerate(self._workers):
+            shot = shots[path] = CameraShot(path, i)
+            futures.append(worker.submit(_shoot, shot, barrier,
+                                         files_per_shot, timeout, poll,
+                                         dest_dir))
+
+        for future, shot in zip(futures, shots.values()):
+            shot.error = future.exception()
+
+        fired = [shot.start for shot in shots.values()
+                 if shot.start is not None]
+        if not fired:
+            for shot in shots.values():
+                if not isinstance(shot.error, threading.BrokenBarrierError):
+                    raise shot.error
+            raise ShutterError(GP_ERROR_TIMEOUT,
+                               'cameras were not ready to fire')
+
+        first = min(fired)
+        for shot in shots.values():
+            if shot.start is not None:
+                shot.offset = shot.start - first
+        return TriggerResult(shots)
+
+    def close(self):
+        """ Stop the workers and close the cameras
+        """
+        for path, worker in self._workers:
+            worker.close()
+        self._workers = list()
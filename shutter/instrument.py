@@ -0,0 +1,205 @@
+"""
+Measure every call into libgphoto2.
+
+Instrumentation is off until enable() is called.  While it is off the
+libgphoto2 functions are called directly, so it costs nothing; enabling it
+rebinds each function to a wrapper that times the call.
+
+    from shutter import instrument
+    instrument.enable()
+    camera.capture_image('a.jpg')
+    stats = instrument.snapshot()
+    stats['functions']['gp_camera_capture']['p95']
+
+For each function, and for each function per camera, the snapshot holds
+the number of calls, latency percentiles, bytes handed over and a count of
+each error code returned.  Calls that take a camera as their first
+argument are also recorded under that camera; name_camera() gives it a
+label, ie. its port path, instead of its handle.
+
+A tracer passed to enable() is called with a Span after every call, to
+feed the calls to another metrics or tracing system.  It runs on the
+calling thread, so it should be quick.
+"""
+import collections
+import threading
+import time
+
+from .shutter import CameraFile
+from .shutter import gp
+from .stats import CallStats
+
+__all__ = ['CallStats', 'Span', 'disable', 'enable', 'enabled',
+           'name_camera', 'reset', 'snapshot']
+
+# argument holding a pointer to the bytes handed over, by function
+SIZE_ARGUMENTS = {
+    'gp_camera_file_read': 6,
+    'gp_file_get_data_and_size': 2,
+}
+
+# python code timed along with the libgphoto2 calls; the copy out of
+# libgphoto2's memory doesn't show up in any gp_* function
+METHODS = (
+    (CameraFile, 'get_data'),
+)
+
+Span = collections.namedtuple(
+    'Span', 'function camera start duration result bytes')
+Span.__doc__ = """ One call, as given to the tracer
+
+start is time.monotonic() when the call was made; camera is the camera
+label or None; bytes is None for functions that don't hand over data.
+"""
+
+
+class _Recorder(object):
+    def __init__(self, tracer=None):
+        self.tracer = tracer
+        self.functions = collections.defaultdict(CallStats)
+        self.cameras = collections.defaultdict(
+            lambda: collections.defaultdict(CallStats))
+        self.labels = dict()
+        self.lock = threading.Lock()
+
+    def record(self, name, camera, start, duration, result, size):
+        with self.lock:
+            self.functions[name].add(duration, result, size)
+            if camera is not None:
+                camera = self.labels.get(camera, camera)
+                self.cameras[camera][name].add(duration, result, size)
+        if self.tracer is not None:
+            self.tracer(Span(name, camera, start, duration, result, size))
+
+    def wrap(self, name, func):
+        record = self.record
+        clock = time.monotonic
+        per_camera = name.startswith('gp_camera_') and \
+            name != 'gp_camera_autodetect'
+        size_arg = SIZE_ARGUMENTS.get(name)
+
+        def call(*args):
+            start = clock()
+            result = func(*args)
+            duration = clock() - start
+            camera = _handle(args[0]) if per_camera and args else None
+            size = None
+            if size_arg is not None and result == 0:
+                size = _handle(args[size_arg])
+            record(name, camera, start, duration, result, size)
+            return result
+
+        call.__name__ = name
+        return call
+
+    def wrap_method(self, cls, name, method):
+        record = self.record
+        clock = time.monotonic
+        label = '%s.%s' % (cls.__name__, name)
+
+        def call(*args, **kwargs):
+            start = clock()
+            result = method(*args, **kwargs)
+            record(label, None, start, clock() - start, None, len(result))
+            return result
+
+        call.__name__ = name
+        call.__doc__ = method.__doc__
+        return call
+
+
+def _handle(arg):
+    """ Value of a pointer or handle argument, however it was passed
+    """
+    contents = getattr(arg, 'contents', None)
+    if contents is not None:
+        arg = contents
+    return getattr(arg, 'value', arg)
+
+
+# created by the first enable(), and kept after disable() so the
+# recordings can still be read
+_recorder = None
+_methods = dict()
+
+
+def enable(tracer=None):
+    """ Start recording calls; recordings made so far are kept
+
+    Kwargs:
+        tracer (callable): called with a Span after every call
+    """
+    global _recorder
+    if _recorder is None:
+        _recorder = _Recorder()
+    _recorder.tracer = tracer
+    if _methods:
+        return
+    gp.wrap(_recorder.wrap)
+    for cls, name in METHODS:
+        method = cls.__dict__[name]
+        _methods[cls, name] = method
+        setattr(cls, name, _recorder.wrap_method(cls, name, method))
+
+
+def disable():
+    """ Stop recording and call libgphoto2 directly again
+    """
+    if not _methods:
+        return
+    gp.wrap(None)
+    for (cls, name), method in _methods.items():
+        setattr(cls, name, method)
+    _methods.clear()
+
+
+def enabled():
+    """
+    :rtype: bool
+    """
+    return bool(_methods)
+
+
+def reset():
+    """ Forget everything recorded
+    """
+    if _recorder is None:
+        return
+    with _recorder.lock:
+        _recorder.functions.clear()
+        _recorder.cameras.clear()
+
+
+def name_camera(camera, label):
+    """ Record later calls on camera under label instead of its handle
+
+    Args:
+        camera (Camera): the camera
+        label (str): ie. the camera's port path
+    """
+    global _recorder
+    if _recorder is None:
+        _recorder = _Recorder()
+    with _recorder.lock:
+        _recorder.labels[_handle(camera.pointer)] = label
+
+
+def snapshot():
+    """ Return what has been recorded so far
+
+    Returns:
+        stats (dict): {'functions': {name: stats},
+                       'cameras': {camera: {name: stats}}}
+            where each stats is CallStats.as_dict()
+    """
+    recorder = _recorder
+    if recorder is None:
+        return {'functions': dict(), 'cameras': dict()}
+    with recorder.lock:
+        return {
+            'functions': dict((name, stats.as_dict())
+                              for name, stats in recorder.functions.items()),
+            'cameras': dict((camera, dict((name, stats.as_dict())
+                                          for name, stats in calls.items()))
+                            for camera, calls in recorder.cameras.items()),
+        }
@@ -0,0 +1,329 @@
+"""
+Time-lapse shooting on a fixed schedule.
+
+A loop of capture_image() and sleep() drifts: every capture and download
+adds to the interval.  An Intervalometer fires shot k at start + k *
+interval on the monotonic clock, whatever the shots before it took.
+
+Triggering and downloading are split.  Shots are fired with
+trigger_capture, and files are downloaded in the time left before the
+next shot, one at a time, and only when the last downloads suggest it will
+finish in time.  Files that don't fit wait for a later gap.
+
+    lapse = Intervalometer(camera, 2.0, dest_dir='night', count=14400)
+    lapse.run()
+    print(lapse.stats())
+
+When a shot is due but the camera is still busy with the last one, or
+downloads have fallen too far behind, the interval is too short for the
+camera.  With policy 'skip' the shot is dropped and the schedule is kept.
+With policy 'extend' the shot fires as soon as the camera is ready, and
+later shots are scheduled from there.
+"""
+import collections
+import os
+import time
+
+from .shutter import GP_ERROR_CAMERA_BUSY
+from .shutter import GP_ERROR_TIMEOUT
+from .shutter import GP_EVENT_FILE_ADDED
+from .shutter import ShutterError
+from .stats import CallStats
+
+__all__ = ['Intervalometer', 'Shot']
+
+SKIP = 'skip'
+EXTEND = 'extend'
+
+# weight of the newest download in the estimate of the next one
+DOWNLOAD_SMOOTHING = 0.3
+
+
+class Shot(object):
+    """ One slot of the schedule
+
+    due is when the shot was scheduled and triggered when it was fired,
+    both time.monotonic(); skipped shots have no triggered time.  files
+    holds (CameraEvent, data) like CameraGroup; data is the local path
+    when the intervalometer saves files.
+    """
+    __slots__ = ('index', 'due', 'triggered', 'files', 'announced')
+
+    def __init__(self, index, due):
+        self.index = index
+        self.due = due
+        self.triggered = None
+        self.files = list()
+        self.announced = 0
+
+    def __repr__(self):
+        if self.triggered is None:
+            return '<Shot %d skipped>' % self.index
+        return '<Shot %d +%.1f ms>' % (self.index, self.lateness * 1000)
+
+    @property
+    def skipped(self):
+        """
+        :rtype: bool
+        """
+        return self.triggered is None
+
+    @property
+    def lateness(self):
+        """ Seconds between when the shot was due and when it fired
+
+        :rtype: float
+        """
+        if self.triggered is None:
+            return None
+        return self.triggered - self.due
+
+
+class Intervalometer(object):
+    """ Fire a camera at a fixed interval
+
+    Args:
+        camera (Camera): camera to fire; it belongs to the intervalometer
+            while running
+        interval (float): seconds between shots
+
+    Kwargs:
+        count (int): shots to schedule, skipped ones included; None for
+            no limit
+        duration (float): seconds to run for; None for no limit
+        policy (str): 'skip' or 'extend'; see the module documentation
+        dest_dir (str): save files here, named by the shot index and the
+            camera's name, ie. 000042_IMG_0001.JPG, so a camera that
+            reuses names doesn't overwrite earlier shots; None to keep the
+            data in memory on each Shot
+        writer (shutter.writer.DiskWriter): save files through it
+        files_per_shot (int): files each shot adds, ie. 2 for RAW+JPEG
+        max_pending (int): downloads that may wait before a shot counts
+            as overlapping
+        timeout (float): seconds a shot may take to announce its file
+        poll (int): longest wait for camera events, in milliseconds
+        callback (callable): called with each Shot once its files are in
+
+    Call stop() from another thread, or give count or duration, to end
+    run().
+    """
+
+    def __init__(self, camera, interval, count=None, duration=None,
+                 policy=SKIP, dest_dir=None, writer=None, files_per_shot=1,
+                 max_pending=4, timeout=30.0, poll=50, callback=None):
+        if interval <= 0:
+            raise ValueError('interval must be positive')
+        if policy not in (SKIP, EXTEND):
+            raise ValueError("policy must be 'skip' or 'extend'")
+        self.camera = camera
+        self.interval = interval
+        self.count = count
+        self.duration = duration
+        self.policy = policy
+        self.dest_dir = dest_dir
+        self.writer = writer
+        self.files_per_shot = files_per_shot
+        self.max_pending = max_pending
+        self.timeout = timeout
+        self.poll = poll
+        self.callback = callback
+
+        self.shots = list()
+        self.lateness = CallStats()
+        # FILE_ADDED events no shot was waiting for, ie. from the shutter
+        # button; their files are left on the camera
+        self.stray = list()
+        self._running = False
+        self._in_flight = None       # shot the camera is busy with
+        self._awaiting = collections.deque()    # shots missing files
+        self._pending = collections.deque()     # (shot, event) to download
+        self._download_time = 0.0
+        self._busy_until = 0.0      # camera said busy; don't ask before
+
+    def stop(self):
+        """ Stop after the current step; run() then fetches what's left
+        """
+        self._running = False
+
+    @property
+    def taken(self):
+        """ Shots fired so far
+
+        :rtype: int
+        """
+        return sum(1 for shot in self.shots if shot.triggered is not None)
+
+    @property
+    def skipped(self):
+        """ Shots dropped because the camera wasn't ready
+
+        :rtype: int
+        """
+        return sum(1 for shot in self.shots if shot.triggered is None)
+
+    def stats(self):
+        """ Target against achieved cadence, and jitter
+
+        interval is the mean seconds between fired shots; lateness holds
+        percentiles of how late each shot fired, in seconds; stray counts
+        files the camera added that no shot was waiting for.
+
+        :rtype: dict
+        """
+        fired = [shot.triggered for shot in self.shots
+                 if shot.triggered is not None]
+        achieved = None
+        if len(fired) > 1:
+            achieved = (fired[-1] - fired[0]) / (len(fired) - 1)
+        return {
+            'target_interval': self.interval,
+            'interval': achieved,
+            'taken': len(fired),
+            'skipped': len(self.shots) - len(fired),
+            'pending': len(self._pending),
+            'stray': len(self.stray),
+            'lateness': self.lateness.as_dict(),
+        }
+
+    def run(self):
+        """ Shoot until count, duration or stop(), then fetch the files
+
+        Returns:
+            shots (list): every Shot, skipped ones included
+
+        Raises:
+            ShutterError
+        """
+        if self.dest_dir is not None and not os.path.isdir(self.dest_dir):
+            os.makedirs(self.dest_dir)
+
+        clock = time.monotonic
+        self._running = True
+        start = base = clock()
+        index = 0
+
+        while self._running:
+            if self.count is not None and index >= self.count:
+                break
+            due = base + index * self.interval
+            if self.duration is not None and due - start >= self.duration:
+                break
+            shot = Shot(index, due)
+            self.shots.append(shot)
+            index += 1
+
+            self._service(due)
+            if self.policy == SKIP:
+                if self._ready():
+                    self._fire(shot)
+                continue
+
+            while self._running and not (self._ready() and
+                                         self._fire(shot)):
+                self._service(clock() + self.poll / 1000.0, wake=True)
+            if shot.triggered is None:
+                self.shots.pop()
+                break
+            if shot.triggered - due > self.poll / 1000.0:
+                # later shots are scheduled from this late one
+                base = shot.triggered - shot.index * self.interval
+
+        # fetch the files of the shots already fired
+        self._running = False
+        while self._in_flight is not None or self._awaiting or \
+                self._pending:
+            self._service(clock() + self.poll / 1000.0, drain=True)
+        return self.shots
+
+    def _ready(self):
+        return self._in_flight is None and \
+            len(self._pending) < self.max_pending and \
+            time.monotonic() >= self._busy_until
+
+    def _fire(self, shot):
+        camera = self.camera
+        now = time.monotonic()
+        if now < shot.due:
+            # wait_for_event only has millisecond resolution
+            time.sleep(shot.due - now)
+        triggered = time.monotonic()
+        try:
+            camera.trigger_capture()
+        except ShutterError as e:
+            if e.result != GP_ERROR_CAMERA_BUSY:
+                raise
+            # give the camera a poll interval before asking again
+            self._busy_until = time.monotonic() + self.poll / 1000.0
+            return False
+        shot.triggered = triggered
+        self.lateness.add(max(triggered - shot.due, 0.0), 0, None)
+        self._in_flight = shot
+        self._awaiting.append(shot)
+        return True
+
+    def _service(self, until, drain=False, wake=False):
+        """ Handle camera events and downloads until the until time
+
+        With drain, download whatever is pending, fitting or not; with
+        wake, return as soon as the camera is ready for the next shot.
+        """
+        clock = time.monotonic
+        camera = self.camera
+        while True:
+            now = clock()
+            if now >= until or wake and self._ready():
+                return
+
+            # a full queue is fetched even if it delays shots; otherwise
+            # downloads slower than the interval would never be done
+            if self._pending and (
+                    drain or len(self._pending) >= self.max_pending or
+                    now + self._download_time < until):
+                self._download(*self._pending.popleft())
+                continue
+
+            shot = self._in_flight
+            if shot is not None and now - shot.triggered > self.timeout:
+                raise ShutterError(GP_ERROR_TIMEOUT,
+                                   'timed out waiting for shot %d' %
+                                   shot.index)
+
+            wait = int((until - now) * 1000)
+            if wait < 1:
+                return
+            event = camera.wait_for_event(min(wait, self.poll))
+            # the camera is free once the shot's last file is announced;
+            # CAPTURE_COMPLETE may follow, but may also be the last shot's
+            if event.type == GP_EVENT_FILE_ADDED and self._awaiting:
+                shot = self._awaiting[0]
+                shot.announced += 1
+                if shot.announced >= self.files_per_shot:
+                    self._awaiting.popleft()
+                    if shot is self._in_flight:
+                        self._in_flight = None
+                self._pending.append((shot, event))
+            elif event.type == GP_EVENT_FILE_ADDED:
+                self.stray.append(event)
+            elif drain and self._in_flight is None and \
+                    not self._pending and not self._awaiting:
+                return
+
+    def _download(self, shot, event):
+        start = time.monotonic()
+        camfile = self.camera.download(event.folder, event.name)
+        if self.dest_dir is None:
+            data = camfile.get_data()
+        else:
+            data = os.path.join(self.dest_dir, '%06d_%s' % (shot.index,
+                                                            event.name))
+            if self.writer is not None:
+                self.writer.write(data, camfile.get_buffer())
+            else:
+                camfile.save(data)
+        shot.files.append((event, data))
+        elapsed = time.monotonic() - start
+        self._download_time += DOWNLOAD_SMOOTHING * (elapsed -
+                                                     self._download_time)
+        if len(shot.files) == self.files_per_shot and \
+                self.callback is not None:
+            self.callback(shot)
@@ -0,0 +1,248 @@
+"""
+Continuous live view from a camera.
+
+LiveView captures preview frames into one reused CameraFile.  Run without a
+thread, every frame is a view straight into libgphoto2's memory.  Run with a
+thread, frames are copied once into a small pool of preallocated buffers and
+the oldest waiting frames are dropped when the consumer falls behind.
+
+    with LiveView(camera) as live:
+        for frame in live:
+            show(frame.data)
+            print(live.fps, live.dropped)
+
+While a LiveView is running it owns the camera; don't call the camera from
+other threads until it is stopped.
+"""
+import collections
+import threading
+import time
+
+from .shutter import CameraFile
+
+__all__ = ['Frame', 'LiveView']
+
+# number of frames the fps figure is averaged over
+FPS_WINDOW = 30
+
+
+class Frame(object):
+    """ One preview frame
+
+    data is a read-only memoryview.  It is only valid until the next frame
+    is taken from the LiveView; copy it with bytes(frame.data) to keep it.
+    """
+
+    def __init__(self, data, number, timestamp):
+        self.data = data
+        self.number = number
+        self.timestamp = timestamp
+
+    def __len__(self):
+        return len(self.data)
+
+
+class LiveView(object):
+    """ Iterator over preview frames of a camera
+
+    Args:
+        camera (Camera): camera to capture previews from
+
+    Kwargs:
+        threaded (bool): capture on a background thread, so frames are
+            ready as soon as the consumer asks for them
+        buffer_size (int): frames kept waiting for the consumer when
+            threaded.  When the buffer is full, the oldest frame is dropped.
+
+    Iterating never ends on its own; call stop() or leave the with block.
+    A failed capture is raised from the iteration.
+    """
+
+    def __init__(self, camera, threaded=True, buffer_size=1):
+        if buffer_size < 1:
+            raise ValueError('buffer_size must be at least 1')
+        self._camera = camera
+        self._threaded = threaded
+        self._buffer_size = buffer_size
+        self._camfile = CameraFile()
+        self._cond = threading.Condition()
+        self._thread = None
+        self._running = False
+        self._error = None
+        self._ready = collections.deque()
+        self._free = collections.deque()
+        self._held = None
+        self._times = collections.deque(maxlen=FPS_WINDOW)
+        self._captured = 0
+        self._dropped = 0
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        # a failed capture stops the thread; raise its error rather than
+        # ending the iteration as stop() does
+        with self._cond:
+            if self._error is not None:
+                error, self._error = self._error, None
+                raise error
+            if not self._running:
+                raise StopIteration
+        frame = self.get()
+        if frame is None:
+            # stopped while waiting
+            raise StopIteration
+        return frame
+
+    next = __next__
+
+    @property
+    def running(self):
+        """
+        :rtype: bool
+        """
+        return self._running
+
+    @property
+    def captured(self):
+        """ Number of frames captured from the camera
+
+        :rtype: int
+        """
+        return self._captured
+
+    @property
+    def dropped(self):
+        """ Number of frames thrown away before the consumer saw them
+
+        :rtype: int
+        """
+        return self._dropped
+
+    @property
+    def fps(self):
+        """ Frames per second captured over the last FPS_WINDOW frames
+
+        :rtype: float
+        """
+        times = self._times
+        if len(times) < 2:
+            return 0.0
+        elapsed = times[-1] - times[0]
+        if elapsed <= 0:
+            return 0.0
+        return (len(times) - 1) / elapsed
+
+    def start(self):
+        """ Start capturing
+        """
+        if self._running:
+            return
+        self._running = True
+        self._error = None
+        if self._threaded:
+            # one buffer being written, one held by the consumer
+            self._free.extend(bytearray()
+                              for i in range(self._buffer_size + 2))
+            self._thread = threading.Thread(target=self._run, name='LiveView')
+            self._thread.daemon = True
+            self._thread.start()
+
+    def stop(self):
+        """ Stop capturing and wait for the capture thread to finish
+        """
+        with self._cond:
+            self._running = False
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self._ready.clear()
+        self._free.clear()
+        self._held = None
+
+    def get(self, timeout=None):
+        """ Return the next frame
+
+        The previously returned frame is invalid after this is called.
+
+        Kwargs:
+            timeout (float): seconds to wait for a frame when threaded
+
+        Returns:
+            frame (Frame), or None if the timeout expired
+
+        Raises:
+            ShutterError: if the capture failed
+        """
+        if not self._threaded:
+            view = self._camera.capture_preview(camfile=self._camfile,
+                                                return_buffer=True)
+            now = time.time()
+            self._times.append(now)
+            self._captured += 1
+            return Frame(view, self._captured, now)
+
+        with self._cond:
+            if self._held is not None:
+                self._free.append(self._held)
+                self._held = None
+            if not self._ready and self._error is None and self._running:
+                self._cond.wait_for(lambda: self._ready or
+                                    self._error is not None or
+                                    not self._running, timeout)
+            if self._error is not None:
+                error, self._error = self._error, None
+                raise error
+            if not self._ready:
+                return None
+            slot, length, number, timestamp = self._ready.popleft()
+            self._held = slot
+
+        data = memoryview(slot)[:length].toreadonly()
+        return Frame(data, number, timestamp)
+
+    def _run(self):
+        camera = self._camera
+        camfile = self._camfile
+        cond = self._cond
+        ready = self._ready
+        free = self._free
+
+        while self._running:
+            try:
+                view = camera.capture_preview(camfile=camfile,
+                                              return_buffer=True)
+            except Exception as e:
+                with cond:
+                    self._error = e
+                    self._running = False
+                    cond.notify_all()
+                return
+
+            with cond:
+                if len(ready) >= self._buffer_size:
+                    slot = ready.popleft()[0]
+                    self._dropped += 1
+                else:
+                    slot = free.popleft()
+
+            length = len(view)
+            if len(slot) < length:
+                slot = bytearray(length)
+            memoryview(slot)[:length] = view
+            del view
+
+            now = time.time()
+            with cond:
+                self._captured += 1
+                self._times.append(now)
+                ready.append((slot, length, self._captured, now))
+                cond.notify()
@@ -0,0 +1,217 @@
+"""
+Progress, cancellation and deadlines for camera calls.
+
+Calls share one GPContext, which has no callbacks: a download can't be
+followed or stopped once it has started.  An Operation is a GPContext of
+its own, with callbacks for progress, cancellation and error messages.
+Inside the with block, the camera makes its calls through it:
+
+    def show(current, total, rate):
+        print('%d of %d bytes, %.1f MB/s' % (current, total, rate / 1e6))
+
+    with camera.operation(progress=show, timeout=120):
+        camera.download_to(folder, 'MVI_0042.MOV', fp)
+
+libgphoto2 asks the context whether to cancel while it transfers data,
+and stops the call with GP_ERROR_CANCEL when told to.  An Operation says
+cancel when its deadline has passed, when cancel() was called, or when its
+CancelToken was cancelled from any thread; a scheduler can hand one token
+to the operations of a job, and cancel it to take the job away from a
+stalled camera.  A call past its deadline raises ShutterError with
+GP_ERROR_TIMEOUT instead of GP_ERROR_CANCEL.
+
+Drivers only check between blocks of a transfer, so a call stuck inside
+the USB stack returns when that block does.
+"""
+import threading
+import time
+import weakref
+
+from .shutter import ContextCancelFunc
+from .shutter import ContextErrorFunc
+from .shutter import ContextProgressStartFunc
+from .shutter import ContextProgressStopFunc
+from .shutter import ContextProgressUpdateFunc
+from .shutter import GP_CONTEXT_FEEDBACK_CANCEL
+from .shutter import GP_CONTEXT_FEEDBACK_OK
+from .shutter import GP_ERROR_CANCEL
+from .shutter import GP_ERROR_TIMEOUT
+from .shutter import ShutterError
+from .shutter import gp
+from .shutter import new_context
+
+__all__ = ['CancelToken', 'Operation']
+
+
+class CancelToken(object):
+    """ Cancels every Operation it is given, from any thread
+    """
+
+    def __init__(self):
+        self._event = threading.Event()
+
+    def cancel(self):
+        self._event.set()
+
+    @property
+    def cancelled(self):
+        """
+        :rtype: bool
+        """
+        return self._event.is_set()
+
+
+def _weak(method):
+    """ Wrap a bound method without keeping its object alive
+
+    The garbage collector can't see through ctypes callbacks, so an object
+    holding callbacks of its own methods would never be freed.
+    """
+    ref = weakref.WeakMethod(method)
+
+    def call(*args):
+        method = ref()
+        if method is None:
+            return 0
+        return method(*args)
+
+    return call
+
+
+class Operation(object):
+    """ A GPContext with progress, cancellation and a deadline
+
+    Kwargs:
+        camera (Camera): make the camera's calls through this context in
+            the with block
+        progress (callable): called as progress(current, total, rate) while
+            libgphoto2 reports progress; current and total are in the
+            driver's units, bytes for transfers, and rate is units per
+            second
+        timeout (float): seconds from entering the with block until calls
+            are cancelled
+        deadline (float): time.monotonic() when calls are cancelled
+        token (CancelToken): cancel when this is cancelled
+
+    An exception raised by progress cancels the operation, and is raised
+    again when the with block exits.
+    """
+
+    def __init__(self, camera=None, progress=None, timeout=None,
+                 deadline=None, token=None):
+        self.camera = camera
+        self.progress = progress
+        self.timeout = timeout
+        self.deadline = deadline
+        self.token = token
+        self.text = None
+        self.messages = list()
+        self._cancelled = False
+        self._error = None
+        self._tasks = dict()
+        self._ids = 0
+        self._saved = list()
+        self._ptr = new_context()
+
+        # the CFUNCTYPE objects must live as long as the context uses them
+        self._callbacks = (
+            ContextCancelFunc(_weak(self._cancel_func)),
+            ContextErrorFunc(_weak(self._error_func)),
+            ContextProgressStartFunc(_weak(self._start_func)),
+            ContextProgressUpdateFunc(_weak(self._update_func)),
+            ContextProgressStopFunc(_weak(self._stop_func)),
+        )
+        cancel, error, start, update, stop = self._callbacks
+        gp.gp_context_set_cancel_func(self._ptr, cancel, None)
+        gp.gp_context_set_error_func(self._ptr, error, None)
+        gp.gp_context_set_progress_funcs(self._ptr, start, update, stop,
+                                         None)
+
+    def __del__(self):
+        # __init__ may have failed before the context was created
+        if getattr(self, '_ptr', None) is not None:
+            self.close()
+
+    def __enter__(self):
+        if self.timeout is not None:
+            self.deadline = time.monotonic() + self.timeout
+        if self.camera is not None:
+            self._saved.append(self.camera._context)
+            self.camera._context = self._ptr
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if self.camera is not None and self._saved:
+            self.camera._context = self._saved.pop()
+        if self._error is not None:
+            error, self._error = self._error, None
+            raise error
+        if isinstance(exc_value, ShutterError) and \
+                exc_value.result == GP_ERROR_CANCEL and self.expired:
+            raise ShutterError(GP_ERROR_TIMEOUT,
+                               'operation passed its deadline')
+
+    @property
+    def pointer(self):
+        return self._ptr
+
+    @property
+    def expired(self):
+        """ Whether the deadline has passed
+
+        :rtype: bool
+        """
+        return self.deadline is not None and time.monotonic() >= self.deadline
+
+    @property
+    def cancelled(self):
+        """ Whether calls are being cancelled, for any reason
+
+        :rtype: bool
+        """
+        return (self._cancelled or self.expired or
+                self.token is not None and self.token.cancelled)
+
+    def cancel(self):
+        """ Cancel the calls of this operation; safe from any thread
+        """
+        self._cancelled = True
+
+    def close(self):
+        """ Free the context
+        """
+        if self._ptr is not None:
+            gp.gp_context_unref(self._ptr)
+            self._ptr = None
+
+    def _cancel_func(self, context, data):
+        if self.cancelled:
+            return GP_CONTEXT_FEEDBACK_CANCEL
+        return GP_CONTEXT_FEEDBACK_OK
+
+    def _error_func(self, context, text, data):
+        self.messages.append(str(text, encoding='ascii', errors='replace'))
+
+    def _start_func(self, context, target, text, data):
+        self._ids += 1
+        if text is not None:
+            self.text = str(text, encoding='ascii', errors='replace')
+        self._tasks[self._ids] = target, time.monotonic()
+        return self._ids
+
+    def _update_func(self, context, id, current, data):
+        task = self._tasks.get(id)
+        if task is None or self.progress is None:
+            return
+        target, started = task
+        elapsed = time.monotonic() - started
+        rate = current / elapsed if elapsed > 0 else 0.0
+        try:
+            self.progress(current, target, rate)
+        except Exception as e:
+            # exceptions can't cross back through libgphoto2
+            self._error = e
+            self._cancelled = True
+
+    def _stop_func(self, context, id, data):
+        self._tasks.pop(id, None)
@@ -0,0 +1,385 @@
+"""
+Keep camera sessions open between uses.
+
+gp_camera_init takes seconds on many cameras.  A CameraPool opens each
+camera once and lends it out for as long as a job needs it:
+
+    pool = CameraPool()
+    with pool.lease() as camera:
+        camera.capture_image('a.jpg')
+    with pool.lease('usb:001,005') as camera:
+        camera.capture_image('b.jpg')
+    pool.close()
+
+Sessions are keyed by port path.  A session idle for longer than
+probe_interval is checked with a cheap call before it is lent out, and a
+session whose camera failed with an I/O error is closed.  Either way the
+camera is opened again, transparently, on the next lease.  If the camera
+came back on a different port, ie. after a USB reset, it is found again by
+its model.  Errors from a camera locked by another process are retried
+with exponential backoff.
+"""
+import threading
+import time
+
+from .discovery import discover
+from .shutter import GP_ERROR_CAMERA_BUSY
+from .shutter import GP_ERROR_IO
+from .shutter import GP_ERROR_IO_INIT
+from .shutter import GP_ERROR_IO_LOCK
+from .shutter import GP_ERROR_IO_READ
+from .shutter import GP_ERROR_IO_UPDATE
+from .shutter import GP_ERROR_IO_USB_CLAIM
+from .shutter import GP_ERROR_IO_USB_CLEAR_HALT
+from .shutter import GP_ERROR_IO_USB_FIND
+from .shutter import GP_ERROR_IO_WRITE
+from .shutter import GP_ERROR_MODEL_NOT_FOUND
+from .shutter import GP_ERROR_TIMEOUT
+from .shutter import ShutterError
+from .shutter import gp
+from .shutter import new_context
+
+__all__ = ['CameraPool', 'Lease']
+
+# another process or driver holds the device; worth waiting for
+LOCK_ERRORS = frozenset((GP_ERROR_IO_LOCK, GP_ERROR_IO_USB_CLAIM,
+                         GP_ERROR_CAMERA_BUSY))
+
+# the session is gone; the camera must be opened again
+DISCONNECT_ERRORS = frozenset((GP_ERROR_IO, GP_ERROR_IO_INIT,
+                               GP_ERROR_IO_READ, GP_ERROR_IO_WRITE,
+                               GP_ERROR_IO_UPDATE, GP_ERROR_IO_USB_CLEAR_HALT,
+                               GP_ERROR_IO_USB_FIND,
+                               GP_ERROR_MODEL_NOT_FOUND))
+
+
+class _Session(object):
+    """ One camera in the pool; camera is None while disconnected
+    """
+
+    def __init__(self, path, model):
+        self.path = path
+        self.model = model
+        self.camera = None
+        self.context = None
+        self.lock = threading.Lock()
+        self.last_used = 0.0
+        self.leases = 0
+        self.connected = False
+
+    def disconnect(self):
+        camera, self.camera = self.camera, None
+        if camera is not None:
+            try:
+                camera.close()
+            except ShutterError:
+                pass
+        context, self.context = self.context, None
+        if context is not None:
+            gp.gp_context_unref(context)
+
+
+class Lease(object):
+    """ Exclusive use of a pooled camera
+
+    Use as a context manager, or call release() when done.  Releasing
+    after a ShutterError that means the camera went away closes the
+    session, so the next lease opens the camera again.
+    """
+
+    def __init__(self, pool, session):
+        self._pool = pool
+        self._session = session
+        self.camera = session.camera
+
+    def __enter__(self):
+        return self.camera
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        broken = isinstance(exc_value, ShutterError) and \
+            exc_value.result in DISCONNECT_ERRORS
+        self.release(broken)
+
+    @property
+    def path(self):
+        """ Port path of the camera
+
+        :rtype: str
+        """
+        return self._session.path
+
+    def release(self, broken=False):
+        """ Return the camera to the pool
+
+        Kwargs:
+            broken (bool): close the session instead of keeping it open
+        """
+        if self._session is None:
+            return
+        session, self._session = self._session, None
+        self.camera = None
+        self._pool._release(session, broken)
+
+
+class CameraPool(object):
+    """ Open camera sessions, lent out one job at a time
+
+    Kwargs:
+        probe_interval (float): seconds a session may sit idle before it
+            is checked with probe; None to never check
+        probe (callable): called with the camera to check it is still
+            there; it should raise ShutterError if not.  Fetches the
+            summary by default.
+        retries (int): attempts at opening a camera that is locked or not
+            found before giving up
+        backoff (float): seconds to wait after the first failed attempt;
+            doubled after each further one
+        max_backoff (float): longest wait between attempts
+        cache_dir (str): passed on to discover
+        rescan_interval (float): least seconds between looking for new
+            cameras while every session is lent out
+
+    Each session gets its own GPContext, so leases of different cameras
+    can be used from different threads.
+    """
+
+    def __init__(self, probe_interval=5.0, probe=None, retries=5,
+                 backoff=0.1, max_backoff=2.0, cache_dir=None,
+                 rescan_interval=1.0):
+        self.probe_interval = probe_interval
+        self.probe = probe or _summary
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.cache_dir = cache_dir
+        self.rescan_interval = rescan_interval
+        self._sessions = dict()
+        self._lock = threading.Lock()
+        # notified when a session is returned
+        self._released = threading.Condition(self._lock)
+        self._next_scan = 0.0
+        self._closed = False
+        # sessions opened, leases served by an open session, and
+        # sessions opened again after being lost
+        self.opened = 0
+        self.reused = 0
+        self.reconnects = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    @property
+    def paths(self):
+        """ Port paths of the sessions in the pool
+
+        :rtype: list
+        """
+        with self._lock:
+            return list(self._sessions)
+
+    def lease(self, path=None, timeout=None):
+        """ Borrow a camera, opening it if needed
+
+        Kwargs:
+            path (str): port path of the camera; any camera if None
+            timeout (float): seconds to wait for the camera to be returned
+                by another lease; None to wait forever
+
+        With no path, the first session returned is lent out; cameras
+        plugged in meanwhile are looked for at most every
+        rescan_interval.
+
+        Returns:
+            lease (Lease); use as a context manager to get the Camera
+
+        Raises:
+            ShutterError: if the camera could not be opened, or
+                GP_ERROR_TIMEOUT if it stayed in use
+        """
+        if self._closed:
+            raise ValueError('pool is closed')
+
+        if path is None:
+            session = self._any(timeout)
+        else:
+            session = self._session(path)
+            if timeout is None:
+                acquired = session.lock.acquire()
+            else:
+                acquired = session.lock.acquire(True, timeout)
+            if not acquired:
+                raise ShutterError(GP_ERROR_TIMEOUT,
+                                   'camera at %s is in use' % session.path)
+
+        try:
+            self._ensure(session)
+        except BaseException:
+            session.lock.release()
+            raise
+        session.leases += 1
+        return Lease(self, session)
+
+    def close(self):
+        """ Close every session
+
+        Sessions currently lent out are closed when they are released.
+        """
+        self._closed = True
+        with self._lock:
+            sessions = list(self._sessions.values())
+            self._released.notify_all()
+        for session in sessions:
+            if session.lock.acquire(False):
+                try:
+                    session.disconnect()
+                finally:
+                    session.lock.release()
+
+    def _session(self, path):
+        with self._lock:
+            session = self._sessions.get(path)
+            if session is not None:
+                return session
+
+        # not seen before; look for it
+        self._add(self._discover())
+        with self._lock:
+            session = self._sessions.get(path)
+            if session is not None:
+                return session
+        raise ShutterError(GP_ERROR_MODEL_NOT_FOUND, 'no camera at %s' % path)
+
+    def _any(self, timeout):
+        """ Lock a session nobody is using, waiting for one to be returned
+        """
+        clock = time.monotonic
+        deadline = None if timeout is None else clock() + timeout
+        while True:
+            with self._lock:
+                if self._closed:
+                    raise ValueError('pool is closed')
+                for session in self._sessions.values():
+                    if session.lock.acquire(False):
+                        return session
+                now = clock()
+                if self._sessions and deadline is not None and \
+                        now >= deadline:
+                    raise ShutterError(GP_ERROR_TIMEOUT,
+                                       'every camera is in use')
+                if self._sessions and now < self._next_scan:
+                    wait = self._next_scan - now
+                    if deadline is not None:
+                        wait = min(wait, deadline - now)
+                    self._released.wait(wait)
+                    continue
+                self._next_scan = now + self.rescan_interval
+
+            # discover outside the lock, so leases can still be returned
+            self._add(self._discover())
+            with self._lock:
+                if not self._sessions:
+                    raise ShutterError(GP_ERROR_MODEL_NOT_FOUND,
+                                       'no camera at any port')
+
+    def _add(self, infos):
+        with self._lock:
+            for info in infos:
+                if info.path not in self._sessions:
+                    self._sessions[info.path] = _Session(info.path,
+                                                         info.model)
+
+    def _discover(self):
+        return discover(cache_dir=self.cache_dir)
+
+    def _ensure(self, session):
+        """ Make sure session has a working camera; session.lock is held
+        """
+        camera = session.camera
+        if camera is not None:
+            interval = self.probe_interval
+            if interval is None or \
+                    time.monotonic() - session.last_used < interval:
+                self.reused += 1
+                return
+            try:
+                self.probe(camera)
+            except ShutterError:
+                session.disconnect()
+            else:
+                self.reused += 1
+                return
+        self._connect(session)
+
+    def _connect(self, session):
+        delay = self.backoff
+        error = None
+        for attempt in range(max(self.retries, 1)):
+            if attempt:
+                time.sleep(delay)
+                delay = min(delay * 2, self.max_backoff)
+            info = self._find(session)
+            if info is None:
+                error = ShutterError(GP_ERROR_MODEL_NOT_FOUND,
+                                     'no %s at %s' % (session.model,
+                                                      session.path))
+                continue
+            context = new_context()
+            try:
+                session.camera = info.open(context)
+            except ShutterError as e:
+                gp.gp_context_unref(context)
+                if e.result not in LOCK_ERRORS and \
+                        e.result not in DISCONNECT_ERRORS:
+                    raise
+                error = e
+                continue
+            except BaseException:
+                gp.gp_context_unref(context)
+                raise
+            session.context = context
+            session.last_used = time.monotonic()
+            if session.connected:
+                self.reconnects += 1
+            else:
+                session.connected = True
+                self.opened += 1
+            return
+        raise error
+
+    def _find(self, session):
+        """ Return the CameraInfo for session, following it to a new port
+        """
+        infos = self._discover()
+        for info in infos:
+            if info.path == session.path:
+                return info
+
+        # re-enumerated after a reset: the same model on a port that no
+        # other session is using
+        with self._lock:
+            for info in infos:
+                if info.model != session.model or info.path in self._sessions:
+                    continue
+                del self._sessions[session.path]
+                session.path = info.path
+                self._sessions[info.path] = session
+                return info
+        return None
+
+    def _release(self, session, broken):
+        try:
+            if broken or self._closed:
+                session.disconnect()
+            else:
+                session.last_used = time.monotonic()
+        finally:
+            session.lock.release()
+            with self._released:
+                self._released.notify()
+
+
+def _summary(camera):
+    return camera.summary
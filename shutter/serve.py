@@ -0,0 +1,421 @@
+"""
+Serve live view to many local clients over HTTP.
+
+Every client calling capture_preview() on its own multiplies the USB
+traffic and fights over the camera.  A PreviewServer gives each camera one
+capture thread, which keeps only the latest frame.  Every client is sent
+that same frame as multipart MJPEG, without copying it per client.  A
+client too slow for the camera just skips to the newest frame; it never
+holds back the camera or the other clients.
+
+    server = PreviewServer({'left': left, 'right': right}, port=8080)
+    server.start()
+    # http://127.0.0.1:8080/left.mjpg streams, /left.jpg is one frame
+    ...
+    server.close()
+
+Cameras are only read while someone is watching.  The server only binds
+loopback addresses; it has no authentication, so put a proxy in front of
+it to share the views further.
+"""
+import http.server
+import ipaddress
+import socket
+import socketserver
+import threading
+import time
+
+
+from .liveview import LiveView
+
+__all__ = ['Feed', 'PreviewServer']
+
+BOUNDARY = 'frame'
+
+# seconds a streaming client waits for a frame before checking if the
+# server is closing
+STREAM_POLL = 1.0
+
+
+class Feed(object):
+    """ Latest preview frame of a camera, captured on its own thread
+
+    Args:
+        camera (Camera): camera to capture previews from; it belongs to the
+            feed until stop()
+
+    Kwargs:
+        fps (float): most frames to capture per second; None for as many
+            as the camera gives
+
+    Capturing pauses while no client is subscribed.
+    """
+
+    def __init__(self, camera, fps=None):
+        self.camera = camera
+        self.fps_limit = fps
+        self.error = None
+        self.sent = 0
+        self.dropped = 0
+        self._live = LiveView(camera, threaded=False)
+        self._cond = threading.Condition()
+        self._frame = None          # (number, bytes)
+        self._viewers = 0
+        self._running = False
+        self._thread = None
+
+    @property
+    def running(self):
+        """
+        :rtype: bool
+        """
+        return self._running
+
+    @property
+    def viewers(self):
+        """ Clients subscribed
+
+        :rtype: int
+        """
+        return self._viewers
+
+    @property
+    def number(self):
+        """ Number of the latest frame; 0 before the first
+
+        :rtype: int
+        """
+        frame = self._frame
+        return 0 if frame is None else frame[0]
+
+    @property
+    def captured(self):
+        """
+        :rtype: int
+        """
+        return self._live.captured
+
+    @property
+    def fps(self):
+        """ Frames per second captured recently
+
+        :rtype: float
+        """
+        return self._live.fps
+
+    def start(self):
+        """ Start the capture thread
+        """
+        if self._running:
+            return
+        self._running = True
+        self.error = None
+        self._live.start()
+        self._thread = threading.Thread(target=self._run, name='Feed')
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        """ Stop capturing and wake every waiting client
+        """
+        with self._cond:
+            self._running = False
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self._live.stop()
+
+    def subscribe(self):
+        """ Count a client in, so frames are captured for it
+        """
+        with self._cond:
+            self._viewers += 1
+            self._cond.notify_all()
+
+    def unsubscribe(self):
+        """ Count a client out
+        """
+        with self._cond:
+            self._viewers -= 1
+
+    def wait(self, after=0, timeout=None, stream=False):
+        """ Return the latest frame once it is newer than after
+
+        Only subscribed clients get new frames captured.  Frames between
+        after and the one returned are dropped for this client; the frame
+        is shared, so don't modify it.
+
+        Kwargs:
+            after (int): number of the last frame the client has
+            timeout (float): seconds to wait
+            stream (bool): the client streams, so frames it skips count
+                as dropped
+
+        Returns:
+            (number, data), or None if the timeout expired or the feed
+            stopped
+        """
+        def newer():
+            return not self._running or (self._frame is not None and
+                                         self._frame[0] > after)
+
+        with self._cond:
+            if not self._cond.wait_for(newer, timeout) or not self._running:
+                return None
+            number = self._frame[0]
+            self.sent += 1
+            if stream and after:
+                self.dropped += number - after - 1
+            return self._frame
+
+    def _run(self):
+        cond = self._cond
+        live = self._live
+        last = 0.0
+        while True:
+            with cond:
+                cond.wait_for(lambda: self._viewers or not self._running)
+                if not self._running:
+                    return
+
+            if self.fps_limit:
+                delay = last + 1.0 / self.fps_limit - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+            last = time.monotonic()
+
+            try:
+                frame = live.get()
+            except Exception as e:
+                with cond:
+                    self.error = e
+                    self._running = False
+                    cond.notify_all()
+                return
+
+            # the one copy of the frame; every client is sent this object
+            data = bytes(frame.data)
+            with cond:
+                self._frame = frame.number, data
+                cond.notify_all()
+
+
+def _loopback_family(host):
+    """ Address family to bind host with
+
+    Raises:
+        ValueError: if host isn't a loopback address
+    """
+    family = None
+    for info in socket.getaddrinfo(host, None, 0, socket.SOCK_STREAM):
+        address = info[4][0].split('%')[0]
+        if not ipaddress.ip_address(address).is_loopback:
+            raise ValueError('%s is not a loopback address' % host)
+        family = family or info[0]
+    if family is None:
+        raise ValueError('cannot resolve %s' % host)
+    return family
+
+
+class _Handler(http.server.BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.0'
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        feeds = self.server.feeds
+        path = self.path.split('?')[0].strip('/')
+        name, dot, kind = path.rpartition('.')
+        if not path:
+            self._index(feeds)
+        elif name in feeds and kind == 'mjpg':
+            self._stream(feeds[name])
+        elif name in feeds and kind == 'jpg':
+            self._still(feeds[name])
+        else:
+            self.send_error(404)
+
+    def _index(self, feeds):
+        body = ''.join('<p>%s<br><img src="/%s.mjpg"></p>\n' % (name, name)
+                       for name in sorted(feeds)).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _still(self, feed):
+        feed.subscribe()
+        try:
+            # a frame kept from before anyone watched may be stale
+            frame = feed.wait(feed.number, self.server.still_timeout)
+        finally:
+            feed.unsubscribe()
+        if frame is None:
+            self.send_error(503)
+            return
+        self.send_response(200)
+        self.send_header('Content-Type', 'image/jpeg')
+        self.send_header('Content-Length', str(len(frame[1])))
+        self.send_header('Cache-Control', 'no-store')
+        self.end_headers()
+        self.wfile.write(frame[1])
+
+    def _stream(self, feed):
+        self.send_response(200)
+        self.send_header('Content-Type',
+                         'multipart/x-mixed-replace; boundary=%s' % BOUNDARY)
+        self.send_header('Cache-Control', 'no-store')
+        self.end_headers()
+        number = 0
+        feed.subscribe()
+        try:
+            while feed.running and not self.server.closing:
+                frame = feed.wait(number, STREAM_POLL, stream=True)
+                if frame is None:
+                    continue
+                number, data = frame
+                self.wfile.write(('--%s\r\nContent-Type: image/jpeg\r\n'
+                                  'Content-Length: %d\r\n\r\n' %
+                                  (BOUNDARY, len(data))).encode('ascii'))
+                self.wfile.write(data)
+                self.wfile.write(b'\r\n')
+                self.wfile.flush()
+        except (IOError, OSError):
+            # the client went away, or stopped reading for timeout seconds
+            pass
+        finally:
+            feed.unsubscribe()
+
+
+class _Server(socketserver.ThreadingMixIn, http.server.HTTPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class PreviewServer(object):
+    """ HTTP server of live view from one or more cameras
+
+    Args:
+        cameras (dict): Camera by the name it is served under; a list is
+            named 0, 1, ...
+
+    Kwargs:
+        host (str): loopback address to listen on
+        port (int): port to listen on; 0 picks a free one
+        fps (float): most frames to capture per second from each camera
+        timeout (float): seconds a still request waits for a frame
+        client_timeout (float): seconds a client may leave its connection
+            idle, ie. not reading a stream, before it is dropped
+
+    Raises:
+        ValueError: if host isn't a loopback address
+
+    Use as a context manager, or call close() when finished.
+    """
+
+    def __init__(self, cameras, host='127.0.0.1', port=0, fps=None,
+                 timeout=10.0, client_timeout=30.0):
+        if not isinstance(cameras, dict):
+            cameras = dict((str(i), camera)
+                           for i, camera in enumerate(cameras))
+        server_class = type('_Server', (_Server,),
+                            {'address_family': _loopback_family(host)})
+        # StreamRequestHandler sets timeout on each client's socket
+        handler_class = type('_Handler', (_Handler,),
+                             {'timeout': client_timeout})
+        self.feeds = dict((name, Feed(camera, fps))
+                          for name, camera in cameras.items())
+        self._server = server_class((host, port), handler_class)
+        self._server.feeds = self.feeds
+        self._server.still_timeout = timeout
+        self._server.closing = False
+        self._serving = False
+        self._thread = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    @property
+    def address(self):
+        """ (host, port) the server listens on
+
+        :rtype: tuple
+        """
+        return self._server.server_address[:2]
+
+    def url(self, name=None, kind='mjpg'):
+        """ URL of a camera's stream, or of the index page
+
+        Kwargs:
+            name (str): camera name
+            kind (str): 'mjpg' for the stream, 'jpg' for one frame
+
+        :rtype: str
+        """
+        host, port = self.address
+        if ':' in host:
+            host = '[%s]' % host
+        if name is None:
+            return 'http://%s:%d/' % (host, port)
+        return 'http://%s:%d/%s.%s' % (host, port, name, kind)
+
+    def stats(self):
+        """ Capture and delivery counts of each feed
+
+        sent counts frames given to clients, dropped the frames streaming
+        clients skipped because they were behind.
+
+        :rtype: dict
+        """
+        return dict((name, {
+            'captured': feed.captured,
+            'fps': feed.fps,
+            'viewers': feed.viewers,
+            'sent': feed.sent,
+            'dropped': feed.dropped,
+            'error': feed.error,
+        }) for name, feed in self.feeds.items())
+
+    def start(self):
+        """ Start the feeds and serve on a background thread
+        """
+        if self._serving:
+            return
+        self._serving = True
+        for feed in self.feeds.values():
+            feed.start()
+        self._thread = threading.Thread(target=self._server.serve_forever,
+                                        name='PreviewServer')
+        self._thread.daemon = True
+        self._thread.start()
+
+    def serve_forever(self):
+        """ Start the feeds and serve on this thread until close()
+        """
+        self._serving = True
+        for feed in self.feeds.values():
+            feed.start()
+        self._server.serve_forever()
+
+    def close(self):
+        """ Stop serving and stop the feeds
+
+        The cameras are left open.
+        """
+        self._server.closing = True
+        if self._serving:
+            self._serving = False
+            self._server.shutdown()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self._server.server_close()
+        for feed in self.feeds.values():
+            feed.stop()
@@ -22,11 +22,12 @@ incorporated patches from:
   jacobmarble's fork
 
 """
+import collections
 import ctypes
 import ctypes.util
-
-# python 2/3 interop
-from six.moves import range
+import os
+import threading
+from operator import attrgetter
 
 # This is run if gp_camera_init returns -60 (Could not lock the device)
 # unmount_cmd = None
@@ -35,10 +36,177 @@ from six.moves import range
 # else:
 #     unmount_cmd = 'gvfs-mount -s gphoto2'
 
-libgphoto2dll = ctypes.util.find_library('gphoto2')
-gp = ctypes.CDLL(libgphoto2dll)
-gp.gp_context_new.restype = ctypes.POINTER(ctypes.c_char)
-context = gp.gp_context_new()
+class _Library(object):
+    """ Stands in for the libgphoto2 CDLL until it is loaded
+
+    The library is loaded by the first function looked up on it, or by an
+    explicit call to load().  The prototyped functions are bound to the
+    instance when it is loaded, so calls through it are plain attribute
+    access followed by the ctypes call.
+    """
+    _wrapper = None
+
+    def __init__(self):
+        self._dll = None
+        self._raw = dict()
+        self.generation = 0
+
+    def __getattr__(self, name):
+        if name.startswith('__'):
+            raise AttributeError(name)
+        if self.__dict__.get('_dll') is None:
+            _load_once()
+        self._bind(name, getattr(self._dll, name))
+        return self.__dict__[name]
+
+    def _bind(self, name, func):
+        self._raw[name] = func
+        wrapper = self._wrapper
+        if wrapper is not None:
+            func = wrapper(name, func)
+        setattr(self, name, func)
+
+    def wrap(self, wrapper):
+        """ Call every function through wrapper(name, func)
+
+        The functions already bound, those looked up later and those of
+        libraries loaded later are all replaced with what wrapper returns.
+        Pass None to bind the plain functions again.
+        """
+        if wrapper is None:
+            self.__dict__.pop('_wrapper', None)
+        else:
+            self._wrapper = wrapper
+        for name, func in list(self._raw.items()):
+            self._bind(name, func)
+
+    @property
+    def loaded(self):
+        return self._dll is not None
+
+    # generation counts the libraries loaded, so caches of library state
+    # can tell when they belong to one that has been replaced
+
+    def reset(self, dll, functions=None):
+        generation = self.__dict__.get('generation', 0)
+        wrapper = self._wrapper
+        self.__dict__.clear()
+        self._dll = dll
+        self._raw = dict()
+        self.generation = generation + 1
+        if wrapper is not None:
+            self._wrapper = wrapper
+        if functions:
+            for name, func in functions.items():
+                self._bind(name, func)
+
+
+gp = _Library()
+
+_load_lock = threading.RLock()
+_context = None
+_context_pid = None
+
+
+def load(path=None, backend=None):
+    """ Load libgphoto2
+
+    This happens on its own the first time the library is used; call it to
+    load a specific file, or to find out early that it is missing.
+
+    Kwargs:
+        path (str): library to load, instead of searching for 'gphoto2'
+        backend: object to use in place of libgphoto2.  It must provide the
+            gp_* functions shutter calls, plus `free` for memory that
+            libgphoto2 hands to the caller.  See shutter.simulator.
+
+    Raises:
+        ShutterError: if the library cannot be found or loaded
+    """
+    global _context
+    with _load_lock:
+        CameraAbilitiesList._static_l = None
+        PortInfoList._static_l = None
+        _context = None
+
+        if backend is not None:
+            gp.reset(backend)
+            return
+
+        if path is None:
+            path = ctypes.util.find_library('gphoto2')
+            if path is None:
+                raise ShutterError(GP_ERROR_LIBRARY,
+                                   'libgphoto2 cannot be found')
+        try:
+            dll = ctypes.CDLL(path)
+        except OSError as e:
+            raise ShutterError(GP_ERROR_LIBRARY, str(e))
+
+        functions = bind_prototypes(dll)
+
+        # libgphoto2 hands out some memory that the caller must free()
+        libc = ctypes.CDLL(ctypes.util.find_library('c'))
+        libc.free.argtypes = [ctypes.c_void_p]
+        libc.free.restype = None
+        functions['free'] = libc.free
+
+        gp.reset(dll, functions)
+
+
+def _load_once():
+    """ Load libgphoto2 for the first call made through gp
+
+    Threads making their first call at the same time wait for one load,
+    instead of each loading the library again under the others.
+    """
+    with _load_lock:
+        if gp.__dict__.get('_dll') is None:
+            load()
+
+
+def get_context():
+    """ Return the GPContext shared by objects not given their own
+
+    It is created on first use, and again in a child process after fork.
+    """
+    global _context, _context_pid
+    pid = os.getpid()
+    if _context is None or _context_pid != pid:
+        with _load_lock:
+            if _context is None or _context_pid != pid:
+                _context = new_context()
+                _context_pid = pid
+    return _context
+
+
+def new_context():
+    """ Create a new GPContext
+
+    Cameras that are driven from different threads should each have their
+    own context; the one from get_context is shared by everything else.
+    """
+    return gp.gp_context_new()
+
+
+def _after_fork():
+    # the driver and port lists belong to the parent's library state; a
+    # forked child loads its own on first use
+    global _context
+    CameraAbilitiesList._static_l = None
+    PortInfoList._static_l = None
+    _context = None
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_after_fork)
+
+
+def __getattr__(name):
+    # `context` used to be created at import time
+    if name == 'context':
+        return get_context()
+    raise AttributeError(name)
 
 PTR = ctypes.pointer
 
@@ -54,21 +222,23 @@ GP_DRIVER_STATUS_TESTING = 1
 GP_DRIVER_STATUS_EXPERIMENTAL = 2
 GP_DRIVER_STATUS_DEPRECATED = 3
 
+# the operation enums are bit flags, combined in CameraAbilities
 #  ctypedef enum CameraOperation:
 GP_OPERATION_NONE = 0
-GP_OPERATION_CAPTURE_IMAGE = 1
-GP_OPERATION_CAPTURE_VIDEO = 2
-GP_OPERATION_CAPTURE_AUDIO = 3
-GP_OPERATION_CAPTURE_PREVIEW = 4
-GP_OPERATION_CONFIG = 5
+GP_OPERATION_CAPTURE_IMAGE = 1 << 0
+GP_OPERATION_CAPTURE_VIDEO = 1 << 1
+GP_OPERATION_CAPTURE_AUDIO = 1 << 2
+GP_OPERATION_CAPTURE_PREVIEW = 1 << 3
+GP_OPERATION_CONFIG = 1 << 4
+GP_OPERATION_TRIGGER_CAPTURE = 1 << 5
 
 #  ctypedef enum CameraFileOperation:
 GP_FILE_OPERATION_NONE = 0
-GP_FILE_OPERATION_DELETE = 1
-GP_FILE_OPERATION_PREVIEW = 2
-GP_FILE_OPERATION_RAW = 3
-GP_FILE_OPERATION_AUDIO = 4
-GP_FILE_OPERATION_EXIF = 5
+GP_FILE_OPERATION_DELETE = 1 << 1
+GP_FILE_OPERATION_PREVIEW = 1 << 3
+GP_FILE_OPERATION_RAW = 1 << 4
+GP_FILE_OPERATION_AUDIO = 1 << 5
+GP_FILE_OPERATION_EXIF = 1 << 6
 
 #  ctypedef enum CameraEventType:
 GP_EVENT_UNKNOWN = 0
@@ -76,27 +246,111 @@ GP_EVENT_TIMEOUT = 1
 GP_EVENT_FILE_ADDED = 2
 GP_EVENT_FOLDER_ADDED = 3
 GP_EVENT_CAPTURE_COMPLETE = 4
+GP_EVENT_FILE_CHANGED = 5
+
+# cdef extern from "gphoto2/gphoto2-widget.h":
+#  ctypedef enum CameraWidgetType:
+GP_WIDGET_WINDOW = 0
+GP_WIDGET_SECTION = 1
+GP_WIDGET_TEXT = 2
+GP_WIDGET_RANGE = 3
+GP_WIDGET_TOGGLE = 4
+GP_WIDGET_RADIO = 5
+GP_WIDGET_MENU = 6
+GP_WIDGET_BUTTON = 7
+GP_WIDGET_DATE = 8
 
 #  ctypedef enum CameraFolderOperation:
 GP_FOLDER_OPERATION_NONE = 0
-GP_FOLDER_OPERATION_DELETE_ALL = 1
-GP_FOLDER_OPERATION_PUT_FILE = 2
-GP_FOLDER_OPERATION_MAKE_DIR = 3
-GP_FOLDER_OPERATION_REMOVE_DIR = 4
+GP_FOLDER_OPERATION_DELETE_ALL = 1 << 0
+GP_FOLDER_OPERATION_PUT_FILE = 1 << 1
+GP_FOLDER_OPERATION_MAKE_DIR = 1 << 2
+GP_FOLDER_OPERATION_REMOVE_DIR = 1 << 3
 
 # cdef extern from "gphoto2/gphoto2-port-info-list.h":
 #  ctypedef enum GPPortType:
 GP_PORT_NONE = 0
-GP_PORT_SERIAL = 1
-GP_PORT_USB = 2
+GP_PORT_SERIAL = 1 << 0
+GP_PORT_USB = 1 << 2
+GP_PORT_DISK = 1 << 3
+GP_PORT_PTPIP = 1 << 4
 
 # gphoto constants
 # Defined in 'gphoto2-port-result.h'
 GP_OK = 0
+GP_ERROR = -1
+GP_ERROR_LIBRARY = -4
+GP_ERROR_NOT_SUPPORTED = -6
+GP_ERROR_IO = -7
+GP_ERROR_TIMEOUT = -10
+GP_ERROR_IO_INIT = -31
+GP_ERROR_IO_READ = -34
+GP_ERROR_IO_WRITE = -35
+GP_ERROR_IO_UPDATE = -37
+GP_ERROR_IO_USB_CLEAR_HALT = -51
+GP_ERROR_IO_USB_FIND = -52
+GP_ERROR_IO_USB_CLAIM = -53
+GP_ERROR_IO_LOCK = -60
+GP_ERROR_CORRUPTED_DATA = -102
+GP_ERROR_MODEL_NOT_FOUND = -105
+GP_ERROR_FILE_NOT_FOUND = -108
+GP_ERROR_CAMERA_BUSY = -110
+GP_ERROR_CANCEL = -112
+
+GP_CONTEXT_FEEDBACK_OK = 0
+GP_CONTEXT_FEEDBACK_CANCEL = 1
 # CameraCaptureType enum in 'gphoto2-camera.h'
 GP_CAPTURE_IMAGE = 0
 # CameraFileType enum in 'gphoto2-file.h'
+GP_FILE_TYPE_PREVIEW = 0
 GP_FILE_TYPE_NORMAL = 1
+GP_FILE_TYPE_RAW = 2
+GP_FILE_TYPE_AUDIO = 3
+GP_FILE_TYPE_EXIF = 4
+GP_FILE_TYPE_METADATA = 5
+
+# names accepted by Camera.download for the CameraFileType values
+FILE_KINDS = {
+    'preview': GP_FILE_TYPE_PREVIEW,
+    'normal': GP_FILE_TYPE_NORMAL,
+    'raw': GP_FILE_TYPE_RAW,
+    'exif': GP_FILE_TYPE_EXIF,
+}
+
+# file operation a driver must support to fetch each kind
+KIND_OPERATIONS = {
+    'preview': GP_FILE_OPERATION_PREVIEW,
+    'raw': GP_FILE_OPERATION_RAW,
+    'exif': GP_FILE_OPERATION_EXIF,
+}
+
+# cdef extern from "gphoto2/gphoto2-filesys.h":
+#  ctypedef enum CameraFileInfoFields:
+GP_FILE_INFO_NONE = 0
+GP_FILE_INFO_TYPE = 1 << 0
+GP_FILE_INFO_SIZE = 1 << 2
+GP_FILE_INFO_WIDTH = 1 << 3
+GP_FILE_INFO_HEIGHT = 1 << 4
+GP_FILE_INFO_PERMISSIONS = 1 << 5
+GP_FILE_INFO_STATUS = 1 << 6
+GP_FILE_INFO_MTIME = 1 << 7
+
+# size of the blocks moved by Camera.download_to
+DEFAULT_CHUNK_SIZE = 1024 * 1024
+
+# bytes of thumbnails kept by Camera.thumbnail_cache
+DEFAULT_THUMBNAIL_CACHE_SIZE = 64 * 1024 * 1024
+
+# config names used by the different drivers for common settings
+SHUTTER_SPEED_NAMES = ('shutterspeed', 'shutterspeed2', 'exposuretime')
+APERTURE_NAMES = ('aperture', 'f-number')
+ISO_NAMES = ('iso', 'isospeed', 'exposureindex')
+CAPTURE_TARGET_NAMES = ('capturetarget',)
+# capture target choices, lowercase, that keep images in the camera's RAM
+RAM_TARGETS = ('internal ram', 'sdram')
+# RAM captures downloaded but not yet deleted before capture_image stops
+# to delete them
+MAX_PENDING_DELETES = 4
 
 
 class ShutterError(Exception):
@@ -109,7 +363,6 @@ class ShutterError(Exception):
 
 
 def gp_library_version(verbose=True):
-    gp.gp_library_version.restype = ctypes.POINTER(ctypes.c_char_p)
     if not verbose:
         arr_text = gp.gp_library_version(GP_VERSION_SHORT)
     else:
@@ -119,13 +372,12 @@ def gp_library_version(verbose=True):
     for s in arr_text:
         if s is None:
             break
-        v += '%s\n' % s
+        v += '%s\n' % str(s, encoding='ascii')
     return v
 
 
 def check(result):
     if result < 0:
-        gp.gp_result_as_string.restype = ctypes.c_char_p
         message = str(gp.gp_result_as_string(result), encoding='ascii')
         raise ShutterError(result, message)
     return result
@@ -134,20 +386,158 @@ def check(result):
 def check_unref(result, camfile):
     if result != 0:
         gp.gp_file_unref(camfile.pointer)
-        gp.gp_result_as_string.restype = ctypes.c_char_p
-        message = gp.gp_result_as_string(result)
+        # so __del__ doesn't free it again
+        camfile._ptr = ctypes.c_void_p()
+        message = str(gp.gp_result_as_string(result), encoding='ascii')
         raise ShutterError(result, message)
 
 
+def encode(value):
+    """ Return value as bytes, suitable for passing to libgphoto2
+
+    :type value: str / bytes
+    :rtype: bytes
+    """
+    if isinstance(value, bytes):
+        return value
+    return value.encode('ascii')
+
+
+def join_path(folder, name):
+    """ Join a folder and a name into a path on the camera
+
+    :rtype: str
+    """
+    if folder.endswith('/'):
+        return folder + name
+    return folder + '/' + name
+
+
+def _get_writer(dest):
+    """ Return a function that writes a whole buffer to dest
+
+    dest may be a file descriptor, a socket, or any object with a write method.
+    """
+    if hasattr(dest, 'sendall'):
+        return dest.sendall
+
+    if isinstance(dest, int):
+        write = lambda view: os.write(dest, view)
+    else:
+        write = dest.write
+
+    def write_all(view):
+        view = memoryview(view)
+        while view:
+            written = write(view)
+            if written is None:
+                break
+            view = view[written:]
+
+    return write_all
+
+
+def _get_fileno(dest):
+    """ Return the file descriptor behind dest, or None
+
+    Buffered file objects are flushed first, so data written through
+    the descriptor lands after anything already written in python.
+    """
+    if isinstance(dest, int):
+        return dest
+    try:
+        fileno = dest.fileno()
+    except (AttributeError, IOError, ValueError):
+        return None
+    flush = getattr(dest, 'flush', None)
+    if flush is not None:
+        flush()
+    return fileno
+
+
 class CameraFilePathStruct(ctypes.Structure):
     _fields_ = [('name', (ctypes.c_char * 128)),
                 ('folder', (ctypes.c_char * 1024))]
 
 
+class CameraEvent(object):
+    """ Event reported by Camera.wait_for_event
+
+    type is one of the GP_EVENT_* values.  File and folder events carry the
+    CameraFilePathStruct of what was added in `path`; unknown events carry
+    the driver's description in `text`.
+    """
+    __slots__ = ('type', 'path', 'text')
+
+    def __init__(self, type, path=None, text=None):
+        self.type = type
+        self.path = path
+        self.text = text
+
+    def __repr__(self):
+        if self.path is not None:
+            return '<CameraEvent %d %s/%s>' % (self.type, self.folder,
+                                                self.name)
+        if self.text is not None:
+            return '<CameraEvent %d %r>' % (self.type, self.text)
+        return '<CameraEvent %d>' % self.type
+
+    @property
+    def folder(self):
+        """
+        :rtype: str
+        """
+        if self.path is None:
+            return None
+        return str(self.path.folder, encoding='ascii')
+
+    @property
+    def name(self):
+        """
+        :rtype: str
+        """
+        if self.path is None:
+            return None
+        return str(self.path.name, encoding='ascii')
+
+
 class CameraTextStruct(ctypes.Structure):
     _fields_ = [('text', (ctypes.c_char * (32 * 1024)))]
 
 
+class CameraFileInfoPreviewStruct(ctypes.Structure):
+    _fields_ = [('fields', ctypes.c_int),
+                ('status', ctypes.c_int),
+                ('size', ctypes.c_uint64),
+                ('type', (ctypes.c_char * 64)),
+                ('width', ctypes.c_uint32),
+                ('height', ctypes.c_uint32)]
+
+
+class CameraFileInfoFileStruct(ctypes.Structure):
+    _fields_ = [('fields', ctypes.c_int),
+                ('status', ctypes.c_int),
+                ('size', ctypes.c_uint64),
+                ('type', (ctypes.c_char * 64)),
+                ('width', ctypes.c_uint32),
+                ('height', ctypes.c_uint32),
+                ('permissions', ctypes.c_int),
+                ('mtime', ctypes.c_long)]
+
+
+class CameraFileInfoAudioStruct(ctypes.Structure):
+    _fields_ = [('fields', ctypes.c_int),
+                ('status', ctypes.c_int),
+                ('size', ctypes.c_uint64),
+                ('type', (ctypes.c_char * 64))]
+
+
+class CameraFileInfoStruct(ctypes.Structure):
+    _fields_ = [('preview', CameraFileInfoPreviewStruct),
+                ('file', CameraFileInfoFileStruct),
+                ('audio', CameraFileInfoAudioStruct)]
+
+
 class CameraAbilitiesStruct(ctypes.Structure):
     _fields_ = [('model', (ctypes.c_char * 128)),
                 ('status', ctypes.c_int),
@@ -173,22 +563,157 @@ class CameraAbilitiesStruct(ctypes.Structure):
                 ('reserved8', ctypes.c_int)]
 
 
-class PortInfoStruct(ctypes.Structure):
-    _fields_ = [
-        ('type', ctypes.c_int),  # enum is 32 bits on 32 and 64 bit Linux
-        ('name', (ctypes.c_char * 64)),
-        ('path', (ctypes.c_char * 64)),
-        ('library_filename', (ctypes.c_char * 1024))
-    ]
-
-
-class PortInfoStruct(ctypes.Structure):
-    _fields_ = [
-        ('type', ctypes.c_int),  # enum is 32 bits on 32 and 64 bit Linux
-        ('name', (ctypes.c_char)),
-        ('path', (ctypes.c_char)),
-        ('library_filename', (ctypes.c_char))
-    ]
+# callbacks a GPContext reports progress, errors and cancellation through
+ContextCancelFunc = ctypes.CFUNCTYPE(ctypes.c_int, ctypes.c_void_p,
+                                     ctypes.c_void_p)
+ContextErrorFunc = ctypes.CFUNCTYPE(None, ctypes.c_void_p, ctypes.c_char_p,
+                                    ctypes.c_void_p)
+ContextProgressStartFunc = ctypes.CFUNCTYPE(
+    ctypes.c_uint, ctypes.c_void_p, ctypes.c_float, ctypes.c_char_p,
+    ctypes.c_void_p)
+ContextProgressUpdateFunc = ctypes.CFUNCTYPE(
+    None, ctypes.c_void_p, ctypes.c_uint, ctypes.c_float, ctypes.c_void_p)
+ContextProgressStopFunc = ctypes.CFUNCTYPE(
+    None, ctypes.c_void_p, ctypes.c_uint, ctypes.c_void_p)
+
+
+# argument and return types of every libgphoto2 function used by shutter.
+# load() applies them once, so calls are checked and converted without
+# ctypes having to guess.  Functions missing from older libraries are skipped.
+_c_int = ctypes.c_int
+_c_void_p = ctypes.c_void_p
+_c_char_p = ctypes.c_char_p
+_P = ctypes.POINTER
+
+PROTOTYPES = {
+    'gp_context_new': (_c_void_p, []),
+    'gp_context_unref': (None, [_c_void_p]),
+    'gp_context_set_cancel_func':
+        (None, [_c_void_p, ContextCancelFunc, _c_void_p]),
+    'gp_context_set_error_func':
+        (None, [_c_void_p, ContextErrorFunc, _c_void_p]),
+    'gp_context_set_progress_funcs':
+        (None, [_c_void_p, ContextProgressStartFunc,
+                ContextProgressUpdateFunc, ContextProgressStopFunc,
+                _c_void_p]),
+    'gp_library_version': (_P(_c_char_p), [_c_int]),
+    'gp_result_as_string': (_c_char_p, [_c_int]),
+
+    'gp_camera_new': (_c_int, [_P(_c_void_p)]),
+    'gp_camera_init': (_c_int, [_c_void_p, _c_void_p]),
+    'gp_camera_exit': (_c_int, [_c_void_p, _c_void_p]),
+    'gp_camera_unref': (_c_int, [_c_void_p]),
+    'gp_camera_autodetect': (_c_int, [_c_void_p, _c_void_p]),
+    'gp_camera_get_summary':
+        (_c_int, [_c_void_p, _P(CameraTextStruct), _c_void_p]),
+    'gp_camera_get_about':
+        (_c_int, [_c_void_p, _P(CameraTextStruct), _c_void_p]),
+    'gp_camera_get_abilities':
+        (_c_int, [_c_void_p, _P(CameraAbilitiesStruct)]),
+    'gp_camera_set_abilities': (_c_int, [_c_void_p, CameraAbilitiesStruct]),
+    'gp_camera_get_port_info': (_c_int, [_c_void_p, _P(_c_void_p)]),
+    'gp_camera_set_port_info': (_c_int, [_c_void_p, _c_void_p]),
+    'gp_camera_capture':
+        (_c_int, [_c_void_p, _c_int, _P(CameraFilePathStruct), _c_void_p]),
+    'gp_camera_trigger_capture': (_c_int, [_c_void_p, _c_void_p]),
+    'gp_camera_capture_preview': (_c_int, [_c_void_p, _c_void_p, _c_void_p]),
+    'gp_camera_file_get':
+        (_c_int, [_c_void_p, _c_char_p, _c_char_p, _c_int, _c_void_p,
+                  _c_void_p]),
+    'gp_camera_file_read':
+        (_c_int, [_c_void_p, _c_char_p, _c_char_p, _c_int, ctypes.c_uint64,
+                  _c_void_p, _P(ctypes.c_uint64), _c_void_p]),
+    'gp_camera_file_delete':
+        (_c_int, [_c_void_p, _c_char_p, _c_char_p, _c_void_p]),
+    'gp_camera_file_get_info':
+        (_c_int, [_c_void_p, _c_char_p, _c_char_p,
+                  _P(CameraFileInfoStruct), _c_void_p]),
+    'gp_camera_folder_list_folders':
+        (_c_int, [_c_void_p, _c_char_p, _c_void_p, _c_void_p]),
+    'gp_camera_folder_list_files':
+        (_c_int, [_c_void_p, _c_char_p, _c_void_p, _c_void_p]),
+    'gp_camera_wait_for_event':
+        (_c_int, [_c_void_p, _c_int, _P(_c_int), _P(_c_void_p), _c_void_p]),
+    'gp_camera_get_config': (_c_int, [_c_void_p, _P(_c_void_p), _c_void_p]),
+    'gp_camera_set_config': (_c_int, [_c_void_p, _c_void_p, _c_void_p]),
+
+    'gp_list_new': (_c_int, [_P(_c_void_p)]),
+    'gp_list_unref': (_c_int, [_c_void_p]),
+    'gp_list_reset': (_c_int, [_c_void_p]),
+    'gp_list_count': (_c_int, [_c_void_p]),
+    'gp_list_append': (_c_int, [_c_void_p, _c_char_p, _c_char_p]),
+    'gp_list_sort': (_c_int, [_c_void_p]),
+    'gp_list_find_by_name': (_c_int, [_c_void_p, _P(_c_int), _c_char_p]),
+    'gp_list_get_name': (_c_int, [_c_void_p, _c_int, _P(_c_char_p)]),
+    'gp_list_get_value': (_c_int, [_c_void_p, _c_int, _P(_c_char_p)]),
+    'gp_list_set_name': (_c_int, [_c_void_p, _c_int, _c_char_p]),
+    'gp_list_set_value': (_c_int, [_c_void_p, _c_int, _c_char_p]),
+
+    'gp_file_new': (_c_int, [_P(_c_void_p)]),
+    'gp_file_new_from_fd': (_c_int, [_P(_c_void_p), _c_int]),
+    'gp_file_unref': (_c_int, [_c_void_p]),
+    'gp_file_get_data_and_size':
+        (_c_int, [_c_void_p, _P(_c_void_p), _P(ctypes.c_ulong)]),
+    'gp_file_save': (_c_int, [_c_void_p, _c_char_p]),
+    'gp_file_get_name': (_c_int, [_c_void_p, _P(_c_char_p)]),
+    'gp_file_set_name': (_c_int, [_c_void_p, _c_char_p]),
+
+    'gp_widget_free': (_c_int, [_c_void_p]),
+    'gp_widget_get_name': (_c_int, [_c_void_p, _P(_c_char_p)]),
+    'gp_widget_get_label': (_c_int, [_c_void_p, _P(_c_char_p)]),
+    'gp_widget_get_type': (_c_int, [_c_void_p, _P(_c_int)]),
+    'gp_widget_get_readonly': (_c_int, [_c_void_p, _P(_c_int)]),
+    'gp_widget_count_children': (_c_int, [_c_void_p]),
+    'gp_widget_get_child': (_c_int, [_c_void_p, _c_int, _P(_c_void_p)]),
+    'gp_widget_count_choices': (_c_int, [_c_void_p]),
+    'gp_widget_get_choice': (_c_int, [_c_void_p, _c_int, _P(_c_char_p)]),
+    'gp_widget_get_range':
+        (_c_int, [_c_void_p, _P(ctypes.c_float), _P(ctypes.c_float),
+                  _P(ctypes.c_float)]),
+    'gp_widget_get_value': (_c_int, [_c_void_p, _c_void_p]),
+    'gp_widget_set_value': (_c_int, [_c_void_p, _c_void_p]),
+
+    'gp_abilities_list_new': (_c_int, [_P(_c_void_p)]),
+    'gp_abilities_list_load': (_c_int, [_c_void_p, _c_void_p]),
+    'gp_abilities_list_count': (_c_int, [_c_void_p]),
+    'gp_abilities_list_detect':
+        (_c_int, [_c_void_p, _c_void_p, _c_void_p, _c_void_p]),
+    'gp_abilities_list_lookup_model': (_c_int, [_c_void_p, _c_char_p]),
+    'gp_abilities_list_get_abilities':
+        (_c_int, [_c_void_p, _c_int, _P(CameraAbilitiesStruct)]),
+
+    'gp_port_info_list_new': (_c_int, [_P(_c_void_p)]),
+    'gp_port_info_list_load': (_c_int, [_c_void_p]),
+    'gp_port_info_list_count': (_c_int, [_c_void_p]),
+    'gp_port_info_list_lookup_path': (_c_int, [_c_void_p, _c_char_p]),
+    'gp_port_info_list_get_info':
+        (_c_int, [_c_void_p, _c_int, _P(_c_void_p)]),
+    'gp_port_info_get_name': (_c_int, [_c_void_p, _P(_c_char_p)]),
+    'gp_port_info_get_path': (_c_int, [_c_void_p, _P(_c_char_p)]),
+    'gp_port_info_get_type': (_c_int, [_c_void_p, _P(_c_int)]),
+    'gp_port_info_get_library_filename':
+        (_c_int, [_c_void_p, _P(_c_char_p)]),
+}
+
+
+def bind_prototypes(dll):
+    """ Apply PROTOTYPES to the functions of dll
+
+    Returns:
+        functions (dict): the prototyped function for each name found
+
+    :rtype: dict
+    """
+    functions = dict()
+    for name, (restype, argtypes) in PROTOTYPES.items():
+        try:
+            func = getattr(dll, name)
+        except AttributeError:
+            continue
+        func.restype = restype
+        func.argtypes = argtypes
+        functions[name] = func
+    return functions
 
 
 class Camera(object):
@@ -198,51 +723,107 @@ class Camera(object):
     This is a thin ctypes wrapper about libgphoto2 Camera, with a few tweaks.
     """
 
-    def __init__(self, regex=None):
+    def __init__(self, regex=None, context=None, abilities=None,
+                 port_info=None):
+        if context is None:
+            context = get_context()
+        self._context = context
+        self._config = None
+        self._listing = None
+        self._thumbnail_cache = None
+        self._initialized = False
+        self._abilities = None
+        self._ram_target = None     # (widget, card choice) while in RAM mode
+        self._deletes = collections.deque()
+        # scratch structures reused by every call that needs them; a
+        # camera is only used from one thread at a time
+        self._path = CameraFilePathStruct()
+        self._path_ptr = PTR(self._path)
+        self._text_ptr = None
+        self._list = None
         self._ptr = ctypes.c_void_p()
         check(gp.gp_camera_new(PTR(self._ptr)))
 
-        if regex:
-            cl = CameraList(autodetect=True)
-            for name, path in cl.as_list():
-                m = regex.search(name.lower())
-                if m:
-                    abl = CameraAbilities()
-                    al = CameraAbilitiesList()
-
-                    # get the port
-                    pi = PortInfoList()
-                    index = pi.lookup_path(path)
-                    port = pi.get_info(index)
-
-                    # get the model
-                    model = al.lookup_model(name)
-                    al.get_abilities(model, abl)
-
-                    # set our attributes
-                    self.abilities = abl
-                    self.port_info = port
-
-        val = gp.gp_camera_init(self._ptr, context)
-        if val == -60:
+        if regex and abilities is None:
+            from .discovery import discover
+            for info in discover(regex, context=context):
+                abilities = info.abilities
+                port_info = info.port_info
+                break
+
+        if abilities is not None:
+            self.abilities = abilities
+        if port_info is not None:
+            self.port_info = port_info
+
+        val = gp.gp_camera_init(self._ptr, self._context)
+        if val == GP_ERROR_IO_LOCK:
             raise ShutterError(val, "cannot init camera")
 
         check(val)
+        self._initialized = True
 
     def __del__(self):
-        check(gp.gp_camera_exit(self._ptr))
-        check(gp.gp_camera_unref(self._ptr))
+        # __init__ may have failed before the camera was allocated
+        if getattr(self, '_ptr', None):
+            self.close()
+            check(gp.gp_camera_unref(self._ptr))
 
     def close(self):
         """
         Close connection to camera.
+
+        Does nothing if the connection is already closed.
         """
-        check(gp.gp_camera_exit(self._ptr, context))
+        if not self._initialized:
+            return
+        try:
+            self.delete_pending()
+        finally:
+            self._initialized = False
+            # the tree belongs to this session, and refers back to the
+            # camera; dropping it lets the camera be freed without the gc
+            config, self._config = self._config, None
+            if config is not None:
+                config.invalidate()
+            check(gp.gp_camera_exit(self._ptr, self._context))
+
+    @property
+    def closed(self):
+        """
+        :rtype: bool
+        """
+        return not self._initialized
 
     @property
     def pointer(self):
         return self._ptr
 
+    def operation(self, progress=None, timeout=None, deadline=None,
+                  token=None):
+        """ Run the calls in a with block under a context of their own
+
+        The context reports progress, and cancels the calls when asked to
+        or when the deadline passes.
+
+            with camera.operation(progress=show, timeout=60) as op:
+                camera.download_to(folder, name, fp)
+
+        Kwargs:
+            progress (callable): called as progress(current, total, rate)
+            timeout (float): seconds until the calls are cancelled
+            deadline (float): time.monotonic() when the calls are cancelled
+            token (shutter.operation.CancelToken): cancels the calls
+
+        Returns:
+            operation (shutter.operation.Operation)
+
+        A cancelled call raises ShutterError with GP_ERROR_CANCEL, or
+        GP_ERROR_TIMEOUT if the deadline passed.
+        """
+        from .operation import Operation
+        return Operation(self, progress, timeout, deadline, token)
+
     @property
     def summary(self):
         """ Returns information about the camera.
@@ -250,9 +831,9 @@ class Camera(object):
         Returns:
             summary (dict): information about the camera
         """
-        txt = CameraTextStruct()
-        check(gp.gp_camera_get_summary(self._ptr, PTR(txt), context))
-        summary = str(txt.text, encoding='ascii')
+        txt = self._get_text_ptr()
+        check(gp.gp_camera_get_summary(self._ptr, txt, self._context))
+        summary = str(txt.contents.text, encoding='ascii')
         r = dict()
         for l in summary.splitlines():
             try:
@@ -269,9 +850,22 @@ class Camera(object):
         Returns:
             info (str): Typically, is author, acknowledgements, etc.
         """
-        txt = CameraTextStruct()
-        check(gp.gp_camera_get_about(self._ptr, PTR(txt), context))
-        return str(txt.text, encoding='ascii')
+        txt = self._get_text_ptr()
+        check(gp.gp_camera_get_about(self._ptr, txt, self._context))
+        return str(txt.contents.text, encoding='ascii')
+
+    def _get_text_ptr(self):
+        # 32k, so only allocated for cameras that are asked for text
+        if self._text_ptr is None:
+            self._text_ptr = PTR(CameraTextStruct())
+        return self._text_ptr
+
+    def _get_list(self):
+        if self._list is None:
+            self._list = CameraList()
+        else:
+            self._list.reset()
+        return self._list
 
     @property
     def abilities(self):
@@ -279,9 +873,12 @@ class Camera(object):
 
         :rtype: CameraAbilities
         """
-        ab = CameraAbilities()
-        check(gp.gp_camera_get_abilities(self._ptr, PTR(ab.pointer)))
-        return ab
+        # abilities don't change while the camera is open
+        if self._abilities is None:
+            ab = CameraAbilities()
+            check(gp.gp_camera_get_abilities(self._ptr, PTR(ab.pointer)))
+            self._abilities = ab
+        return self._abilities
 
     @abilities.setter
     def abilities(self, ab):
@@ -291,6 +888,7 @@ class Camera(object):
         :return:
         """
         check(gp.gp_camera_set_abilities(self._ptr, ab.pointer))
+        self._abilities = None
 
     @property
     def port_info(self):
@@ -311,48 +909,256 @@ class Camera(object):
         check(gp.gp_camera_set_port_info(self._ptr, info.pointer))
 
     @property
+    def config(self):
+        """ The configuration of the camera
+
+        The whole widget tree is fetched once and cached.  It is refreshed
+        after wait_for_event reports a property change.
+
+        :rtype: CameraConfig
+        """
+        if self._config is None:
+            self._config = CameraConfig(self)
+        return self._config
+
+    def _get_setting(self, names):
+        config = self.config
+        for name in names:
+            if name in config:
+                return config[name]
+        return None
+
+    def _set_setting(self, names, value):
+        config = self.config
+        for name in names:
+            if name in config:
+                config[name] = value
+                config.apply()
+                return
+        raise ShutterError(GP_ERROR_NOT_SUPPORTED,
+                           'camera has no %s setting' % names[0])
+
+    @property
+    def shutter_speed(self):
+        """ Shutter speed, as the camera names it, ie. '1/250'
+
+        Setting this commits it to the camera right away; to change several
+        settings in one round trip, use config and CameraConfig.apply.
+
+        :rtype: str
+        """
+        return self._get_setting(SHUTTER_SPEED_NAMES)
+
+    @shutter_speed.setter
     def shutter_speed(self, value):
-        pass
+        self._set_setting(SHUTTER_SPEED_NAMES, value)
 
     @property
+    def aperture(self):
+        """ Aperture, as the camera names it, ie. '5.6'
+
+        :rtype: str
+        """
+        return self._get_setting(APERTURE_NAMES)
+
+    @aperture.setter
     def aperture(self, value):
-        pass
+        self._set_setting(APERTURE_NAMES, value)
+
+    @property
+    def iso(self):
+        """ ISO speed, as the camera names it, ie. '400'
+
+        :rtype: str
+        """
+        return self._get_setting(ISO_NAMES)
+
+    @iso.setter
+    def iso(self, value):
+        self._set_setting(ISO_NAMES, value)
+
+    def _find_ram_target(self):
+        """ (widget, choice) that sets capture to RAM, or None
+        """
+        if not self.abilities.file_operations & GP_FILE_OPERATION_DELETE:
+            return None
+        config = self.config
+        for name in CAPTURE_TARGET_NAMES:
+            if name in config:
+                for choice in config.choices(name):
+                    if choice.lower() in RAM_TARGETS:
+                        return name, choice
+        return None
+
+    @property
+    def can_capture_to_ram(self):
+        """ Whether the camera can capture to RAM, and delete files after
+
+        :rtype: bool
+        """
+        return self._find_ram_target() is not None
+
+    @property
+    def capture_to_ram(self):
+        """ Whether capture_image keeps images off the memory card
+
+        In RAM mode the camera doesn't write images to its card.
+        capture_image and burst download each image from RAM, then queue
+        its deletion.  Deletions run while the camera is idle: when
+        wait_for_event or close is called, or delete_pending.  If
+        MAX_PENDING_DELETES are waiting, the next capture deletes them
+        first, so the camera's RAM doesn't fill.
+
+        Setting True on a camera that can't capture to RAM leaves it False
+        and keeps capturing to the card.  Setting False restores the
+        capture target the camera had before.
+
+        :rtype: bool
+        """
+        return self._ram_target is not None
+
+    @capture_to_ram.setter
+    def capture_to_ram(self, value):
+        if bool(value) == self.capture_to_ram:
+            return
+        if value:
+            found = self._find_ram_target()
+            if found is None:
+                return
+            name, choice = found
+            previous = self._set_now(name, choice)
+            self._ram_target = name, previous
+        else:
+            self.delete_pending()
+            name, previous = self._ram_target
+            self._ram_target = None
+            self._set_now(name, previous)
+
+    def _set_now(self, name, value):
+        """ Send one setting to the camera; return its old value
+
+        It goes through a config of its own, so changes queued on config
+        stay queued.
+        """
+        config = CameraConfig(self)
+        previous = config[name]
+        config[name] = value
+        config.apply()
+        if self._config is not None:
+            # the cached tree still holds the old value; queued changes
+            # are kept
+            self._config.invalidate()
+        return previous
+
+    def delete_file(self, folder, name):
+        """ Delete a file from the camera
+
+        Raises:
+            ShutterError
+        """
+        check(gp.gp_camera_file_delete(self._ptr, encode(folder),
+                                       encode(name), self._context))
+        if self._listing is not None:
+            # list the folder again on the next walk
+            self._listing.pop(str(encode(folder), encoding='ascii'), None)
+
+    def delete_pending(self):
+        """ Delete the RAM captures that were downloaded
+
+        Files the camera already dropped on its own are skipped.
 
-    def capture_image(self, destpath=None):
+        Returns:
+            count (int): files deleted
+
+        Raises:
+            ShutterError
+        """
+        count = 0
+        deletes = self._deletes
+        while deletes:
+            folder, name = deletes[0]
+            try:
+                self.delete_file(folder, name)
+                count += 1
+            except ShutterError as e:
+                if e.result != GP_ERROR_FILE_NOT_FOUND:
+                    raise
+            deletes.popleft()
+        return count
+
+    def capture_image(self, destpath=None, return_buffer=False, writer=None,
+                      digests=None, index=None):
         """ Capture an image and store it to the camera.
 
         Kwargs:
             path (str): If specified, file will be saved here, else returned data
+            return_buffer (bool): Return a read-only memoryview, not bytes
+            writer (shutter.writer.DiskWriter): Save the file to destpath
+                in the background; call writer.flush() to wait for it
+            digests: hash the image in memory with these hashlib
+                algorithms; see shutter.digest
+            index (shutter.digest.DigestIndex): record the image's digests
 
         Returns:
-            path (str): where the file was saved, either on camera or host
+            path (str): where the file was saved, either on camera or host.
+                With digests or index, (path or data, digests) where
+                digests maps each algorithm to its hex digest.
 
         Raises:
             ShutterError
 
         If destpath is passed, then the image will be saved on the host.
-        Otherwise, the image data will be returned directly.
+        Otherwise, the image data will be returned directly.  See
+        capture_to_ram to keep images off the memory card.
 
-        :rtype: bytes
+        With return_buffer, the image is not copied out of libgphoto2; see
+        CameraFile.get_buffer.
+
+        :rtype: bytes / memoryview
         """
-        path = CameraFilePathStruct()
+        if len(self._deletes) >= MAX_PENDING_DELETES:
+            self.delete_pending()
+
+        path = self._path
         f = gp.gp_camera_capture
-        val = f(self._ptr, GP_CAPTURE_IMAGE, PTR(path), context)
+        val = f(self._ptr, GP_CAPTURE_IMAGE, self._path_ptr, self._context)
         check(val)
 
-        if destpath:
-            destpath = destpath.encode('ascii')
-            self.download_and_save(path.folder, path.name, destpath)
-            return destpath
+        cfile = self.download(path.folder, path.name)
+        if self._ram_target is not None:
+            # the data is in host memory now
+            self._deletes.append((path.folder, path.name))
+        if digests is None and index is None:
+            hashes = None
         else:
-            cfile = self.download(path.folder, path.name)
-            return cfile.get_data()
+            key = self._index_key(index, path.folder, path.name)
+            hashes = self._record(cfile, index, key, digests)
 
-    def capture_preview(self, destpath=None):
+        if destpath:
+            if writer is not None:
+                writer.write(destpath, cfile.get_buffer())
+            else:
+                cfile.save(destpath)
+            result = destpath
+        elif return_buffer:
+            result = cfile.get_buffer()
+        else:
+            result = cfile.get_data()
+        if hashes is None:
+            return result
+        return result, hashes
+
+    def capture_preview(self, destpath=None, camfile=None,
+                        return_buffer=False, as_array=False, out=None,
+                        pool=None):
         """ Captures preview image and return the data (or save it)
 
         Kwargs:
             path (str): If specified, file will be saved here
+            camfile (CameraFile): Reuse this file instead of allocating one
+            return_buffer (bool): Return a read-only memoryview, not bytes
+            as_array (bool): Return the decoded frame as a numpy array;
+                see CameraFile.to_array for out and pool
 
         Returns:
             CameraFile object
@@ -363,42 +1169,315 @@ class Camera(object):
         The preview image format varies in different camera models.  Generally,
         the image will not have the full detail/resolution of the camera.
 
-        :rtype: bytes
+        A buffer returned from a reused camfile is only valid until the next
+        preview is captured into it.
+
+        :rtype: bytes / memoryview / numpy.ndarray
         """
-        cfile = CameraFile()
+        if camfile is None:
+            camfile = CameraFile()
         f = gp.gp_camera_capture_preview
-        check(f(self._ptr, cfile.pointer, context))
+        check(f(self._ptr, camfile.pointer, self._context))
 
         if destpath:
-            cfile.save(destpath)
+            camfile.save(destpath)
             return destpath
+        elif as_array:
+            return camfile.to_array(out, pool)
+        elif return_buffer:
+            return camfile.get_buffer()
         else:
-            return cfile.get_data()
+            return camfile.get_data()
 
     def download_and_save(self, srcfolder, srcfilename, destpath):
         """ Download a file from the camera's filesystem.
 
-        :type srcfolder: str
-        :type srcfilename: str
-        :type destpath: str
+        :type srcfolder: str / bytes
+        :type srcfilename: str / bytes
+        :type destpath: str / bytes
 
         :return: None
         """
-        srcfolder = srcfolder.encode('ascii')
-        srcfilename = srcfilename.encode('ascii')
-        destpath = destpath.encode('ascii')
+        self.download(srcfolder, srcfilename).save(destpath)
 
-        cfile = self.download(srcfolder, srcfilename)
-        cfile.save(destpath)
-        check(gp.gp_file_unref(cfile.pointer))
-
-    def download(self, srcfolder, srcfilename):
+    def download(self, srcfolder, srcfilename, kind='normal', digests=None,
+                 index=None):
         """ Download a file from the camera and return the image data
 
+        Kwargs:
+            kind (str): 'normal' for the file itself, 'preview' for its
+                thumbnail, 'exif' for its EXIF data, or 'raw'
+            digests: hash the file in memory with these hashlib
+                algorithms; see shutter.digest
+            index (shutter.digest.DigestIndex): skip the file if the index
+                has its digests, and record them otherwise
+
+        Returns:
+            cfile (CameraFile).  With digests or index, (cfile, digests)
+            where digests maps each algorithm to its hex digest; cfile is
+            None if the file was skipped.
+
         :return: cfile
         """
-        cfile = CameraFile(self._ptr, srcfolder, srcfilename)
-        return cfile
+        try:
+            type = FILE_KINDS[kind]
+        except KeyError:
+            raise ValueError('unknown kind of file: %r' % kind)
+        if digests is None and index is None:
+            return CameraFile(self._ptr, srcfolder, srcfilename,
+                              self._context, type)
+
+        key = self._index_key(index, srcfolder, srcfilename, kind)
+        known = self._known(index, key, digests)
+        if known is not None:
+            return None, known
+        cfile = CameraFile(self._ptr, srcfolder, srcfilename, self._context,
+                           type)
+        return cfile, self._record(cfile, index, key, digests)
+
+    def _index_key(self, index, folder, name, kind='normal', info=None):
+        """ Key of a file in a DigestIndex; None without an index
+        """
+        if index is None:
+            return None
+        from .digest import file_key
+        if info is None:
+            info = self.get_file_info(folder, name)
+        key = file_key(folder, name, info)
+        if key is not None and kind != 'normal':
+            key += ':' + kind
+        return key
+
+    @staticmethod
+    def _known(index, key, digests):
+        """ Digests the index has for a file, if it has all asked for
+        """
+        if key is None:
+            return None
+        known = index.get(key)
+        if known is None:
+            return None
+        from .digest import algorithms
+        names = algorithms(digests)
+        if not all(name in known for name in names):
+            return None
+        return dict((name, known[name]) for name in names)
+
+    @staticmethod
+    def _record(cfile, index, key, digests):
+        """ Hash a downloaded file and add it to the index
+        """
+        from .digest import algorithms
+        hashes = cfile.digest(*algorithms(digests))
+        if key is not None:
+            index.add(key, hashes)
+        return hashes
+
+    def supports(self, kind):
+        """ Whether the driver can fetch this kind of file; see download
+
+        :type kind: str
+        :rtype: bool
+        """
+        operation = KIND_OPERATIONS.get(kind)
+        if operation is None:
+            return kind in FILE_KINDS
+        return bool(self.abilities.file_operations & operation)
+
+    @property
+    def thumbnail_cache(self):
+        """ Cache used by thumbnails() when it isn't given one
+
+        :rtype: shutter.cache.LRUCache
+        """
+        if self._thumbnail_cache is None:
+            from .cache import LRUCache
+            self._thumbnail_cache = LRUCache(DEFAULT_THUMBNAIL_CACHE_SIZE)
+        return self._thumbnail_cache
+
+    def thumbnails(self, folder, names=None, cache=None):
+        """ Fetch the thumbnails of the files in a folder
+
+        Thumbnails are kept in a cache keyed by folder, name and
+        modification time, so browsing a folder again only transfers the
+        thumbnails of new or changed files.
+
+        Args:
+            folder (str): folder on the camera
+
+        Kwargs:
+            names (list): only these files; all files in folder by default
+            cache (LRUCache): cache to use instead of thumbnail_cache
+
+        Yields:
+            (name, data) for each file, with data as bytes
+
+        Raises:
+            ShutterError
+        """
+        if not self.supports('preview'):
+            raise ShutterError(GP_ERROR_NOT_SUPPORTED,
+                               'camera driver has no thumbnails')
+        if cache is None:
+            cache = self.thumbnail_cache
+        if names is None:
+            names = [name for name, value in self.list_files(folder)]
+
+        for name in names:
+            info = self.get_file_info(folder, name)
+            mtime = info.mtime if info.fields & GP_FILE_INFO_MTIME else None
+            key = folder, name, mtime
+            data = cache.get(key)
+            if data is None:
+                data = self.download(folder, name, 'preview').get_data()
+                cache.put(key, data, len(data))
+            yield name, data
+
+    def download_to(self, srcfolder, srcfilename, dest,
+                    chunk_size=DEFAULT_CHUNK_SIZE, progress=None, offset=0,
+                    digests=None, index=None):
+        """ Download a file from the camera straight into dest
+
+        Args:
+            srcfolder (str): folder on the camera
+            srcfilename (str): name of the file on the camera
+            dest: file descriptor, socket, or object with a write method
+
+        Kwargs:
+            chunk_size (int): bytes read from the camera at a time
+            progress (callable): called as progress(transferred, total)
+                after every chunk.  total is None if the camera doesn't
+                report the size of the file.
+            offset (int): skip this many bytes of the file, ie. to resume
+                an interrupted download
+            digests: hash the chunks with these hashlib algorithms as they
+                are written; see shutter.digest
+            index (shutter.digest.DigestIndex): skip the file if the index
+                has its digests, and record them otherwise
+
+        Returns:
+            size (int): number of bytes written to dest.  With digests or
+                index, (size, digests) where digests maps each algorithm to
+                its hex digest; size is None if the file was skipped.
+
+        Raises:
+            ShutterError
+            ValueError: if hashing a download resumed at an offset
+
+        The file is never held in memory as a whole.  If the driver supports
+        partial reads, it is copied chunk_size bytes at a time through one
+        reused buffer.  Otherwise, if dest has a file descriptor, libgphoto2
+        writes to it directly.  As a last resort, the file is downloaded to
+        memory and written out from there without another copy.  Hashing
+        rules out the descriptor, as the data wouldn't pass through Python.
+        """
+        srcfolder = encode(srcfolder)
+        srcfilename = encode(srcfilename)
+        write = _get_writer(dest)
+
+        total = None
+        info = None
+        try:
+            info = self.get_file_info(srcfolder, srcfilename)
+        except ShutterError:
+            pass
+        else:
+            if info.fields & GP_FILE_INFO_SIZE:
+                total = info.size
+
+        hasher = key = None
+        if digests is not None or index is not None:
+            if offset:
+                raise ValueError('cannot hash a download resumed at %d' %
+                                 offset)
+            from .digest import Hasher
+            if info is not None:
+                key = self._index_key(index, srcfolder, srcfilename,
+                                      info=info)
+            known = self._known(index, key, digests)
+            if known is not None:
+                return None, known
+            hasher = Hasher(digests)
+            write = hasher.wrap(write)
+
+        buf = ctypes.create_string_buffer(chunk_size)
+        view = memoryview(buf).cast('B')
+        size = ctypes.c_uint64()
+        start = offset
+        written = None
+        f = gp.gp_camera_file_read
+        while True:
+            if total is not None and offset >= total:
+                written = offset - start
+                break
+            size.value = chunk_size
+            val = f(self._ptr, srcfolder, srcfilename, GP_FILE_TYPE_NORMAL,
+                    ctypes.c_uint64(offset), buf, PTR(size), self._context)
+            if val == GP_ERROR_NOT_SUPPORTED and offset == start:
+                break
+            check(val)
+            if not size.value:
+                written = offset - start
+                break
+            write(view[:size.value])
+            offset += size.value
+            if progress is not None:
+                progress(offset, total)
+
+        if written is None:
+            written = self._download_whole(srcfolder, srcfilename, dest,
+                                           write, chunk_size, start,
+                                           total, hasher is None)
+            if progress is not None:
+                progress(start + (written or 0), total)
+
+        if hasher is None:
+            return written
+        hashes = hasher.hexdigests()
+        if key is not None:
+            index.add(key, hashes)
+        return written, hashes
+
+    def _download_whole(self, srcfolder, srcfilename, dest, write,
+                        chunk_size, start, total, use_fd):
+        """ download_to for drivers without partial reads
+        """
+        fileno = _get_fileno(dest)
+        if use_fd and fileno is not None and not start and \
+                not hasattr(dest, 'sendall'):
+            try:
+                start = os.lseek(fileno, 0, os.SEEK_CUR)
+            except OSError:
+                start = None
+
+            # libgphoto2 closes the descriptor when the file is freed
+            cfile = CameraFile.from_fd(os.dup(fileno))
+            f = gp.gp_camera_file_get
+            check(f(self._ptr, srcfolder, srcfilename, GP_FILE_TYPE_NORMAL,
+                    cfile.pointer, self._context))
+            del cfile
+
+            if start is None:
+                return total
+            return os.lseek(fileno, 0, os.SEEK_CUR) - start
+
+        data = self.download(srcfolder, srcfilename).get_buffer()[start:]
+        for i in range(0, len(data), chunk_size):
+            write(data[i:i + chunk_size])
+        return len(data)
+
+    def get_file_info(self, folder, name):
+        """ Get information about a file on the camera
+
+        :type folder: str
+        :type name: str
+        :rtype: CameraFileInfo
+        """
+        info = CameraFileInfo()
+        f = gp.gp_camera_file_get_info
+        check(f(self._ptr, encode(folder), encode(name), PTR(info.pointer),
+                self._context))
+        return info
 
     def list_folders(self, path="/"):
         """ List folders in path.
@@ -410,9 +1489,9 @@ class Camera(object):
             path = '/'
 
         path = path.encode('ascii')
-        l = CameraList()
+        l = self._get_list()
         f = gp.gp_camera_folder_list_folders
-        check(f(self._ptr, str(path), l.pointer, context))
+        check(f(self._ptr, path, l.pointer, self._context))
         return l.as_list()
 
     def list_files(self, path=None):
@@ -425,24 +1504,189 @@ class Camera(object):
             path = '/'
 
         path = path.encode('ascii')
-        l = CameraList()
+        l = self._get_list()
         f = gp.gp_camera_folder_list_files
-        check(f(self._ptr, path, l.pointer, context))
+        check(f(self._ptr, path, l.pointer, self._context))
         return l.as_list()
 
+    def walk(self, top='/', refresh=False):
+        """ Walk the folders on the camera, like os.walk
+
+        The listing is cached on the camera, so walking again doesn't touch
+        the card until refresh is passed.
+
+        Kwargs:
+            top (str): folder to start in
+            refresh (bool): list the card again
+
+        Yields:
+            (folder, folders, files) for each folder below top, where
+            folders and files are lists of names
+        """
+        if self._listing is None or refresh:
+            self._listing = dict()
+        listing = self._listing
+
+        stack = [top]
+        while stack:
+            folder = stack.pop()
+            try:
+                folders, files = listing[folder]
+            except KeyError:
+                folders = [name for name, value in self.list_folders(folder)]
+                files = [name for name, value in self.list_files(folder)]
+                listing[folder] = folders, files
+            yield folder, folders, files
+            stack.extend(join_path(folder, name)
+                         for name in reversed(folders))
+
     def wait_for_event(self, timeout=1000):
-        data = ctypes.c_char_p()
+        """ Wait for the camera to report an event
+
+        Kwargs:
+            timeout (int): milliseconds to wait
+
+        Returns:
+            event (CameraEvent): type is GP_EVENT_TIMEOUT if nothing happened
+
+        :rtype: CameraEvent
+        """
+        if self._deletes:
+            self.delete_pending()
+
+        data = ctypes.c_void_p()
         t = ctypes.c_int()
         f = gp.gp_camera_wait_for_event
-        val = check(f(self._ptr, timeout, PTR(t), PTR(data), context))
-        return val
+        check(f(self._ptr, timeout, PTR(t), PTR(data), self._context))
+
+        event = CameraEvent(t.value)
+        if data.value:
+            if t.value in (GP_EVENT_FILE_ADDED, GP_EVENT_FOLDER_ADDED,
+                           GP_EVENT_FILE_CHANGED):
+                path = ctypes.cast(data, ctypes.POINTER(CameraFilePathStruct))
+                event.path = CameraFilePathStruct.from_buffer_copy(
+                    path.contents)
+            elif t.value == GP_EVENT_UNKNOWN:
+                event.text = str(ctypes.string_at(data), encoding='ascii',
+                                 errors='replace')
+            gp.free(data)
+
+        # ptp drivers report "PTP Property xxxx changed"
+        if (self._config is not None and event.text is not None and
+                'changed' in event.text):
+            self._config.invalidate()
+        return event
+
+    def trigger_capture(self):
+        """ Start a capture and return without waiting for the image
+
+        The image is announced later by a GP_EVENT_FILE_ADDED event from
+        wait_for_event.
+
+        Raises:
+            ShutterError
+        """
+        check(gp.gp_camera_trigger_capture(self._ptr, self._context))
+
+    def sync(self, dest_dir, top='/', **kwargs):
+        """ Copy new and changed files from the camera to dest_dir
+
+        See shutter.sync.sync for the keyword arguments.
+
+        :rtype: shutter.sync.SyncResult
+        """
+        from .sync import sync
+        return sync(self, dest_dir, top, **kwargs)
+
+    def burst(self, count, timeout=10000, poll=100, files_per_shot=1):
+        """ Capture count images as fast as the camera allows
+
+        Args:
+            count (int): number of shots to trigger
+
+        Kwargs:
+            timeout (int): milliseconds to wait for a shot before giving up
+            poll (int): milliseconds for each wait for camera events
+            files_per_shot (int): files each shot adds, ie. 2 for RAW+JPEG
+
+        Yields:
+            (CameraEvent, CameraFile) for every file the camera adds.
+            The burst ends once count * files_per_shot files have come.
+
+        Raises:
+            ShutterError
+
+        The next shot is triggered as soon as the camera reports the file of
+        the previous one, before that file is downloaded, so the camera
+        exposes and writes the new image while the old one is transferred.
+        In RAM mode each file is queued for deletion once downloaded, as
+        capture_image does.
+        """
+        triggered = 0
+        in_flight = False    # camera is busy with the last trigger
+        awaiting = 0         # files the shots still have to announce
+        announced = 0        # files of the last shot announced so far
+        waited = 0
+        files = []
+
+        while True:
+            if not in_flight and triggered < count:
+                if len(self._deletes) >= MAX_PENDING_DELETES:
+                    self.delete_pending()
+                try:
+                    self.trigger_capture()
+                except ShutterError as e:
+                    if e.result != GP_ERROR_CAMERA_BUSY:
+                        raise
+                else:
+                    triggered += 1
+                    awaiting += files_per_shot
+                    announced = 0
+                    in_flight = True
+                    waited = 0
+
+            for event in files:
+                folder, name = event.path.folder, event.path.name
+                camfile = self.download(folder, name)
+                if self._ram_target is not None:
+                    self._deletes.append((folder, name))
+                yield event, camfile
+            del files[:]
+
+            event = self.wait_for_event(poll)
+            if event.type == GP_EVENT_FILE_ADDED:
+                files.append(event)
+                awaiting = max(0, awaiting - 1)
+                announced += 1
+                if announced >= files_per_shot:
+                    in_flight = False
+                waited = 0
+            elif event.type == GP_EVENT_CAPTURE_COMPLETE:
+                in_flight = False
+            elif event.type == GP_EVENT_TIMEOUT:
+                if not awaiting and triggered == count:
+                    # nothing more is coming
+                    break
+                waited += poll
+                if waited >= timeout:
+                    raise ShutterError(GP_ERROR_TIMEOUT,
+                                       'timed out waiting for capture')
 
 
 class CameraList(object):
-    def __init__(self, autodetect=False):
+    __slots__ = ('_ptr', '_name', '_value', '_pname', '_pvalue')
+
+    def __init__(self, autodetect=False, context=None):
         self._ptr = ctypes.c_void_p()
+        # out parameters for as_list, bound once
+        self._name = ctypes.c_char_p()
+        self._value = ctypes.c_char_p()
+        self._pname = PTR(self._name)
+        self._pvalue = PTR(self._value)
         check(gp.gp_list_new(PTR(self._ptr)))
         if autodetect:
+            if context is None:
+                context = get_context()
             gp.gp_camera_autodetect(self._ptr, context)
 
     def __del__(self):
@@ -453,8 +1697,28 @@ class CameraList(object):
         return self._ptr
 
     def as_list(self):
-        return [(self.get_name(i), self.get_value(i))
-                for i in range(self.count())]
+        # libgphoto2 has no call that returns all the entries, and the
+        # CameraList layout is private, so it takes two calls per entry;
+        # everything else is bound outside the loop
+        get_name = gp.gp_list_get_name
+        get_value = gp.gp_list_get_value
+        ptr = self._ptr
+        name = self._name
+        value = self._value
+        pname = self._pname
+        pvalue = self._pvalue
+        result = list()
+        append = result.append
+        for i in range(self.count()):
+            val = get_name(ptr, i, pname)
+            if val < 0:
+                check(val)
+            val = get_value(ptr, i, pvalue)
+            if val < 0:
+                check(val)
+            append((name.value.decode('ascii'),
+                    (value.value or b'').decode('ascii')))
+        return result
 
     def as_dict(self):
         return dict(self.as_list())
@@ -483,12 +1747,12 @@ class CameraList(object):
         """
 
         :param name: str
-        :rtype: str
+        :rtype: int
         """
         name = name.encode('ascii')
         index = ctypes.c_int()
         check(gp.gp_list_find_by_name(self._ptr, PTR(index), name))
-        return str(index.value, encoding='ascii')
+        return index.value
 
     def get_name(self, index):
         """
@@ -542,17 +1806,36 @@ class CameraFile(object):
     """
     Abstract data container for camera image files.
     """
+    __slots__ = ('_ptr',)
 
-    def __init__(self, cam=None, srcfolder=None, srcfilename=None):
+    def __init__(self, cam=None, srcfolder=None, srcfilename=None,
+                 context=None, type=GP_FILE_TYPE_NORMAL):
         self._ptr = ctypes.c_void_p()
         check(gp.gp_file_new(PTR(self._ptr)))
         if cam:
+            if context is None:
+                context = get_context()
             f = gp.gp_camera_file_get
-            check_unref(f(cam, srcfolder, srcfilename, GP_FILE_TYPE_NORMAL,
-                          self._ptr, context), self)
+            check_unref(f(cam, encode(srcfolder), encode(srcfilename),
+                          type, self._ptr, context), self)
 
     def __del__(self):
-        check(gp.gp_file_unref(self._ptr))
+        if self._ptr:
+            check(gp.gp_file_unref(self._ptr))
+
+    @classmethod
+    def from_fd(cls, fd):
+        """ Create a CameraFile that writes into a file descriptor
+
+        libgphoto2 takes ownership of fd and closes it with the file.
+
+        :type fd: int
+        :rtype: CameraFile
+        """
+        cfile = cls.__new__(cls)
+        cfile._ptr = ctypes.c_void_p()
+        check(gp.gp_file_new_from_fd(PTR(cfile._ptr), fd))
+        return cfile
 
     @property
     def pointer(self):
@@ -563,12 +1846,72 @@ class CameraFile(object):
 
         ! will be bytes for python3 !
 
+        This copies the data out of libgphoto2.  Use get_buffer to avoid it.
+
         :rtype: str / bytes
         """
-        data = ctypes.c_char_p()
+        data = ctypes.c_void_p()
         size = ctypes.c_ulong()
         check(gp.gp_file_get_data_and_size(self._ptr, PTR(data), PTR(size)))
-        return ctypes.string_at(data, int(size.value))
+        if not size.value:
+            return b''
+        return ctypes.string_at(data.value, size.value)
+
+    def get_buffer(self):
+        """ Return a read-only memoryview over the image data
+
+        No copy is made; the view points at the memory owned by libgphoto2.
+        The view keeps this CameraFile alive, but it is only valid until
+        the file is next written to.  Reusing the CameraFile, ie. passing
+        it to another preview capture as LiveView does unthreaded, frees
+        or moves the data, and the old view then points at freed memory.
+        Copy what must outlive that, ie. with bytes(view).
+
+        :rtype: memoryview
+        """
+        data = ctypes.c_void_p()
+        size = ctypes.c_ulong()
+        check(gp.gp_file_get_data_and_size(self._ptr, PTR(data), PTR(size)))
+        size = int(size.value)
+        if not size:
+            return memoryview(b'')
+        array = (ctypes.c_ubyte * size).from_address(data.value)
+        array._camfile = self
+        return memoryview(array).cast('B').toreadonly()
+
+    def digest(self, *algorithms):
+        """ Hash the data where libgphoto2 holds it, without copying it
+
+        Args:
+            algorithms (str): hashlib names; sha256 if none are given
+
+        Returns:
+            digests (dict): hex digest by algorithm
+
+        :rtype: dict
+        """
+        from .digest import Hasher
+        hasher = Hasher(algorithms or None)
+        hasher.update(self.get_buffer())
+        return hasher.hexdigests()
+
+    def to_array(self, out=None, pool=None, colorspace='RGB'):
+        """ Decode the JPEG data into a numpy array, without copying it out
+
+        Kwargs:
+            out (numpy.ndarray): array to decode into; it must have the
+                shape (height, width, channels) of the image
+            pool (shutter.arrays.ArrayPool): take the array from here when
+                out isn't given
+            colorspace (str): 'RGB', 'BGR' or 'GRAY'
+
+        Raises:
+            ImportError: if numpy or a JPEG decoder is missing
+
+        :rtype: numpy.ndarray
+        """
+        from .arrays import decode
+        return decode(self.get_buffer(), out, pool, colorspace)
 
     def save(self, filename=None):
         """
@@ -578,9 +1921,7 @@ class CameraFile(object):
         """
         if filename is None:
             filename = self.name
-        else:
-            filename = filename.encode('ascii')
-        check(gp.gp_file_save(self._ptr, filename))
+        check(gp.gp_file_save(self._ptr, encode(filename)))
 
     @property
     def name(self):
@@ -599,14 +1940,331 @@ class CameraFile(object):
         :type value: str
         :return:  None
         """
-        value = value.encode('ascii')
-        check(gp.gp_file_set_name(self._ptr, str(value)))
+        check(gp.gp_file_set_name(self._ptr, encode(value)))
+
+
+class CameraFileInfo(object):
+    """
+    Information about a file stored on the camera.
+
+    Only the values flagged in `fields` were reported by the driver.
+    """
+
+    __slots__ = ('_ptr',)
+
+    def __init__(self):
+        self._ptr = CameraFileInfoStruct()
+
+    @property
+    def pointer(self):
+        return self._ptr
+
+    fields = property(attrgetter('_ptr.file.fields'))
+    size = property(attrgetter('_ptr.file.size'))
+    type = property(attrgetter('_ptr.file.type'))
+    width = property(attrgetter('_ptr.file.width'))
+    height = property(attrgetter('_ptr.file.height'))
+    mtime = property(attrgetter('_ptr.file.mtime'))
+    preview_size = property(attrgetter('_ptr.preview.size'))
+
+
+class CameraWidget(object):
+    """
+    One node of the camera configuration tree.
+
+    Widgets belong to the tree of a CameraConfig and are only valid until
+    it is refreshed.
+    """
+    __slots__ = ('_ptr', 'name', 'path', 'label', 'type', 'readonly')
+
+    def __init__(self, ptr, parent=''):
+        self._ptr = ptr
+
+        value = ctypes.c_char_p()
+        check(gp.gp_widget_get_name(ptr, PTR(value)))
+        self.name = str(value.value, encoding='ascii')
+        self.path = parent + '/' + self.name
+        check(gp.gp_widget_get_label(ptr, PTR(value)))
+        self.label = str(value.value or b'', encoding='ascii',
+                         errors='replace')
+        t = ctypes.c_int()
+        check(gp.gp_widget_get_type(ptr, PTR(t)))
+        self.type = t.value
+        check(gp.gp_widget_get_readonly(ptr, PTR(t)))
+        self.readonly = bool(t.value)
+
+    def __repr__(self):
+        return '<CameraWidget %s>' % self.path
+
+    @property
+    def pointer(self):
+        return self._ptr
+
+    @property
+    def children(self):
+        """
+        :rtype: list
+        """
+        f = gp.gp_widget_get_child
+        children = list()
+        for i in range(check(gp.gp_widget_count_children(self._ptr))):
+            child = ctypes.c_void_p()
+            check(f(self._ptr, i, PTR(child)))
+            children.append(child)
+        return children
+
+    @property
+    def choices(self):
+        """ Possible values of radio and menu widgets
+
+        :rtype: list
+        """
+        if self.type not in (GP_WIDGET_RADIO, GP_WIDGET_MENU):
+            return list()
+        f = gp.gp_widget_get_choice
+        choices = list()
+        choice = ctypes.c_char_p()
+        for i in range(check(gp.gp_widget_count_choices(self._ptr))):
+            check(f(self._ptr, i, PTR(choice)))
+            choices.append(str(choice.value, encoding='ascii',
+                               errors='replace'))
+        return choices
+
+    @property
+    def range(self):
+        """ (min, max, step) of range widgets
+
+        :rtype: tuple
+        """
+        if self.type != GP_WIDGET_RANGE:
+            return None
+        lo, hi, step = ctypes.c_float(), ctypes.c_float(), ctypes.c_float()
+        check(gp.gp_widget_get_range(self._ptr, PTR(lo), PTR(hi), PTR(step)))
+        return lo.value, hi.value, step.value
+
+    def get_value(self):
+        """ Read the value held by the widget
+
+        :rtype: str / float / int / None
+        """
+        if self.type in (GP_WIDGET_TEXT, GP_WIDGET_RADIO, GP_WIDGET_MENU):
+            value = ctypes.c_char_p()
+            check(gp.gp_widget_get_value(self._ptr, PTR(value)))
+            if value.value is None:
+                return None
+            return str(value.value, encoding='ascii', errors='replace')
+        elif self.type == GP_WIDGET_RANGE:
+            value = ctypes.c_float()
+        elif self.type in (GP_WIDGET_TOGGLE, GP_WIDGET_DATE):
+            value = ctypes.c_int()
+        else:
+            return None
+        check(gp.gp_widget_get_value(self._ptr, PTR(value)))
+        return value.value
+
+    def set_value(self, value):
+        """ Change the value held by the widget
+
+        The camera isn't changed until the tree is sent with
+        gp_camera_set_config; see CameraConfig.apply.
+        """
+        if self.type in (GP_WIDGET_TEXT, GP_WIDGET_RADIO, GP_WIDGET_MENU):
+            arg = encode(str(value))
+        elif self.type == GP_WIDGET_RANGE:
+            arg = PTR(ctypes.c_float(value))
+        elif self.type in (GP_WIDGET_TOGGLE, GP_WIDGET_DATE):
+            arg = PTR(ctypes.c_int(int(value)))
+        else:
+            raise ShutterError(GP_ERROR_NOT_SUPPORTED,
+                               'widget %s has no value' % self.path)
+        check(gp.gp_widget_set_value(self._ptr, arg))
+
+
+class CameraConfig(object):
+    """
+    Cached configuration tree of a camera.
+
+    The tree is fetched with a single gp_camera_get_config and indexed by
+    widget name and path, so reading settings doesn't touch the camera.
+    Assignments are queued and sent together by apply().
+
+        config = camera.config
+        config['iso'] = '400'
+        config['shutterspeed'] = '1/250'
+        config['aperture'] = '8'
+        config.apply()
+    """
+
+    def __init__(self, camera):
+        self._camera = camera
+        self._root = None
+        self._widgets = dict()
+        self._values = dict()
+        self._pending = dict()
+
+    def __del__(self):
+        self._free()
+
+    def __contains__(self, key):
+        return key in self._get_index()
+
+    def __getitem__(self, key):
+        return self.get_value(key)
+
+    def __setitem__(self, key, value):
+        self.set_value(key, value)
+
+    def __iter__(self):
+        return iter(self.names())
+
+    def _free(self):
+        if self._root is not None:
+            gp.gp_widget_free(self._root)
+            self._root = None
+
+    def _get_index(self):
+        if self._root is None:
+            self.refresh()
+        return self._widgets
+
+    def refresh(self):
+        """ Fetch the whole configuration tree from the camera
+
+        Queued changes are kept and applied to the new tree.
+        """
+        root = ctypes.c_void_p()
+        camera = self._camera
+        check(gp.gp_camera_get_config(camera.pointer, PTR(root),
+                                      camera._context))
+        self._free()
+        self._root = root
+        self._widgets.clear()
+        self._values.clear()
+
+        stack = [(root, '')]
+        while stack:
+            ptr, parent = stack.pop()
+            widget = CameraWidget(ptr, parent)
+            self._widgets[widget.path] = widget
+            self._widgets.setdefault(widget.name, widget)
+            stack.extend((child, widget.path)
+                         for child in reversed(widget.children))
+
+    def invalidate(self):
+        """ Forget the cached tree; it is fetched again when next used
+        """
+        self._free()
+        self._widgets.clear()
+        self._values.clear()
+
+    def names(self):
+        """ Names of the widgets that hold a value
+
+        :rtype: list
+        """
+        return [w.name for path, w in self._get_index().items()
+                if path == w.path and
+                w.type not in (GP_WIDGET_WINDOW, GP_WIDGET_SECTION)]
+
+    def widget(self, key):
+        """ Return the widget for a name or path
+
+        :type key: str
+        :rtype: CameraWidget
+        """
+        try:
+            return self._get_index()[key]
+        except KeyError:
+            raise KeyError(key)
+
+    def get_value(self, key):
+        """ Return the value of a setting; queued changes are included
+
+        :type key: str
+        """
+        widget = self.widget(key)
+        if widget.path in self._pending:
+            return self._pending[widget.path]
+        try:
+            return self._values[widget.path]
+        except KeyError:
+            value = widget.get_value()
+            self._values[widget.path] = value
+            return value
+
+    def set_value(self, key, value):
+        """ Queue a change; it is sent to the camera by apply()
+
+        :type key: str
+        """
+        widget = self.widget(key)
+        if widget.readonly:
+            raise ShutterError(GP_ERROR_NOT_SUPPORTED,
+                               'setting %s is read only' % widget.path)
+        self._pending[widget.path] = value
+
+    def choices(self, key):
+        """
+        :type key: str
+        :rtype: list
+        """
+        return self.widget(key).choices
+
+    @property
+    def pending(self):
+        """ Changes waiting for apply(), by path
+
+        :rtype: dict
+        """
+        return dict(self._pending)
+
+    def discard(self):
+        """ Drop the queued changes
+        """
+        self._pending.clear()
+
+    def apply(self):
+        """ Send all queued changes to the camera in one gp_camera_set_config
+
+        Raises:
+            ShutterError
+        """
+        if not self._pending:
+            return
+        widgets = self._get_index()
+        for path, value in self._pending.items():
+            widgets[path].set_value(value)
+        camera = self._camera
+        check(gp.gp_camera_set_config(camera.pointer, self._root,
+                                      camera._context))
+        for path in self._pending:
+            self._values.pop(path, None)
+        self._pending.clear()
 
 
 class CameraAbilities(object):
+    __slots__ = ('_ptr',)
+
     def __init__(self):
         self._ptr = CameraAbilitiesStruct()
 
+    @classmethod
+    def from_bytes(cls, data):
+        """ Create CameraAbilities from the raw bytes of the struct
+
+        :type data: bytes
+        :rtype: CameraAbilities
+        """
+        ab = cls()
+        ab._ptr = CameraAbilitiesStruct.from_buffer_copy(data)
+        return ab
+
+    def to_bytes(self):
+        """
+        :rtype: bytes
+        """
+        return bytes(self._ptr)
+
     def __repr__(self):
         return "Model : %s\nStatus : %d\nPort : %d\nOperations : %d\nFile Operations : %d\nFolder Operations : %d\nUSB (vendor/product) : 0x%x/0x%x\nUSB class : 0x%x/0x%x/0x%x\nLibrary : %s\nId : %s\n" % (
             self._ptr.model, self._ptr.status, self._ptr.port,
@@ -620,33 +2278,56 @@ class CameraAbilities(object):
     def pointer(self):
         return self._ptr
 
-    model = property(lambda self: self._ptr.model, None)
-    status = property(lambda self: self._ptr.status, None)
-    port = property(lambda self: self._ptr.port, None)
-    operations = property(lambda self: self._ptr.operations, None)
-    file_operations = property(lambda self: self._ptr.file_operations, None)
-    folder_operations = property(lambda self: self._ptr.folder_operations, None)
-    usb_vendor = property(lambda self: self._ptr.usb_vendor, None)
-    usb_product = property(lambda self: self._ptr.usb_product, None)
-    usb_class = property(lambda self: self._ptr.usb_class, None)
-    usb_subclass = property(lambda self: self._ptr.usb_subclass, None)
-    usb_protocol = property(lambda self: self._ptr.usb_protocol, None)
-    library = property(lambda self: self._ptr.library, None)
-    id = property(lambda self: self._ptr.id, None)
+    model = property(attrgetter('_ptr.model'))
+    status = property(attrgetter('_ptr.status'))
+    port = property(attrgetter('_ptr.port'))
+    operations = property(attrgetter('_ptr.operations'))
+    file_operations = property(attrgetter('_ptr.file_operations'))
+    folder_operations = property(attrgetter('_ptr.folder_operations'))
+    usb_vendor = property(attrgetter('_ptr.usb_vendor'))
+    usb_product = property(attrgetter('_ptr.usb_product'))
+    usb_class = property(attrgetter('_ptr.usb_class'))
+    usb_subclass = property(attrgetter('_ptr.usb_subclass'))
+    usb_protocol = property(attrgetter('_ptr.usb_protocol'))
+    library = property(attrgetter('_ptr.library'))
+    id = property(attrgetter('_ptr.id'))
 
 
 class PortInfo(object):
+    """
+    Description of a port.  GPPortInfo is an opaque handle since
+    libgphoto2 2.5, so the fields are read through accessor functions.
+    """
+    __slots__ = ('_ptr',)
+
     def __init__(self):
-        self._ptr = PortInfoStruct()
+        self._ptr = ctypes.c_void_p()
+
+    def __repr__(self):
+        return '<PortInfo %s %s>' % (self.name, self.path)
 
     @property
     def pointer(self):
         return self._ptr
 
-    type = property(lambda self: self._ptr.type, None)
-    name = property(lambda self: self._ptr.name, None)
-    path = property(lambda self: self._ptr.path, None)
-    library_filename = property(lambda self: self._ptr.library_filename, None)
+    def _get_string(self, func):
+        value = ctypes.c_char_p()
+        check(func(self._ptr, PTR(value)))
+        return str(value.value or b'', encoding='ascii')
+
+    @property
+    def type(self):
+        """
+        :rtype: int
+        """
+        value = ctypes.c_int()
+        check(gp.gp_port_info_get_type(self._ptr, PTR(value)))
+        return value.value
+
+    name = property(lambda self: self._get_string(gp.gp_port_info_get_name))
+    path = property(lambda self: self._get_string(gp.gp_port_info_get_path))
+    library_filename = property(
+        lambda self: self._get_string(gp.gp_port_info_get_library_filename))
 
 
 class CameraAbilitiesList(object):
@@ -657,7 +2338,7 @@ class CameraAbilitiesList(object):
             CameraAbilitiesList._static_l = ctypes.c_void_p()
             check(gp.gp_abilities_list_new(PTR(CameraAbilitiesList._static_l)))
             check(gp.gp_abilities_list_load(CameraAbilitiesList._static_l,
-                                            context))
+                                            get_context()))
         self._l = CameraAbilitiesList._static_l
 
     @property
@@ -666,7 +2347,7 @@ class CameraAbilitiesList(object):
 
     def detect(self, il, l):
         f = gp.gp_abilities_list_detect
-        check(f(self._l, il.pointer, l.pointer, context))
+        check(f(self._l, il.pointer, l.pointer, get_context()))
 
     def lookup_model(self, model):
         """
@@ -682,6 +2363,9 @@ class CameraAbilitiesList(object):
         f = gp.gp_abilities_list_get_abilities
         return check(f(self._l, model_index, PTR(ab.pointer)))
 
+    def count(self):
+        return check(gp.gp_abilities_list_count(self._l))
+
 
 class PortInfoList(object):
     _static_l = None
@@ -0,0 +1,967 @@
+"""
+Simulated libgphoto2, for testing and benchmarking without a camera.
+
+SimulatedLibrary implements the libgphoto2 entry points used by shutter in
+python, around one or more SimulatedCamera objects.  Load it in place of the
+real library:
+
+    import shutter
+    from shutter.simulator import SimulatedLibrary, SimulatedCamera
+
+    sim = SimulatedLibrary([SimulatedCamera('Canon EOS 5D Mark III')])
+    shutter.load(backend=sim)
+    camera = shutter.Camera()
+
+Latency of any call can be set per function name, transfers are throttled
+to a configurable rate, and failures can be injected with fail().  Calls
+sleep without holding the GIL, like the real library.
+"""
+import collections
+import ctypes
+import itertools
+import os
+import threading
+import time
+
+from .shutter import CameraFilePathStruct
+from .shutter import GP_CAPTURE_IMAGE
+from .shutter import GP_CONTEXT_FEEDBACK_CANCEL
+from .shutter import GP_ERROR_CANCEL
+from .shutter import GP_ERROR_NOT_SUPPORTED
+from .shutter import GP_EVENT_CAPTURE_COMPLETE
+from .shutter import GP_EVENT_FILE_ADDED
+from .shutter import GP_EVENT_TIMEOUT
+from .shutter import GP_EVENT_UNKNOWN
+from .shutter import GP_FILE_INFO_MTIME
+from .shutter import GP_FILE_INFO_SIZE
+from .shutter import GP_FILE_INFO_TYPE
+from .shutter import GP_FILE_TYPE_EXIF
+from .shutter import GP_FILE_TYPE_PREVIEW
+from .shutter import GP_OK
+from .shutter import GP_PORT_USB
+from .shutter import GP_WIDGET_RADIO
+from .shutter import GP_WIDGET_SECTION
+from .shutter import GP_WIDGET_TEXT
+from .shutter import GP_WIDGET_WINDOW
+
+__all__ = ['SimulatedCamera', 'SimulatedLibrary']
+
+GP_ERROR = -1
+GP_ERROR_BAD_PARAMETERS = -2
+GP_ERROR_IO = -7
+GP_ERROR_IO_LOCK = -60
+GP_ERROR_MODEL_NOT_FOUND = -105
+GP_ERROR_DIRECTORY_NOT_FOUND = -107
+GP_ERROR_FILE_NOT_FOUND = -108
+
+RESULT_STRINGS = {
+    GP_OK: b'No error',
+    GP_ERROR: b'Unspecified error',
+    GP_ERROR_BAD_PARAMETERS: b'Bad parameters',
+    GP_ERROR_NOT_SUPPORTED: b'Unsupported operation',
+    GP_ERROR_IO: b'I/O problem',
+    GP_ERROR_IO_LOCK: b'Could not lock the device',
+    GP_ERROR_MODEL_NOT_FOUND: b'Unknown model',
+    GP_ERROR_DIRECTORY_NOT_FOUND: b'Directory not found',
+    GP_ERROR_FILE_NOT_FOUND: b'File not found',
+    GP_ERROR_CANCEL: b'Cancelled',
+}
+
+# all operations, file operations and folder operations supported
+OPERATIONS = 0x3f
+FILE_OPERATIONS = 0x7a
+FOLDER_OPERATIONS = 0x0f
+
+DCIM = '/store_00010001/DCIM/100SIMUL'
+
+# bytes a simulated transfer moves between asking whether to cancel
+TRANSFER_BLOCK = 512 * 1024
+# seconds between asking whether to cancel while a capture is exposing
+CANCEL_POLL = 0.01
+
+
+def _value(arg):
+    """ Return the python value of a ctypes argument, or the argument
+    """
+    return getattr(arg, 'value', arg)
+
+
+def _text(arg):
+    if isinstance(arg, bytes):
+        return str(arg, encoding='ascii')
+    return arg
+
+
+def _fill(size, stamp):
+    """ Return size bytes of filler that start with stamp
+    """
+    data = bytearray(size)
+    stamp = stamp.encode('ascii')[:size]
+    data[:len(stamp)] = stamp
+    return data
+
+
+class _Widget(object):
+    def __init__(self, name, type, value=None, choices=(), readonly=False,
+                 children=()):
+        self.name = name
+        self.label = name.title()
+        self.type = type
+        self.value = value
+        self.choices = list(choices)
+        self.readonly = readonly
+        self.children = list(children)
+
+
+class _File(object):
+    def __init__(self, fd=None):
+        self.fd = fd
+        self.data = bytearray()
+        self.buffer = None
+        self.name = b''
+        self.refs = 1
+
+    def set_data(self, data):
+        if self.fd is not None:
+            view = memoryview(data)
+            while view:
+                view = view[os.write(self.fd, view):]
+            return
+        self.data = bytearray(data)
+        self.buffer = None
+
+    def address(self):
+        if not self.data:
+            return None
+        if self.buffer is None:
+            self.buffer = (ctypes.c_char * len(self.data)).from_buffer(
+                self.data)
+        return ctypes.addressof(self.buffer)
+
+
+class SimulatedCamera(object):
+    """ A camera for SimulatedLibrary
+
+    Args:
+        model (str): model name reported by autodetect
+
+    Kwargs:
+        port (str): port path; assigned by the library if not given
+        image_size (int): bytes in each captured image
+        preview_size (int): bytes in each preview frame
+        thumbnail_size (int): bytes in each thumbnail
+        preview_data (bytes): returned for previews instead of filler,
+            ie. a real JPEG
+        capture_time (float): seconds from trigger until the file is added
+        files (dict): initial card contents, {folder: {name: size}}
+        partial_reads (bool): whether gp_camera_file_read is supported
+        ram_capture (bool): whether capturetarget offers Internal RAM
+        card_write_time (float): seconds added to a capture that is
+            written to the card
+        raw_time (float): seconds after a triggered capture's JPEG until
+            its RAW file is added, as with RAW+JPEG; None for JPEG only
+    """
+
+    def __init__(self, model, port=None, image_size=1024 * 1024,
+                 preview_size=64 * 1024, thumbnail_size=8 * 1024,
+                 preview_data=None, capture_time=0.0, files=None,
+                 partial_reads=True, ram_capture=True, card_write_time=0.0,
+                 raw_time=None):
+        self.model = model
+        self.port = port
+        self.image_size = image_size
+        self.preview_size = preview_size
+        self.thumbnail_size = thumbnail_size
+        self.preview_data = preview_data
+        self.capture_time = capture_time
+        self.partial_reads = partial_reads
+        self.card_write_time = card_write_time
+        self.raw_time = raw_time
+        self.locked = False
+        self.captures = 0
+        self.previews = 0
+        self.deleted = list()
+        self.folders = collections.OrderedDict()
+        self.folders['/'] = collections.OrderedDict()
+        self.folders['/store_00010001'] = collections.OrderedDict()
+        self.folders['/store_00010001/DCIM'] = collections.OrderedDict()
+        self.folders[DCIM] = collections.OrderedDict()
+        for folder, names in (files or dict()).items():
+            self.folders.setdefault(folder, collections.OrderedDict())
+            for name, size in names.items():
+                self.add_file(folder, name, size)
+        self.config = _Widget('main', GP_WIDGET_WINDOW, children=[
+            _Widget('capturesettings', GP_WIDGET_SECTION, children=[
+                _Widget('shutterspeed', GP_WIDGET_RADIO, '1/125',
+                        ['1/30', '1/60', '1/125', '1/250', '1/500']),
+                _Widget('aperture', GP_WIDGET_RADIO, '5.6',
+                        ['2.8', '4', '5.6', '8', '11']),
+            ]),
+            _Widget('imgsettings', GP_WIDGET_SECTION, children=[
+                _Widget('iso', GP_WIDGET_RADIO, '100',
+                        ['100', '200', '400', '800', '1600']),
+            ]),
+            _Widget('settings', GP_WIDGET_SECTION, children=[
+                _Widget('capturetarget', GP_WIDGET_RADIO, 'Memory card',
+                        ['Internal RAM', 'Memory card'] if ram_capture
+                        else ['Memory card']),
+            ]),
+            _Widget('status', GP_WIDGET_SECTION, children=[
+                _Widget('serialnumber', GP_WIDGET_TEXT,
+                        '%08d' % (id(self) % 100000000), readonly=True),
+            ]),
+        ])
+        self.events = collections.deque()
+        self._last_read = None
+
+    def __repr__(self):
+        return '<SimulatedCamera %s at %s>' % (self.model, self.port)
+
+    def add_file(self, folder, name, size, mtime=None):
+        """ Put a file on the simulated card
+        """
+        parent = folder
+        while parent not in self.folders:
+            self.folders[parent] = collections.OrderedDict()
+            parent = parent.rsplit('/', 1)[0] or '/'
+        self.folders[folder][name] = (size, mtime or int(time.time()))
+
+    def find_widget(self, name):
+        stack = [self.config]
+        while stack:
+            widget = stack.pop()
+            if widget.name == name:
+                return widget
+            stack.extend(widget.children)
+        return None
+
+    def capture(self):
+        """ Take a picture; returns (folder, name)
+        """
+        self.captures += 1
+        name = 'IMG_%04d.JPG' % self.captures
+        target = self.find_widget('capturetarget')
+        if target is not None and target.value == 'Internal RAM':
+            folder = '/'
+            self.folders.setdefault(folder, collections.OrderedDict())
+        else:
+            folder = DCIM
+            time.sleep(self.card_write_time)
+        self.add_file(folder, name, self.image_size)
+        return folder, name
+
+    def read(self, folder, name, type):
+        """ Return the contents of a file
+        """
+        key = (folder, name, type)
+        if self._last_read is not None and self._last_read[0] == key:
+            return self._last_read[1]
+        size, mtime = self.folders[folder][name]
+        if type == GP_FILE_TYPE_PREVIEW:
+            size = self.thumbnail_size
+        elif type == GP_FILE_TYPE_EXIF:
+            size = min(size, 4096)
+        data = _fill(size, '%s/%s %d' % (folder, name, mtime))
+        self._last_read = key, data
+        return data
+
+
+class SimulatedLibrary(object):
+    """ Python stand-in for libgphoto2
+
+    Kwargs:
+        cameras (list): SimulatedCamera objects that are "attached"
+        latency (dict): seconds added to each call, by function name
+        transfer_rate (float): bytes per second for file transfers;
+            None for no limit
+        driver_models (int): extra models in the driver database, so
+            loading it costs about what the real one does
+    """
+
+    def __init__(self, cameras=None, latency=None, transfer_rate=None,
+                 driver_models=0):
+        if cameras is None:
+            cameras = [SimulatedCamera('Simulated Camera')]
+        self.cameras = list(cameras)
+        for i, camera in enumerate(self.cameras):
+            if camera.port is None:
+                camera.port = 'usb:001,%03d' % (i + 1)
+        self.latency = dict(latency or dict())
+        self.transfer_rate = transfer_rate
+        self.models = [c.model for c in self.cameras]
+        self.models.extend('Simulated Driver %d' % i
+                           for i in range(driver_models))
+        self.calls = collections.Counter()
+        self._failures = dict()
+        self._objects = dict()
+        self._handles = itertools.count(0x1000)
+        self._lock = threading.Lock()
+
+    # --- simulation controls ---
+
+    def fail(self, name, result=GP_ERROR_IO, count=1):
+        """ Make the next count calls to function name return result
+
+        Use count=None to fail until cleared with fail(name, count=0).
+        """
+        if count == 0:
+            self._failures.pop(name, None)
+        else:
+            self._failures[name] = [result, count]
+
+    def _enter(self, name):
+        self.calls[name] += 1
+        delay = self.latency.get(name)
+        if delay:
+            time.sleep(delay)
+        failure = self._failures.get(name)
+        if failure is not None:
+            result, count = failure
+            if count is not None:
+                if count <= 1:
+                    del self._failures[name]
+                else:
+                    failure[1] = count - 1
+            return result
+        return GP_OK
+
+    def _transfer(self, size, context=None, text=None):
+        """ Take the time size bytes take to transfer
+
+        Progress is reported to the context's callbacks, and its cancel
+        function is asked between blocks of TRANSFER_BLOCK bytes, like a
+        driver does.  Returns GP_ERROR_CANCEL if the transfer was cancelled.
+        """
+        state = self._objects.get(_value(context)) if context else None
+        if not state:
+            if self.transfer_rate:
+                time.sleep(size / float(self.transfer_rate))
+            return GP_OK
+
+        progress = state.get('progress')
+        if progress is not None:
+            start, update, stop, data = progress
+            task = start(context, float(size), text, data)
+        done = 0
+        result = GP_OK
+        while done < size:
+            if self._cancelled(context):
+                result = GP_ERROR_CANCEL
+                break
+            block = min(TRANSFER_BLOCK, size - done)
+            if self.transfer_rate:
+                time.sleep(block / float(self.transfer_rate))
+            done += block
+            if progress is not None:
+                update(context, task, float(done), data)
+        if progress is not None:
+            stop(context, task, data)
+        return result
+
+    def _wait(self, seconds, context=None):
+        """ Sleep, asking the context's cancel function as a driver polls
+
+        Returns GP_ERROR_CANCEL if the wait was cancelled.
+        """
+        deadline = time.time() + seconds
+        while True:
+            if self._cancelled(context):
+                return GP_ERROR_CANCEL
+            now = time.time()
+            if now >= deadline:
+                return GP_OK
+            time.sleep(min(deadline - now, CANCEL_POLL))
+
+    def _cancelled(self, context):
+        state = self._objects.get(_value(context)) if context else None
+        cancel = state and state.get('cancel')
+        if not cancel:
+            return False
+        func, data = cancel
+        return func(context, data) == GP_CONTEXT_FEEDBACK_CANCEL
+
+    def _new(self, obj, out=None):
+        with self._lock:
+            handle = next(self._handles)
+            self._objects[handle] = obj
+        if out is not None:
+            out.contents.value = handle
+        return handle
+
+    def _get(self, handle):
+        return self._objects[_value(handle)]
+
+    def _camera(self, handle):
+        state = self._get(handle)
+        if state['camera'] is None:
+            raise KeyError(handle)
+        return state['camera']
+
+    def free(self, pointer):
+        with self._lock:
+            self._objects.pop(_value(pointer), None)
+
+    def _alloc(self, obj):
+        """ Keep obj alive until free() is called with its address
+        """
+        address = ctypes.addressof(obj)
+        with self._lock:
+            self._objects[address] = obj
+        return address
+
+    # --- library ---
+
+    def gp_context_new(self):
+        return self._new(dict())
+
+    def gp_context_unref(self, context):
+        self.free(context)
+
+    def gp_context_set_cancel_func(self, context, func, data):
+        self._get(context)['cancel'] = func, data
+
+    def gp_context_set_error_func(self, context, func, data):
+        self._get(context)['error'] = func, data
+
+    def gp_context_set_progress_funcs(self, context, start, update, stop,
+                                      data):
+        self._get(context)['progress'] = start, update, stop, data
+
+    def gp_library_version(self, verbose):
+        return [b'2.5.99-simulated', None]
+
+    def gp_result_as_string(self, result):
+        return RESULT_STRINGS.get(result, b'Error %d' % result)
+
+    # --- camera ---
+
+    def gp_camera_new(self, out):
+        self._new({'camera': None, 'port': None, 'model': None}, out)
+        return GP_OK
+
+    def gp_camera_set_abilities(self, camera, abilities):
+        self._get(camera)['model'] = str(abilities.model, encoding='ascii')
+        return GP_OK
+
+    def gp_camera_get_abilities(self, camera, out):
+        state = self._get(camera)
+        model = state['camera'].model if state['camera'] else state['model']
+        self._fill_abilities(out.contents, model or '')
+        return GP_OK
+
+    def gp_camera_set_port_info(self, camera, info):
+        self._get(camera)['port'] = self._get(info)
+        return GP_OK
+
+    def gp_camera_get_port_info(self, camera, out):
+        state = self._get(camera)
+        cam = state['camera']
+        self._new(cam.port if cam else state['port'], out)
+        return GP_OK
+
+    def gp_camera_init(self, camera, context):
+        result = self._enter('gp_camera_init')
+        if result:
+            return result
+        state = self._get(camera)
+        candidates = self.cameras
+        if state['port'] is not None:
+            candidates = [c for c in candidates if c.port == state['port']]
+        elif state['model'] is not None:
+            candidates = [c for c in candidates if c.model == state['model']]
+        if not candidates:
+            return GP_ERROR_MODEL_NOT_FOUND
+        cam = candidates[0]
+        with self._lock:
+            if cam.locked:
+                return GP_ERROR_IO_LOCK
+            cam.locked = True
+        state['camera'] = cam
+        return GP_OK
+
+    def gp_camera_exit(self, camera, context):
+        result = self._enter('gp_camera_exit')
+        state = self._get(camera)
+        if state['camera'] is not None:
+            state['camera'].locked = False
+            state['camera'] = None
+        return result
+
+    def gp_camera_unref(self, camera):
+        self.gp_camera_exit(camera, None)
+        self.free(camera)
+        return GP_OK
+
+    def gp_camera_autodetect(self, out, context):
+        result = self._enter('gp_camera_autodetect')
+        if result:
+            return result
+        entries = self._get(out)
+        for cam in self.cameras:
+            entries.append([cam.model.encode('ascii'),
+                            cam.port.encode('ascii')])
+        return len(self.cameras)
+
+    def gp_camera_get_summary(self, camera, out, context):
+        result = self._enter('gp_camera_get_summary')
+        if result:
+            return result
+        cam = self._camera(camera)
+        out.contents.text = ('Manufacturer: Simulated\nModel: %s\n'
+                             'Serial Number: %s\n' % (
+                                 cam.model,
+                                 cam.find_widget('serialnumber').value)
+                             ).encode('ascii')
+        return GP_OK
+
+    def gp_camera_get_about(self, camera, out, context):
+        out.contents.text = b'Simulated camera driver'
+        return self._enter('gp_camera_get_about')
+
+    def gp_camera_capture(self, camera, type, out, context):
+        result = self._enter('gp_camera_capture')
+        if result:
+            return result
+        if type != GP_CAPTURE_IMAGE:
+            return GP_ERROR_NOT_SUPPORTED
+        cam = self._camera(camera)
+        result = self._wait(cam.capture_time, context)
+        if result:
+            return result
+        folder, name = cam.capture()
+        out.contents.folder = folder.encode('ascii')
+        out.contents.name = name.encode('ascii')
+        return GP_OK
+
+    def gp_camera_trigger_capture(self, camera, context):
+        result = self._enter('gp_camera_trigger_capture')
+        if result:
+            return result
+        cam = self._camera(camera)
+        due = time.time() + cam.capture_time
+        cam.events.append((due, 'capture', None))
+        return GP_OK
+
+    def gp_camera_capture_preview(self, camera, cfile, context):
+        result = self._enter('gp_camera_capture_preview')
+        if result:
+            return result
+        cam = self._camera(camera)
+        cam.previews += 1
+        if cam.preview_data is not None:
+            data = cam.preview_data
+        else:
+            data = _fill(cam.preview_size, 'preview %d' % cam.previews)
+        result = self._transfer(len(data), context)
+        if result:
+            return result
+        self._get(cfile).set_data(data)
+        return GP_OK
+
+    def gp_camera_wait_for_event(self, camera, timeout, out_type, out_data,
+                                 context):
+        result = self._enter('gp_camera_wait_for_event')
+        if result:
+            return result
+        cam = self._camera(camera)
+        deadline = time.time() + _value(timeout) / 1000.0
+        while True:
+            now = time.time()
+            if cam.events and cam.events[0][0] <= now:
+                break
+            if now >= deadline:
+                out_type.contents.value = GP_EVENT_TIMEOUT
+                out_data.contents.value = None
+                return GP_OK
+            wait = deadline
+            if cam.events:
+                wait = min(wait, cam.events[0][0])
+            time.sleep(max(0, wait - now))
+
+        due, kind, data = cam.events.popleft()
+        if kind in ('capture', 'raw'):
+            if kind == 'capture':
+                folder, name = cam.capture()
+            else:
+                folder, name = data
+                cam.add_file(folder, name, cam.image_size)
+            path = CameraFilePathStruct(name.encode('ascii'),
+                                        folder.encode('ascii'))
+            if kind == 'capture' and cam.raw_time is not None:
+                raw = name.rsplit('.', 1)[0] + '.CR2'
+                cam.events.appendleft((time.time() + cam.raw_time, 'raw',
+                                       (folder, raw)))
+            else:
+                cam.events.appendleft((due, 'complete', None))
+            out_type.contents.value = GP_EVENT_FILE_ADDED
+            out_data.contents.value = self._alloc(path)
+        elif kind == 'complete':
+            out_type.contents.value = GP_EVENT_CAPTURE_COMPLETE
+            out_data.contents.value = None
+        else:
+            text = ctypes.create_string_buffer(data.encode('ascii'))
+            out_type.contents.value = GP_EVENT_UNKNOWN
+            out_data.contents.value = self._alloc(text)
+        return GP_OK
+
+    # --- card ---
+
+    def _lookup(self, camera, folder, name):
+        cam = self._camera(camera)
+        folder = _text(folder)
+        name = _text(name)
+        if folder not in cam.folders:
+            return cam, None, GP_ERROR_DIRECTORY_NOT_FOUND
+        if name not in cam.folders[folder]:
+            return cam, None, GP_ERROR_FILE_NOT_FOUND
+        return cam, (folder, name), GP_OK
+
+    def gp_camera_file_get(self, camera, folder, name, type, cfile, context):
+        result = self._enter('gp_camera_file_get')
+        if result:
+            return result
+        cam, path, result = self._lookup(camera, folder, name)
+        if result:
+            return result
+        data = cam.read(path[0], path[1], _value(type))
+        result = self._transfer(len(data), context,
+                                b'Downloading ' + path[1].encode('ascii'))
+        if result:
+            return result
+        target = self._get(cfile)
+        target.set_data(data)
+        target.name = path[1].encode('ascii')
+        return GP_OK
+
+    def gp_camera_file_read(self, camera, folder, name, type, offset, buf,
+                            size, context):
+        result = self._enter('gp_camera_file_read')
+        if result:
+            return result
+        cam, path, result = self._lookup(camera, folder, name)
+        if result:
+            return result
+        if not cam.partial_reads:
+            return GP_ERROR_NOT_SUPPORTED
+        data = cam.read(path[0], path[1], _value(type))
+        offset = min(_value(offset), len(data))
+        length = min(size.contents.value, len(data) - offset)
+        if length:
+            result = self._transfer(length, context)
+            if result:
+                return result
+            src = (ctypes.c_char * length).from_buffer(data, offset)
+            ctypes.memmove(buf, src, length)
+        size.contents.value = length
+        return GP_OK
+
+    def gp_camera_file_get_info(self, camera, folder, name, out, context):
+        result = self._enter('gp_camera_file_get_info')
+        if result:
+            return result
+        cam, path, result = self._lookup(camera, folder, name)
+        if result:
+            return result
+        size, mtime = cam.folders[path[0]][path[1]]
+        info = out.contents
+        info.file.fields = GP_FILE_INFO_TYPE | GP_FILE_INFO_SIZE | \
+            GP_FILE_INFO_MTIME
+        info.file.size = size
+        info.file.type = b'image/jpeg'
+        info.file.mtime = mtime
+        info.preview.fields = GP_FILE_INFO_SIZE
+        info.preview.size = cam.thumbnail_size
+        return GP_OK
+
+    def gp_camera_file_delete(self, camera, folder, name, context):
+        result = self._enter('gp_camera_file_delete')
+        if result:
+            return result
+        cam, path, result = self._lookup(camera, folder, name)
+        if result:
+            return result
+        del cam.folders[path[0]][path[1]]
+        cam.deleted.append(path)
+        return GP_OK
+
+    def gp_camera_folder_list_folders(self, camera, folder, out, context):
+        result = self._enter('gp_camera_folder_list_folders')
+        if result:
+            return result
+        cam = self._camera(camera)
+        folder = _text(folder)
+        if folder not in cam.folders:
+            return GP_ERROR_DIRECTORY_NOT_FOUND
+        prefix = folder.rstrip('/') + '/'
+        entries = self._get(out)
+        for path in cam.folders:
+            if path != folder and path.startswith(prefix) and \
+                    '/' not in path[len(prefix):]:
+                entries.append([path[len(prefix):].encode('ascii'), b''])
+        return GP_OK
+
+    def gp_camera_folder_list_files(self, camera, folder, out, context):
+        result = self._enter('gp_camera_folder_list_files')
+        if result:
+            return result
+        cam = self._camera(camera)
+        folder = _text(folder)
+        if folder not in cam.folders:
+            return GP_ERROR_DIRECTORY_NOT_FOUND
+        entries = self._get(out)
+        for name in cam.folders[folder]:
+            entries.append([name.encode('ascii'), b''])
+        return GP_OK
+
+    # --- config ---
+
+    def gp_camera_get_config(self, camera, out, context):
+        result = self._enter('gp_camera_get_config')
+        if result:
+            return result
+        cam = self._camera(camera)
+        self._new(cam.config, out)
+        return GP_OK
+
+    def gp_camera_set_config(self, camera, widget, context):
+        result = self._enter('gp_camera_set_config')
+        if result:
+            return result
+        cam = self._camera(camera)
+        cam.events.append((time.time(), 'unknown',
+                           'PTP Property d102 changed'))
+        return GP_OK
+
+    def gp_widget_free(self, widget):
+        self.free(widget)
+        return GP_OK
+
+    def gp_widget_get_name(self, widget, out):
+        out.contents.value = self._get(widget).name.encode('ascii')
+        return GP_OK
+
+    def gp_widget_get_label(self, widget, out):
+        out.contents.value = self._get(widget).label.encode('ascii')
+        return GP_OK
+
+    def gp_widget_get_type(self, widget, out):
+        out.contents.value = self._get(widget).type
+        return GP_OK
+
+    def gp_widget_get_readonly(self, widget, out):
+        out.contents.value = int(self._get(widget).readonly)
+        return GP_OK
+
+    def gp_widget_count_children(self, widget):
+        return len(self._get(widget).children)
+
+    def gp_widget_get_child(self, widget, index, out):
+        self._new(self._get(widget).children[index], out)
+        return GP_OK
+
+    def gp_widget_count_choices(self, widget):
+        return len(self._get(widget).choices)
+
+    def gp_widget_get_choice(self, widget, index, out):
+        out.contents.value = self._get(widget).choices[index].encode('ascii')
+        return GP_OK
+
+    def gp_widget_get_range(self, widget, lo, hi, step):
+        return GP_ERROR_BAD_PARAMETERS
+
+    def gp_widget_get_value(self, widget, out):
+        value = self._get(widget).value
+        if isinstance(value, str):
+            value = value.encode('ascii')
+        out.contents.value = value
+        return GP_OK
+
+    def gp_widget_set_value(self, widget, value):
+        widget = self._get(widget)
+        if isinstance(value, bytes):
+            value = str(value, encoding='ascii')
+            if widget.choices and value not in widget.choices:
+                return GP_ERROR_BAD_PARAMETERS
+        else:
+            value = value.contents.value
+        widget.value = value
+        return GP_OK
+
+    # --- lists ---
+
+    def gp_list_new(self, out):
+        self._new(list(), out)
+        return GP_OK
+
+    def gp_list_unref(self, handle):
+        self.free(handle)
+        return GP_OK
+
+    def gp_list_reset(self, handle):
+        del self._get(handle)[:]
+        return GP_OK
+
+    def gp_list_count(self, handle):
+        return len(self._get(handle))
+
+    def gp_list_append(self, handle, name, value):
+        self._get(handle).append([name, value])
+        return GP_OK
+
+    def gp_list_sort(self, handle):
+        self._get(handle).sort()
+        return GP_OK
+
+    def gp_list_find_by_name(self, handle, index, name):
+        for i, entry in enumerate(self._get(handle)):
+            if entry[0] == name:
+                index.contents.value = i
+                return GP_OK
+        return GP_ERROR
+
+    def gp_list_get_name(self, handle, index, out):
+        out.contents.value = self._get(handle)[_value(index)][0]
+        return GP_OK
+
+    def gp_list_get_value(self, handle, index, out):
+        out.contents.value = self._get(handle)[_value(index)][1]
+        return GP_OK
+
+    def gp_list_set_name(self, handle, index, name):
+        self._get(handle)[_value(index)][0] = name
+        return GP_OK
+
+    def gp_list_set_value(self, handle, index, value):
+        self._get(handle)[_value(index)][1] = value
+        return GP_OK
+
+    # --- files ---
+
+    def gp_file_new(self, out):
+        self._new(_File(), out)
+        return GP_OK
+
+    def gp_file_new_from_fd(self, out, fd):
+        self._new(_File(_value(fd)), out)
+        return GP_OK
+
+    def gp_file_unref(self, handle):
+        cfile = self._objects.get(_value(handle))
+        if cfile is None:
+            return GP_ERROR_BAD_PARAMETERS
+        cfile.refs -= 1
+        if not cfile.refs:
+            if cfile.fd is not None:
+                os.close(cfile.fd)
+            self.free(handle)
+        return GP_OK
+
+    def gp_file_get_data_and_size(self, handle, data, size):
+        cfile = self._get(handle)
+        data.contents.value = cfile.address()
+        size.contents.value = len(cfile.data)
+        return GP_OK
+
+    def gp_file_save(self, handle, filename):
+        result = self._enter('gp_file_save')
+        if result:
+            return result
+        with open(filename, 'wb') as fp:
+            fp.write(self._get(handle).data)
+        return GP_OK
+
+    def gp_file_get_name(self, handle, out):
+        out.contents.value = self._get(handle).name
+        return GP_OK
+
+    def gp_file_set_name(self, handle, name):
+        self._get(handle).name = name
+        return GP_OK
+
+    # --- abilities ---
+
+    def _fill_abilities(self, ab, model):
+        ab.model = model.encode('ascii')
+        ab.port = GP_PORT_USB
+        ab.operations = OPERATIONS
+        ab.file_operations = FILE_OPERATIONS
+        ab.folder_operations = FOLDER_OPERATIONS
+        index = self.models.index(model) if model in self.models else 0
+        ab.usb_vendor = 0x1d6b
+        ab.usb_product = 0x1000 + index
+        ab.library = b'simulated'
+        ab.id = b'simulated'
+
+    def gp_abilities_list_new(self, out):
+        self._new(list(), out)
+        return GP_OK
+
+    def gp_abilities_list_load(self, handle, context):
+        result = self._enter('gp_abilities_list_load')
+        if result:
+            return result
+        self._get(handle)[:] = self.models
+        return GP_OK
+
+    def gp_abilities_list_count(self, handle):
+        return len(self._get(handle))
+
+    def gp_abilities_list_detect(self, handle, ports, out, context):
+        return self.gp_camera_autodetect(out, context)
+
+    def gp_abilities_list_lookup_model(self, handle, model):
+        try:
+            return self._get(handle).index(_text(model))
+        except ValueError:
+            return GP_ERROR_MODEL_NOT_FOUND
+
+    def gp_abilities_list_get_abilities(self, handle, index, out):
+        self._fill_abilities(out.contents, self._get(handle)[_value(index)])
+        return GP_OK
+
+    # --- ports ---
+
+    def gp_port_info_list_new(self, out):
+        self._new(list(), out)
+        return GP_OK
+
+    def gp_port_info_list_load(self, handle):
+        self._get(handle)[:] = [c.port for c in self.cameras]
+        return GP_OK
+
+    def gp_port_info_list_count(self, handle):
+        return len(self._get(handle))
+
+    def gp_port_info_list_lookup_path(self, handle, path):
+        ports = self._get(handle)
+        path = _text(path)
+        try:
+            return ports.index(path)
+        except ValueError:
+            pass
+        # like libgphoto2, add entries for usb devices that appeared
+        # since the list was loaded, ie. after a reset
+        if not path.startswith('usb:'):
+            return GP_ERROR_BAD_PARAMETERS
+        ports.append(path)
+        return len(ports) - 1
+
+    def gp_port_info_list_get_info(self, handle, index, out):
+        self._new(self._get(handle)[_value(index)], out)
+        return GP_OK
+
+    def gp_port_info_get_name(self, info, out):
+        out.contents.value = b'Universal Serial Bus'
+        return GP_OK
+
+    def gp_port_info_get_path(self, info, out):
+        out.contents.value = self._get(info).encode('ascii')
+        return GP_OK
+
+    def gp_port_info_get_type(self, info, out):
+        out.contents.value = GP_PORT_USB
+        return GP_OK
+
+    def gp_port_info_get_library_filename(self, info, out):
+        out.contents.value = b'simulated'
+        return GP_OK
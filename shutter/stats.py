@@ -0,0 +1,81 @@
+"""
+Counts and latency histograms of repeated calls.
+
+CallStats keeps a count, totals and a log-scale latency histogram, so
+percentiles cost a few counters however many calls are recorded.  It is
+used by instrument for the libgphoto2 calls, and by the writer and the
+intervalometer for their own timings.
+"""
+import collections
+import math
+
+__all__ = ['CallStats']
+
+# histogram buckets per doubling of latency; 4 gives about 19% resolution
+BUCKETS_PER_OCTAVE = 4
+
+# shortest latency told apart by the histogram, in seconds
+MIN_LATENCY = 1e-6
+
+
+class CallStats(object):
+    """ Calls to one function, maybe on one camera
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.bytes = 0
+        self.errors = collections.Counter()
+        self.buckets = collections.Counter()
+
+    def add(self, duration, result, size):
+        self.count += 1
+        self.total += duration
+        if duration > self.max:
+            self.max = duration
+        if size:
+            self.bytes += size
+        if isinstance(result, int) and result < 0:
+            self.errors[result] += 1
+        if duration > MIN_LATENCY:
+            bucket = int(math.log(duration / MIN_LATENCY, 2) *
+                         BUCKETS_PER_OCTAVE)
+        else:
+            bucket = 0
+        self.buckets[bucket] += 1
+
+    def percentile(self, fraction):
+        """ Latency below which fraction of the calls finished, in seconds
+
+        Accurate to the width of a histogram bucket.
+
+        :rtype: float
+        """
+        if not self.count:
+            return 0.0
+        wanted = fraction * self.count
+        seen = 0
+        for bucket in sorted(self.buckets):
+            seen += self.buckets[bucket]
+            if seen >= wanted:
+                break
+        upper = MIN_LATENCY * 2 ** ((bucket + 1) / float(BUCKETS_PER_OCTAVE))
+        return min(upper, self.max)
+
+    def as_dict(self):
+        """
+        :rtype: dict
+        """
+        return {
+            'count': self.count,
+            'total': self.total,
+            'mean': self.total / self.count if self.count else 0.0,
+            'max': self.max,
+            'p50': self.percentile(0.50),
+            'p95': self.percentile(0.95),
+            'p99': self.percentile(0.99),
+            'bytes': self.bytes,
+            'errors': dict(self.errors),
+        }
@@ -0,0 +1,195 @@
+"""
+Copy the contents of a camera's card to a local folder.
+
+Files already present locally with the same size and modification time are
+skipped, so running a sync again only fetches what is new.  Each file is
+streamed to a '.part' file next to its destination and renamed into place
+when complete; an interrupted sync resumes from the '.part' files where the
+driver supports partial reads.  A '.part' file left by a failed download
+gets the modification time of the file on the camera, so a sync only
+resumes it if the file on the camera is still the same.
+
+Reading from the camera and writing to disk overlap: chunks read from the
+card are handed to a writer thread through a bounded queue, so at most
+`depth` chunks are held in memory.
+"""
+import os
+import queue
+import threading
+
+from .shutter import DEFAULT_CHUNK_SIZE
+from .shutter import GP_ERROR_CORRUPTED_DATA
+from .shutter import GP_FILE_INFO_MTIME
+from .shutter import GP_FILE_INFO_SIZE
+from .shutter import ShutterError
+
+__all__ = ['SyncResult', 'sync']
+
+PART_SUFFIX = '.part'
+
+# chunks waiting for the writer thread
+QUEUE_DEPTH = 8
+
+
+class SyncResult(object):
+    """ What a sync did
+
+    downloaded and skipped are lists of local paths.
+    """
+
+    def __init__(self):
+        self.downloaded = list()
+        self.skipped = list()
+        self.bytes = 0
+
+    def __repr__(self):
+        return '<SyncResult %d downloaded, %d skipped, %d bytes>' % (
+            len(self.downloaded), len(self.skipped), self.bytes)
+
+
+class _BackgroundWriter(object):
+    """ File-like object that writes to fp on a separate thread
+
+    write() blocks once `depth` chunks are waiting.  Errors raised by the
+    writer thread are raised again from write() or close().
+    """
+
+    def __init__(self, fp, depth=QUEUE_DEPTH):
+        self._fp = fp
+        self._queue = queue.Queue(depth)
+        self._error = None
+        self._thread = threading.Thread(target=self._run,
+                                        name='BackgroundWriter')
+        self._thread.daemon = True
+        self._thread.start()
+
+    def _run(self):
+        while True:
+            chunk = self._queue.get()
+            if chunk is None:
+                break
+            if self._error is None:
+                try:
+                    self._fp.write(chunk)
+                except Exception as e:
+                    self._error = e
+
+    def _check(self):
+        if self._error is not None:
+            raise self._error
+
+    def write(self, view):
+        self._check()
+        # the camera reuses its buffer, so the chunk must be copied
+        self._queue.put(bytes(view))
+
+    def close(self):
+        self._queue.put(None)
+        self._thread.join()
+        self._check()
+
+
+def _is_current(path, size, mtime):
+    try:
+        st = os.stat(path)
+    except OSError:
+        return False
+    if size is not None and st.st_size != size:
+        return False
+    if mtime is not None and int(st.st_mtime) != mtime:
+        return False
+    return True
+
+
+def _resume_offset(part, size, mtime):
+    """ Bytes of a '.part' file to keep; 0 if it isn't of this file
+    """
+    try:
+        st = os.stat(part)
+    except OSError:
+        return 0
+    if size is not None and st.st_size > size:
+        return 0
+    if mtime is not None and int(st.st_mtime) != mtime:
+        return 0
+    return st.st_size
+
+
+def sync(camera, dest_dir, top='/', refresh=True,
+         chunk_size=DEFAULT_CHUNK_SIZE, depth=QUEUE_DEPTH, progress=None):
+    """ Copy new and changed files below top on the camera to dest_dir
+
+    Args:
+        camera (Camera): camera to copy from
+        dest_dir (str): local folder; the camera's folders are recreated
+            inside it
+
+    Kwargs:
+        top (str): folder on the camera to start from
+        refresh (bool): list the card again instead of using the listing
+            cached by Camera.walk
+        chunk_size (int): bytes read from the camera at a time
+        depth (int): chunks that may wait for the disk
+        progress (callable): called as progress(path, transferred, total)
+            while each file is copied
+
+    Returns:
+        result (SyncResult)
+
+    Raises:
+        ShutterError, IOError
+    """
+    result = SyncResult()
+    top = top.rstrip('/') or '/'
+
+    for folder, folders, files in camera.walk(top, refresh=refresh):
+        relative = folder[len(top):].strip('/')
+        local_dir = os.path.join(dest_dir, *relative.split('/')) \
+            if relative else dest_dir
+        if files and not os.path.isdir(local_dir):
+            os.makedirs(local_dir)
+
+        for name in files:
+            info = camera.get_file_info(folder, name)
+            size = info.size if info.fields & GP_FILE_INFO_SIZE else None
+            mtime = info.mtime if info.fields & GP_FILE_INFO_MTIME else None
+            path = os.path.join(local_dir, name)
+
+            if _is_current(path, size, mtime):
+                result.skipped.append(path)
+                continue
+
+            part = path + PART_SUFFIX
+            offset = _resume_offset(part, size, mtime)
+
+            callback = None
+            if progress is not None:
+                callback = lambda done, total, path=path: progress(path, done,
+                                                                    total)
+
+            try:
+                with open(part, 'ab' if offset else 'wb') as fp:
+                    writer = _BackgroundWriter(fp, depth)
+                    try:
+                        written = camera.download_to(folder, name, writer,
+                                                     chunk_size=chunk_size,
+                                                     progress=callback,
+                                                     offset=offset)
+                    finally:
+                        writer.close()
+            except BaseException:
+                # mark what the part is of, for the sync that resumes it
+                if mtime is not None and os.path.exists(part):
+                    os.utime(part, (mtime, mtime))
+                raise
+
+            if size is not None and offset + written != size:
+                raise ShutterError(GP_ERROR_CORRUPTED_DATA,
+                                   'incomplete download of %s' % name)
+            os.rename(part, path)
+            if mtime is not None:
+                os.utime(path, (mtime, mtime))
+            result.downloaded.append(path)
+            result.bytes += written
+
+    return result
@@ -0,0 +1,187 @@
+"""
+Drive a camera from a dedicated thread.
+
+libgphoto2 is not thread safe, so every call for one camera must be made
+from one thread.  A CameraWorker owns that thread, along with the Camera and
+a GPContext of its own.  Jobs are queued to it and answered with futures.
+
+ctypes releases the GIL for the duration of each libgphoto2 call, so
+workers for different cameras run in parallel.
+"""
+import queue
+import threading
+from concurrent.futures import Future
+
+from .shutter import Camera
+from .shutter import gp
+from .shutter import new_context
+
+__all__ = ['CameraWorker']
+
+# sentinel put on the queue to stop the worker thread
+_STOP = object()
+
+
+class CameraWorker(object):
+    """ Run a Camera on its own thread and queue jobs for it.
+
+    Kwargs:
+        regex: passed on to Camera to select the model
+        info (CameraInfo): camera from discover() to open instead
+        maxsize (int): bound on queued jobs; submit blocks when full
+        name (str): name for the worker thread
+
+    Raises:
+        ShutterError: if the camera cannot be opened
+
+    Jobs run in the order they are submitted.  Use as a context manager, or
+    call close() when finished.
+
+        with CameraWorker(re.compile('canon')) as worker:
+            futures = [worker.capture_image() for i in range(10)]
+            images = [f.result() for f in futures]
+    """
+
+    def __init__(self, regex=None, maxsize=0, name=None, info=None):
+        self._queue = queue.Queue(maxsize)
+        self._closed = False
+        self._lock = threading.Lock()     # orders submit against close
+        self._camera = None
+        opened = Future()
+        self._thread = threading.Thread(target=self._run,
+                                        args=(regex, info, opened),
+                                        name=name or 'CameraWorker')
+        self._thread.daemon = True
+        self._thread.start()
+        opened.result()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def _run(self, regex, info, opened):
+        context = new_context()
+        try:
+            self._serve(regex, info, opened, context)
+        finally:
+            # the camera is closed, so nothing uses the context any more
+            gp.gp_context_unref(context)
+
+    def _serve(self, regex, info, opened, context):
+        try:
+            if info is not None:
+                self._camera = info.open(context)
+            else:
+                self._camera = Camera(regex, context=context)
+        except BaseException as e:
+            opened.set_exception(e)
+            return
+        opened.set_result(None)
+
+        camera = self._camera
+        while True:
+            job = self._queue.get()
+            if job is _STOP:
+                break
+            future, func, args, kwargs = job
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                result = func(camera, *args, **kwargs)
+            except BaseException as e:
+                future.set_exception(e)
+            else:
+                future.set_result(result)
+
+        self._camera = None
+        try:
+            camera.close()
+        finally:
+            self._fail_pending()
+
+    def _fail_pending(self):
+        """ Fail the futures of jobs that will never run
+        """
+        while True:
+            try:
+                job = self._queue.get_nowait()
+            except queue.Empty:
+                return
+            if job is not _STOP and job[0].set_running_or_notify_cancel():
+                job[0].set_exception(
+                    RuntimeError('CameraWorker closed before the job ran'))
+
+    @property
+    def camera(self):
+        """ The Camera driven by this worker.
+
+        Only touch it from inside a job; calling it from other threads is
+        exactly what the worker is here to prevent.
+
+        :rtype: Camera
+        """
+        return self._camera
+
+    @property
+    def pending(self):
+        """ Number of jobs waiting to run
+
+        :rtype: int
+        """
+        return self._queue.qsize()
+
+    def submit(self, func, *args, **kwargs):
+        """ Queue func(camera, *args, **kwargs) to run on the worker thread
+
+        :rtype: concurrent.futures.Future
+        """
+        future = Future()
+        with self._lock:
+            # checked under the lock, so no job lands behind the stop
+            if self._closed:
+                raise RuntimeError('cannot submit to a closed CameraWorker')
+            self._queue.put((future, func, args, kwargs))
+        return future
+
+    def capture_image(self, destpath=None, return_buffer=False):
+        """ Queue Camera.capture_image
+
+        :rtype: concurrent.futures.Future
+        """
+        return self.submit(Camera.capture_image, destpath, return_buffer)
+
+    def capture_preview(self, destpath=None):
+        """ Queue Camera.capture_preview
+
+        :rtype: concurrent.futures.Future
+        """
+        return self.submit(Camera.capture_preview, destpath)
+
+    def download(self, srcfolder, srcfilename):
+        """ Queue Camera.download
+
+        :rtype: concurrent.futures.Future
+        """
+        return self.submit(Camera.download, srcfolder, srcfilename)
+
+    def download_to(self, srcfolder, srcfilename, dest, **kwargs):
+        """ Queue Camera.download_to
+
+        :rtype: concurrent.futures.Future
+        """
+        return self.submit(Camera.download_to, srcfolder, srcfilename, dest,
+                           **kwargs)
+
+    def close(self, wait=True):
+        """ Stop the worker once the queued jobs have run, and close the camera
+
+        :type wait: bool
+        """
+        with self._lock:
+            if not self._closed:
+                self._closed = True
+                self._queue.put(_STOP)
+        if wait and self._thread is not threading.current_thread():
+            self._thread.join()
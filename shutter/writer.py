@@ -0,0 +1,303 @@
+"""
+Write images to disk in the background.
+
+Saving a capture on the capturing thread leaves the camera idle while the
+host writes, and a slow or stalling disk slows the shooting rate with it.
+A DiskWriter takes the data and returns at once; a few writer threads
+write it out.
+
+    writer = DiskWriter()
+    for i in range(100):
+        camera.capture_image('shot%03d.jpg' % i, writer=writer)
+    writer.close()
+
+The queue is bounded.  When the disk falls so far behind that it fills,
+write() blocks until there is room, so a capture loop slows down instead
+of holding every image in memory.
+
+Each file is written under a temporary name in its destination folder and
+renamed into place once complete, so a file at the final path is never
+partial.  fsync is deferred and done for a batch of files at a time,
+followed by one fsync of each folder, so durability doesn't cost a disk
+flush per image.
+"""
+import itertools
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+from .stats import CallStats
+
+__all__ = ['DiskWriter']
+
+# sentinel put on the queue to stop a writer thread
+_STOP = object()
+
+
+class DiskWriter(object):
+    """ Thread pool that writes data to files
+
+    Kwargs:
+        threads (int): writer threads
+        depth (int): writes that may wait in the queue
+        fsync (bool): make each file durable before reporting it written
+        batch (int): most files a thread writes before syncing them
+        atomic (bool): write to a temporary file and rename it into place
+
+    Use as a context manager, or call close() when finished.  Errors are
+    set on the future returned by write(), and raised again by flush()
+    and close().
+    """
+
+    def __init__(self, threads=2, depth=16, fsync=True, batch=8,
+                 atomic=True):
+        self.fsync = fsync
+        self.batch = batch
+        self.atomic = atomic
+        self._queue = queue.Queue(depth)
+        self._lock = threading.Lock()
+        # held while queueing, so nothing is queued behind a _STOP; not
+        # self._lock, which the writer threads need to drain a full queue
+        self._queue_lock = threading.Lock()
+        self._error = None
+        self._closed = False
+        self._serial = itertools.count()
+        self.written = 0
+        self.bytes = 0
+        self.errors = 0
+        self.latency = CallStats()
+        self.write_time = CallStats()
+        self._threads = list()
+        for i in range(threads):
+            thread = threading.Thread(target=self._run,
+                                      name='DiskWriter-%d' % i)
+            thread.daemon = True
+            thread.start()
+            self._threads.append(thread)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    @property
+    def depth(self):
+        """ Writes waiting in the queue
+
+        :rtype: int
+        """
+        return self._queue.qsize()
+
+    def stats(self):
+        """ Counts and latencies so far
+
+        latency is from write() until the file is written, and synced if
+        fsync is on; write_time is the time spent writing each file.
+
+        :rtype: dict
+        """
+        with self._lock:
+            return {
+                'depth': self.depth,
+                'written': self.written,
+                'bytes': self.bytes,
+                'errors': self.errors,
+                'latency': self.latency.as_dict(),
+                'write_time': self.write_time.as_dict(),
+            }
+
+    def write(self, path, data, timeout=None):
+        """ Queue data to be written to path
+
+        Args:
+            path (str): destination file; replaced if it exists
+            data: bytes, or a buffer such as CameraFile.get_buffer(), which
+                is kept alive until it has been written
+
+        Kwargs:
+            timeout (float): seconds to wait for room in the queue; None
+                waits as long as it takes
+
+        Returns:
+            future (concurrent.futures.Future): resolves to path once the
+                file is in place
+
+        Raises:
+            queue.Full: if the timeout expired
+            RuntimeError: if the writer is closed
+        """
+        queued = time.monotonic()
+        if timeout is None:
+            self._queue_lock.acquire()
+        elif not self._queue_lock.acquire(True, timeout):
+            raise queue.Full
+        try:
+            if self._closed:
+                raise RuntimeError('cannot write to a closed DiskWriter')
+            if timeout is not None:
+                timeout = max(timeout - (time.monotonic() - queued), 0)
+            future = Future()
+            self._queue.put((future, path, data, queued), True, timeout)
+        finally:
+            self._queue_lock.release()
+        return future
+
+    def flush(self):
+        """ Wait until everything queued is written
+
+        Raises:
+            the first error since the last flush, if any
+        """
+        self._queue.join()
+        with self._lock:
+            error, self._error = self._error, None
+        if error is not None:
+            raise error
+
+    def close(self, wait=True):
+        """ Write what is queued, then stop the threads
+
+        Kwargs:
+            wait (bool): wait for the threads to finish
+
+        Raises:
+            the first error since the last flush, if any
+        """
+        with self._queue_lock:
+            if not self._closed:
+                self._closed = True
+                for thread in self._threads:
+                    self._queue.put(_STOP)
+        if wait:
+            for thread in self._threads:
+                thread.join()
+            self.flush()
+
+    def _run(self):
+        pending = list()
+        stop = False
+        while not stop:
+            # block for the first item; take what else is waiting without
+            # blocking, up to a batch
+            item = self._queue.get()
+            while True:
+                if item is _STOP:
+                    stop = True
+                    self._queue.task_done()
+                    break
+                pending.append(self._write(*item))
+                if len(pending) >= self.batch:
+                    break
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+            self._commit(pending)
+            del pending[:]
+
+    def _write(self, future, path, data, queued):
+        """ Write one file, leaving it to _commit to sync and rename
+        """
+        item = _Pending(future, path, queued)
+        if not future.set_running_or_notify_cancel():
+            item.cancelled = True
+            return item
+        start = time.monotonic()
+        if self.atomic:
+            folder, name = os.path.split(path)
+            item.temp = os.path.join(folder, '.%s.%d.tmp' % (
+                name, next(self._serial)))
+        try:
+            item.fp = open(item.temp or path, 'wb')
+            item.fp.write(data)
+            item.fp.flush()
+        except Exception as e:
+            item.fail(e)
+            return item
+        item.size = len(memoryview(data))
+        with self._lock:
+            self.write_time.add(time.monotonic() - start, 0, item.size)
+        return item
+
+    def _commit(self, pending):
+        """ Sync and rename a batch of written files
+        """
+        folders = set()
+        for item in pending:
+            if item.fp is None:
+                continue
+            try:
+                if self.fsync:
+                    os.fsync(item.fp.fileno())
+                item.fp.close()
+                if item.temp is not None:
+                    os.replace(item.temp, item.path)
+                    folders.add(os.path.dirname(item.path) or '.')
+            except Exception as e:
+                item.fail(e)
+
+        if self.fsync:
+            for folder in folders:
+                _fsync_dir(folder)
+
+        now = time.monotonic()
+        for item in pending:
+            if not item.cancelled:
+                with self._lock:
+                    if item.error is None:
+                        self.written += 1
+                        self.bytes += item.size
+                        self.latency.add(now - item.queued, 0, None)
+                    else:
+                        self.errors += 1
+                        if self._error is None:
+                            self._error = item.error
+                if item.error is None:
+                    item.future.set_result(item.path)
+                else:
+                    item.future.set_exception(item.error)
+            self._queue.task_done()
+
+
+class _Pending(object):
+    """ A file written by a writer thread but not yet committed
+    """
+
+    def __init__(self, future, path, queued):
+        self.future = future
+        self.path = path
+        self.queued = queued
+        self.temp = None
+        self.fp = None
+        self.size = 0
+        self.error = None
+        self.cancelled = False
+
+    def fail(self, error):
+        self.error = error
+        if self.fp is not None:
+            self.fp.close()
+            self.fp = None
+        if self.temp is not None:
+            try:
+                os.unlink(self.temp)
+            except OSError:
+                pass
+
+
+def _fsync_dir(folder):
+    """ Make renames in folder durable
+    """
+    try:
+        fd = os.open(folder, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
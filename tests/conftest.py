@@ -0,0 +1,33 @@
+import gc
+
+import pytest
+
+import shutter
+from shutter.simulator import SimulatedLibrary
+
+
+@pytest.fixture
+def simulate():
+    """ Load a simulated library of the cameras given, and return it
+
+    Cameras opened through the library are closed after the test.
+    """
+    opened = list()
+
+    def load(*cameras, **kwargs):
+        sim = SimulatedLibrary(list(cameras), **kwargs)
+        shutter.load(backend=sim)
+        return sim
+
+    def open_camera(*args, **kwargs):
+        camera = shutter.Camera(*args, **kwargs)
+        opened.append(camera)
+        return camera
+
+    load.camera = open_camera
+    yield load
+    while opened:
+        opened.pop().close()
+    # cameras kept in a cycle by their config must be freed before the
+    # next test loads another library
+    gc.collect()
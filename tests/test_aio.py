@@ -0,0 +1,79 @@
+import asyncio
+import threading
+
+import pytest
+
+from shutter.aio import AsyncCamera
+from shutter.operation import CancelToken
+from shutter.shutter import GP_ERROR_CANCEL
+from shutter.shutter import GP_EVENT_FILE_ADDED
+from shutter.shutter import ShutterError
+from shutter.simulator import SimulatedCamera
+
+FOLDER = '/store_00010001/DCIM/100SIMUL'
+
+
+def test_capture_and_download(simulate):
+    simulate(SimulatedCamera('Sim', image_size=4096))
+
+    async def main():
+        camera = await AsyncCamera.open()
+        async with camera:
+            data = await camera.capture_image()
+            cfile = await camera.download(FOLDER, 'IMG_0001.JPG')
+            return data, cfile.get_data()
+
+    data, again = asyncio.run(main())
+    assert len(data) == 4096
+    assert again == data
+
+
+def test_calls_run_off_the_loop(simulate):
+    simulate(SimulatedCamera('Sim'))
+
+    async def main():
+        camera = await AsyncCamera.open()
+        async with camera:
+            return await camera.run(lambda cam: threading.current_thread())
+
+    assert asyncio.run(main()) is not threading.current_thread()
+
+
+def test_events(simulate):
+    simulate(SimulatedCamera('Sim', capture_time=0.05))
+
+    async def main():
+        camera = await AsyncCamera.open()
+        async with camera:
+            await camera.run(lambda cam: cam.trigger_capture())
+            async for event in camera.events(timeout=20):
+                return event
+
+    event = asyncio.run(asyncio.wait_for(main(), 5))
+    assert event.type == GP_EVENT_FILE_ADDED
+
+
+def test_cancel_running_call_with_token(simulate):
+    # a 4 MB file at 1 MB/s
+    simulate(SimulatedCamera('Sim', files={FOLDER: {'MVI_0001.MOV':
+                                                    4 * 1024 * 1024}}),
+             transfer_rate=1024 * 1024)
+    token = CancelToken()
+
+    def fetch(cam):
+        with cam.operation(token=token):
+            return cam.download(FOLDER, 'MVI_0001.MOV')
+
+    async def main():
+        camera = await AsyncCamera.open()
+        async with camera:
+            task = asyncio.ensure_future(camera.run(fetch))
+            try:
+                await asyncio.wait_for(asyncio.shield(task), 0.2)
+            except asyncio.TimeoutError:
+                token.cancel()
+            with pytest.raises(ShutterError) as info:
+                await task
+            return info.value.result
+
+    assert asyncio.run(asyncio.wait_for(main(), 3)) == GP_ERROR_CANCEL
@@ -0,0 +1,93 @@
+import io
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import shutter
+from shutter import arrays
+from shutter.simulator import SimulatedCamera
+
+numpy = pytest.importorskip('numpy')
+Image = pytest.importorskip('PIL.Image')
+
+WIDTH, HEIGHT = 64, 48
+
+
+def make_jpeg(width=WIDTH, height=HEIGHT, color=(200, 30, 10)):
+    fp = io.BytesIO()
+    Image.new('RGB', (width, height), color).save(fp, 'JPEG')
+    return fp.getvalue()
+
+
+@pytest.fixture(params=['simplejpeg', 'pil'])
+def decoder(request, monkeypatch):
+    if request.param == 'simplejpeg':
+        pytest.importorskip('simplejpeg')
+    else:
+        monkeypatch.setattr(arrays, 'simplejpeg', None)
+    return request.param
+
+
+@pytest.fixture
+def camera(simulate):
+    simulate(SimulatedCamera('Sim', port='usb:001,001',
+                             preview_data=make_jpeg()))
+    return simulate.camera()
+
+
+def test_preview_as_array(camera, decoder):
+    pool = arrays.ArrayPool()
+    camfile = shutter.CameraFile()
+    frame = camera.capture_preview(camfile=camfile, as_array=True, pool=pool)
+    assert frame.shape == (HEIGHT, WIDTH, 3)
+    assert frame.dtype == numpy.uint8
+    assert abs(int(frame[0, 0, 0]) - 200) < 8
+
+    pool.release(frame)
+    again = camera.capture_preview(camfile=camfile, as_array=True,
+                                   pool=pool)
+    assert again is frame
+
+
+@pytest.mark.parametrize('colorspace,channels', [
+    ('RGB', 3), ('BGR', 3), ('GRAY', 1)])
+def test_decode_colorspace(camera, decoder, colorspace, channels):
+    camfile = shutter.CameraFile()
+    camera.capture_preview(camfile=camfile)
+    frame = arrays.decode(camfile.get_buffer(), colorspace=colorspace)
+    assert frame.shape == (HEIGHT, WIDTH, channels)
+    if colorspace == 'BGR':
+        assert frame[0, 0, 2] > frame[0, 0, 0]
+
+
+def test_decode_into_out(decoder):
+    out = numpy.empty((HEIGHT, WIDTH, 3), numpy.uint8)
+    assert arrays.decode(make_jpeg(), out=out) is out
+    with pytest.raises(ValueError):
+        arrays.decode(make_jpeg(), out=numpy.empty((2, 2, 3), numpy.uint8))
+
+
+def test_decode_batch_reuses_pool(camera, decoder):
+    pool = arrays.ArrayPool()
+    frames = [camera.capture_preview() for i in range(4)]
+    batch = arrays.decode_batch(frames, pool=pool)
+    assert batch.shape == (4, HEIGHT, WIDTH, 3)
+
+    pool.release(batch)
+    with ThreadPoolExecutor(2) as executor:
+        again = arrays.decode_batch(frames, pool=pool, executor=executor)
+    assert again is batch
+
+
+def test_decode_batch_sizes_differ(decoder):
+    with pytest.raises(ValueError):
+        arrays.decode_batch([make_jpeg(), make_jpeg(32, 24)])
+
+
+def test_pool_keeps_max_arrays():
+    pool = arrays.ArrayPool(max_arrays=1)
+    first, second = pool.get((2, 3)), pool.get([2, 3])
+    pool.release(first)
+    pool.release(second)
+    assert pool.get((2, 3)) is first
+    assert pool.get((2, 3)) is not second
@@ -0,0 +1,184 @@
+import gc
+import io
+import os
+import socket
+import threading
+
+import pytest
+
+import shutter
+from shutter.shutter import GP_ERROR_CAMERA_BUSY
+from shutter.shutter import MAX_PENDING_DELETES
+from shutter.simulator import SimulatedCamera
+
+
+def test_capture_image_buffer(simulate):
+    simulate(SimulatedCamera('Sim', image_size=4096))
+    camera = simulate.camera()
+    data = camera.capture_image()
+    view = camera.capture_image(return_buffer=True)
+    assert isinstance(data, bytes)
+    assert isinstance(view, memoryview)
+    assert view.readonly
+    assert len(view) == len(data) == 4096
+
+
+def test_get_buffer_is_not_a_copy(simulate):
+    simulate(SimulatedCamera('Sim', preview_size=1000))
+    camera = simulate.camera()
+    camfile = shutter.CameraFile()
+    camera.capture_preview(camfile=camfile)
+    view = camfile.get_buffer()
+    assert bytes(view) == camfile.get_data()
+    assert bytes(view[10:20]) == camfile.get_data()[10:20]
+
+
+FOLDER = '/store_00010001/DCIM/100SIMUL'
+
+
+def card(size, **kwargs):
+    return SimulatedCamera('Sim', files={FOLDER: {'IMG_0001.JPG': size}},
+                           **kwargs)
+
+
+def test_download_to_streams_in_chunks(simulate):
+    simulate(card(300 * 1024))
+    camera = simulate.camera()
+    expected = camera.download(FOLDER, 'IMG_0001.JPG').get_data()
+    seen = list()
+    fp = io.BytesIO()
+    written = camera.download_to(FOLDER, 'IMG_0001.JPG', fp,
+                                 chunk_size=64 * 1024,
+                                 progress=lambda done, total:
+                                 seen.append((done, total)))
+    assert written == len(expected)
+    assert fp.getvalue() == expected
+    assert seen[-1] == (len(expected), len(expected))
+    steps = [b[0] - a[0] for a, b in zip([(0, 0)] + seen, seen)]
+    assert max(steps) <= 64 * 1024
+
+
+def test_download_to_offset(simulate):
+    simulate(card(100000))
+    camera = simulate.camera()
+    expected = camera.download(FOLDER, 'IMG_0001.JPG').get_data()
+    fp = io.BytesIO()
+    assert camera.download_to(FOLDER, 'IMG_0001.JPG', fp,
+                              offset=40000) == 60000
+    assert fp.getvalue() == expected[40000:]
+
+
+def test_download_to_fd_and_socket(simulate, tmpdir):
+    # without partial reads, libgphoto2 writes to the descriptor itself
+    simulate(card(50000, partial_reads=False))
+    camera = simulate.camera()
+    expected = camera.download(FOLDER, 'IMG_0001.JPG').get_data()
+
+    path = os.path.join(str(tmpdir), 'out.jpg')
+    with open(path, 'wb') as fp:
+        camera.download_to(FOLDER, 'IMG_0001.JPG', fp)
+    with open(path, 'rb') as fp:
+        assert fp.read() == expected
+
+    left, right = socket.socketpair()
+    received = list()
+    reader = threading.Thread(target=lambda: received.append(
+        b''.join(iter(lambda: right.recv(65536), b''))))
+    reader.start()
+    camera.download_to(FOLDER, 'IMG_0001.JPG', left)
+    left.close()
+    reader.join()
+    right.close()
+    assert received == [expected]
+
+
+def test_burst(simulate):
+    simulate(SimulatedCamera('Sim', image_size=4096))
+    files = list(simulate.camera().burst(4))
+    assert len(files) == 4
+    for event, camfile in files:
+        assert len(camfile.get_data()) == 4096
+
+
+def test_burst_raw_and_jpeg(simulate):
+    # the RAW file comes two polls after the JPEG
+    simulate(SimulatedCamera('Sim', image_size=4096, capture_time=0.01,
+                             raw_time=0.1))
+    camera = simulate.camera()
+    files = list(camera.burst(3, poll=50, files_per_shot=2))
+    names = sorted(event.path.name for event, camfile in files)
+    assert names == [b'IMG_0001.CR2', b'IMG_0001.JPG',
+                     b'IMG_0002.CR2', b'IMG_0002.JPG',
+                     b'IMG_0003.CR2', b'IMG_0003.JPG']
+
+
+def test_burst_busy_camera(simulate):
+    sim = simulate(SimulatedCamera('Sim', image_size=4096))
+    sim.fail('gp_camera_trigger_capture', GP_ERROR_CAMERA_BUSY, count=2)
+    assert len(list(simulate.camera().burst(3))) == 3
+    assert sim.calls['gp_camera_trigger_capture'] == 5
+
+
+def test_capture_to_ram_deletes(simulate):
+    cam = SimulatedCamera('Sim', image_size=4096)
+    simulate(cam)
+    camera = simulate.camera()
+    camera.capture_to_ram = True
+    assert camera.capture_to_ram
+
+    for i in range(MAX_PENDING_DELETES + 2):
+        assert len(camera.capture_image()) == 4096
+    assert len(camera._deletes) < MAX_PENDING_DELETES
+    camera.wait_for_event(1)
+    assert len(cam.deleted) == MAX_PENDING_DELETES + 2
+    assert not cam.folders['/']
+
+    files = list(camera.burst(3))
+    assert len(files) == 3
+    camera.delete_pending()
+    assert len(cam.deleted) == MAX_PENDING_DELETES + 5
+    assert not cam.folders['/']
+
+    camera.capture_to_ram = False
+    assert cam.find_widget('capturetarget').value == 'Memory card'
+
+
+def test_capture_to_ram_keeps_queued_changes(simulate):
+    cam = SimulatedCamera('Sim')
+    simulate(cam)
+    camera = simulate.camera()
+    config = camera.config
+    config['iso'] = '800'
+
+    camera.capture_to_ram = True
+    assert cam.find_widget('capturetarget').value == 'Internal RAM'
+    assert cam.find_widget('iso').value == '100'
+    assert config.pending == {'/main/imgsettings/iso': '800'}
+
+    config.apply()
+    assert cam.find_widget('iso').value == '800'
+    assert cam.find_widget('capturetarget').value == 'Internal RAM'
+
+
+def test_capture_to_ram_unsupported(simulate):
+    cam = SimulatedCamera('Sim', ram_capture=False)
+    simulate(cam)
+    camera = simulate.camera()
+    camera.capture_to_ram = True
+    assert not camera.capture_to_ram
+    camera.capture_image()
+    assert not cam.deleted
+
+
+@pytest.mark.filterwarnings('error::pytest.PytestUnraisableExceptionWarning')
+def test_download_and_save(simulate, tmpdir):
+    sim = simulate(card(5000))
+    camera = simulate.camera()
+    path = os.path.join(str(tmpdir), 'a.jpg')
+    camera.download_and_save(FOLDER, 'IMG_0001.JPG', path)
+    assert os.path.getsize(path) == 5000
+    camera.download_and_save(FOLDER.encode('ascii'), b'IMG_0001.JPG',
+                             path.encode('ascii'))
+    gc.collect()
+    assert not [obj for obj in sim._objects.values()
+                if type(obj).__name__ == '_File']
@@ -0,0 +1,78 @@
+import pytest
+
+from shutter.shutter import GP_ERROR_NOT_SUPPORTED
+from shutter.shutter import ShutterError
+from shutter.simulator import SimulatedCamera
+
+
+@pytest.fixture
+def camera(simulate):
+    simulate.sim = simulate(SimulatedCamera('Sim'))
+    return simulate.camera()
+
+
+def test_one_round_trip(camera, simulate):
+    config = camera.config
+    assert config['iso'] == '100'
+    assert config['shutterspeed'] == '1/125'
+    assert config['/main/capturesettings/aperture'] == '5.6'
+    assert '2.8' in config.choices('aperture')
+    assert 'serialnumber' in config.names()
+    assert simulate.sim.calls['gp_camera_get_config'] == 1
+
+
+def test_batched_apply(camera, simulate):
+    sim = simulate.sim
+    config = camera.config
+    config['iso'] = '400'
+    config['aperture'] = '8'
+    assert config['iso'] == '400'
+    assert sim.cameras[0].find_widget('iso').value == '100'
+    assert len(config.pending) == 2
+
+    config.apply()
+    assert sim.calls['gp_camera_set_config'] == 1
+    assert not config.pending
+    assert sim.cameras[0].find_widget('iso').value == '400'
+    assert sim.cameras[0].find_widget('aperture').value == '8'
+
+    config.discard()
+    config.apply()
+    assert sim.calls['gp_camera_set_config'] == 1
+
+
+def test_discard(camera, simulate):
+    config = camera.config
+    config['iso'] = '1600'
+    config.discard()
+    assert config['iso'] == '100'
+
+
+def test_read_only(camera):
+    with pytest.raises(ShutterError) as info:
+        camera.config['serialnumber'] = '1'
+    assert info.value.result == GP_ERROR_NOT_SUPPORTED
+    with pytest.raises(KeyError):
+        camera.config['nothing']
+
+
+def test_setting_properties(camera, simulate):
+    camera.shutter_speed = '1/500'
+    camera.iso = '800'
+    assert camera.shutter_speed == '1/500'
+    assert camera.iso == '800'
+    assert camera.aperture == '5.6'
+    assert simulate.sim.cameras[0].find_widget('shutterspeed').value == \
+        '1/500'
+
+
+def test_refreshed_after_property_change(camera, simulate):
+    sim = simulate.sim
+    config = camera.config
+    assert config['iso'] == '100'
+    # the camera reports a change made on its dials
+    sim.cameras[0].find_widget('iso').value = '200'
+    sim.cameras[0].events.append((0, 'unknown', 'PTP Property 500f changed'))
+    camera.wait_for_event(10)
+    assert config['iso'] == '200'
+    assert sim.calls['gp_camera_get_config'] == 2
@@ -0,0 +1,92 @@
+import hashlib
+import io
+import os
+
+import pytest
+
+from shutter.digest import DigestIndex
+from shutter.digest import Hasher
+from shutter.simulator import DCIM
+from shutter.simulator import SimulatedCamera
+
+
+def card():
+    return SimulatedCamera('Canon EOS 5D', files={
+        DCIM: {'IMG_0001.JPG': 300000, 'IMG_0002.JPG': 5000}})
+
+
+def test_hasher():
+    hasher = Hasher(('sha256', 'md5'))
+    assert hasher.algorithms == ('sha256', 'md5')
+    written = list()
+    write = hasher.wrap(written.append)
+    write(b'abc')
+    hasher.update(memoryview(b'def'))
+    assert written == [b'abc']
+    assert hasher.hexdigests() == {
+        'sha256': hashlib.sha256(b'abcdef').hexdigest(),
+        'md5': hashlib.md5(b'abcdef').hexdigest()}
+    with pytest.raises(ValueError):
+        Hasher('no-such-hash')
+    with pytest.raises(ValueError):
+        Hasher(())
+
+
+def test_index(tmpdir):
+    path = os.path.join(str(tmpdir), 'offload.db')
+    with DigestIndex(path) as index:
+        index.add('/a/b.jpg:3:1', {'sha256': 'aa', 'md5': 'bb'})
+        index.add('/a/c.jpg:3:1', {'sha256': 'aa'})
+        assert len(index) == 2
+        assert '/a/b.jpg:3:1' in index
+        assert index.get('/a/d.jpg:3:1') is None
+        assert sorted(index.find('sha256', 'aa')) == [
+            '/a/b.jpg:3:1', '/a/c.jpg:3:1']
+    with DigestIndex(path) as index:
+        assert index.get('/a/b.jpg:3:1') == {'sha256': 'aa', 'md5': 'bb'}
+
+
+def test_download_digests(simulate):
+    simulate(card())
+    camera = simulate.camera()
+    data = bytes(camera.download(DCIM, 'IMG_0001.JPG').get_data())
+    expected = hashlib.sha256(data).hexdigest()
+
+    cfile, digests = camera.download(DCIM, 'IMG_0001.JPG', digests='sha256')
+    assert digests == {'sha256': expected}
+
+    # hashed chunk by chunk as it streams
+    fp = io.BytesIO()
+    size, digests = camera.download_to(DCIM, 'IMG_0001.JPG', fp,
+                                       chunk_size=65536, digests='sha256')
+    assert size == len(data) == 300000
+    assert digests == {'sha256': expected}
+    assert fp.getvalue() == data
+
+
+def test_index_skips_known(simulate):
+    sim = simulate(card())
+    camera = simulate.camera()
+    with DigestIndex() as index:
+        cfile, first = camera.download(DCIM, 'IMG_0001.JPG', index=index)
+        assert cfile is not None
+        reads = sim.calls['gp_camera_file_get']
+        cfile, again = camera.download(DCIM, 'IMG_0001.JPG', index=index)
+        assert cfile is None
+        assert again == first
+        assert sim.calls['gp_camera_file_get'] == reads
+
+        fp = io.BytesIO()
+        size, digests = camera.download_to(DCIM, 'IMG_0002.JPG', fp,
+                                           index=index)
+        assert size == 5000
+        assert camera.download_to(DCIM, 'IMG_0002.JPG', io.BytesIO(),
+                                  index=index) == (None, digests)
+        assert len(index) == 2
+
+        # asking for an algorithm the index lacks downloads again
+        cfile, digests = camera.download(DCIM, 'IMG_0001.JPG',
+                                         digests=('sha256', 'md5'),
+                                         index=index)
+        assert cfile is not None
+        assert digests['sha256'] == first['sha256']
@@ -0,0 +1,76 @@
+import os
+import re
+
+from shutter.discovery import CACHE_MAGIC
+from shutter.discovery import AbilitiesIndex
+from shutter.discovery import discover
+from shutter.simulator import SimulatedCamera
+
+
+def cameras():
+    return [SimulatedCamera('Canon EOS 5D', port='usb:001,004'),
+            SimulatedCamera('Nikon D850', port='usb:002,007')]
+
+
+def test_discover(simulate):
+    sim = simulate(*cameras())
+    found = discover()
+    assert [(info.model, info.path) for info in found] == [
+        ('Canon EOS 5D', 'usb:001,004'), ('Nikon D850', 'usb:002,007')]
+    assert sim.calls['gp_camera_autodetect'] == 1
+    assert found[0].abilities.model == b'Canon EOS 5D'
+
+    camera = found[1].open()
+    try:
+        assert camera.capture_image()
+    finally:
+        camera.close()
+
+
+def test_discover_regex(simulate):
+    simulate(*cameras())
+    assert [info.model for info in discover(re.compile('nikon'))] == [
+        'Nikon D850']
+    assert discover(re.compile('sony')) == []
+
+
+def test_index_loaded_once(simulate):
+    sim = simulate(*cameras(), driver_models=50)
+    index = AbilitiesIndex.get()
+    assert AbilitiesIndex.get() is index
+    assert len(index) == 52
+    assert 'Nikon D850' in index
+    assert index.lookup_model('Simulated Driver 7') is not None
+    assert index.lookup_model('Polaroid') is None
+    discover()
+    discover()
+    assert sim.calls['gp_abilities_list_load'] == 1
+
+
+def test_index_cache_dir(simulate, tmpdir):
+    cache_dir = os.path.join(str(tmpdir), 'cache')
+    sim = simulate(*cameras(), driver_models=10)
+    first = AbilitiesIndex(cache_dir)
+    files = os.listdir(cache_dir)
+    assert len(files) == 1
+    assert sim.calls['gp_abilities_list_load'] == 1
+
+    # another process would find the database on disk
+    second = AbilitiesIndex(cache_dir)
+    assert sim.calls['gp_abilities_list_load'] == 1
+    assert second.models() == first.models()
+    assert second.lookup_model('Canon EOS 5D').to_bytes() == \
+        first.lookup_model('Canon EOS 5D').to_bytes()
+
+
+def test_index_bad_cache_ignored(simulate, tmpdir):
+    simulate(*cameras())
+    AbilitiesIndex(str(tmpdir))
+    path = os.path.join(str(tmpdir), os.listdir(str(tmpdir))[0])
+    with open(path, 'wb') as fp:
+        fp.write(CACHE_MAGIC + b'truncated')
+    index = AbilitiesIndex(str(tmpdir))
+    assert 'Canon EOS 5D' in index
+    # rebuilt from the library, and written out again
+    with open(path, 'rb') as fp:
+        assert len(fp.read()) > len(CACHE_MAGIC + b'truncated')
@@ -0,0 +1,71 @@
+import os
+
+import pytest
+
+import shutter
+from shutter.farm import CaptureFarm
+from shutter.shutter import GP_ERROR
+from shutter.shutter import GP_ERROR_TIMEOUT
+from shutter.shutter import ShutterError
+from shutter.simulator import SimulatedCamera
+from shutter.simulator import SimulatedLibrary
+
+PATHS = ['usb:001,001', 'usb:001,002']
+IMAGE_SIZE = 256 * 1024
+
+
+def load_cameras():
+    """ Loader run in each worker process
+    """
+    cameras = [SimulatedCamera('Sim %d' % i, port=path,
+                               image_size=IMAGE_SIZE)
+               for i, path in enumerate(PATHS)]
+    hang = float(os.environ.get('SHUTTER_TEST_HANG', '0'))
+    shutter.load(backend=SimulatedLibrary(
+        cameras, latency={'gp_camera_capture': hang}))
+
+
+def make_farm(**kwargs):
+    return CaptureFarm(PATHS, loader=load_cameras, slot_size=1024 * 1024,
+                       slots=2, start_timeout=30.0, **kwargs)
+
+
+def test_capture_all():
+    with make_farm() as farm:
+        frames = farm.capture_all()
+        assert sorted(frames) == PATHS
+        for frame in frames.values():
+            with frame:
+                assert len(frame) == IMAGE_SIZE
+
+
+def test_worker_crash_restarts():
+    with make_farm() as farm:
+        path = PATHS[0]
+        farm._worker(path).process.kill()
+        farm._worker(path).process.join()
+        with farm.capture_image(path) as frame:
+            assert len(frame) == IMAGE_SIZE
+        assert farm.restarts == 1
+
+
+def test_bad_request_keeps_worker():
+    with make_farm() as farm:
+        path = PATHS[0]
+        with pytest.raises(ShutterError) as info:
+            farm._worker(path).call('bogus', path)
+        assert info.value.result == GP_ERROR
+        with pytest.raises(ShutterError):
+            farm.download(path, '/nowhere', 'nothing.jpg')
+        with farm.capture_image(path) as frame:
+            assert len(frame) == IMAGE_SIZE
+        assert farm.restarts == 0
+
+
+def test_hung_worker_restarts(monkeypatch):
+    monkeypatch.setenv('SHUTTER_TEST_HANG', '30')
+    with make_farm(timeout=1.0) as farm:
+        with pytest.raises(ShutterError) as info:
+            farm.capture_image(PATHS[0])
+        assert info.value.result == GP_ERROR_TIMEOUT
+        assert farm.restarts == 1
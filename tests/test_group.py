@@ -0,0 +1,65 @@
+import os
+import re
+
+import pytest
+
+from shutter.group import CameraGroup
+from shutter.shutter import GP_ERROR_IO
+from shutter.shutter import GP_ERROR_MODEL_NOT_FOUND
+from shutter.shutter import ShutterError
+from shutter.simulator import SimulatedCamera
+
+
+def cameras():
+    return [SimulatedCamera('Canon EOS 5D', image_size=1000),
+            SimulatedCamera('Canon EOS 6D', image_size=2000),
+            SimulatedCamera('Nikon D850', image_size=3000)]
+
+
+def test_trigger(simulate):
+    sim = simulate(*cameras())
+    with CameraGroup(re.compile('canon')) as group:
+        assert len(group) == 2
+        result = group.trigger(poll=10)
+    assert sim.calls['gp_camera_trigger_capture'] == 2
+    assert result.errors == dict()
+    assert 0 <= result.skew < 1
+    assert sorted(len(data) for shot in result.shots.values()
+                  for event, data in shot.files) == [1000, 2000]
+    offsets = sorted(shot.offset for shot in result.shots.values())
+    assert offsets[0] == 0
+
+
+def test_dest_dir(simulate, tmpdir):
+    simulate(*cameras())
+    dest_dir = str(tmpdir)
+    with CameraGroup(paths=['usb:001,003', 'usb:001,001']) as group:
+        result = group.trigger(poll=10, dest_dir=dest_dir)
+    assert sorted(os.listdir(dest_dir)) == ['00', '01']
+    shot = result.shots['usb:001,003']
+    assert shot.index == 0
+    (event, path), = shot.files
+    assert os.path.dirname(path) == os.path.join(dest_dir, '00')
+    assert os.path.getsize(path) == 3000
+
+
+def test_one_camera_fails(simulate):
+    sim = simulate(*cameras())
+    with CameraGroup() as group:
+        sim.fail('gp_camera_trigger_capture', GP_ERROR_IO)
+        result = group.trigger(poll=10)
+    errors = result.errors
+    assert len(errors) == 1
+    error, = errors.values()
+    assert error.result == GP_ERROR_IO
+    assert sum(len(shot.files) for shot in result.shots.values()) == 2
+
+
+def test_nothing_found(simulate):
+    simulate(*cameras())
+    with pytest.raises(ShutterError) as info:
+        CameraGroup(re.compile('sony'))
+    assert info.value.result == GP_ERROR_MODEL_NOT_FOUND
+    with pytest.raises(ShutterError) as info:
+        CameraGroup(paths=['usb:009,009'])
+    assert info.value.result == GP_ERROR_MODEL_NOT_FOUND
@@ -0,0 +1,91 @@
+import pytest
+
+from shutter import instrument
+from shutter.shutter import GP_ERROR_IO
+from shutter.shutter import CameraFile
+from shutter.shutter import ShutterError
+from shutter.shutter import gp
+from shutter.simulator import SimulatedCamera
+
+
+@pytest.fixture
+def recording():
+    instrument.reset()
+    yield instrument
+    instrument.disable()
+    instrument.reset()
+
+
+def test_off_until_enabled(simulate, recording):
+    sim = simulate(SimulatedCamera('Canon EOS 5D'))
+    camera = simulate.camera()
+    camera.capture_image()
+    assert not recording.enabled()
+    assert recording.snapshot()['functions'] == dict()
+    assert gp.gp_camera_capture.__func__ is sim.gp_camera_capture.__func__
+
+
+def test_snapshot(simulate, recording):
+    sim = simulate(SimulatedCamera('Canon EOS 5D'),
+                   latency={'gp_camera_capture': 0.01})
+    camera = simulate.camera()
+    recording.enable()
+    recording.name_camera(camera, 'usb:001,001')
+    for i in range(3):
+        camera.capture_image()
+    sim.fail('gp_camera_capture', GP_ERROR_IO)
+    with pytest.raises(ShutterError):
+        camera.capture_image()
+
+    stats = recording.snapshot()
+    capture = stats['functions']['gp_camera_capture']
+    assert capture['count'] == 4
+    assert capture['errors'] == {GP_ERROR_IO: 1}
+    assert 0.01 <= capture['p50'] <= capture['p95'] <= capture['max']
+    assert stats['cameras']['usb:001,001']['gp_camera_capture'] == capture
+    data = stats['functions']['CameraFile.get_data']
+    assert data['bytes'] == 3 * 1024 * 1024
+
+
+def test_disable(simulate, recording):
+    sim = simulate(SimulatedCamera('Canon EOS 5D'))
+    camera = simulate.camera()
+    get_data = CameraFile.get_data
+    recording.enable()
+    assert recording.enabled()
+    assert CameraFile.get_data is not get_data
+    camera.capture_image()
+    recording.disable()
+    assert CameraFile.get_data is get_data
+    assert gp.gp_camera_capture.__func__ is sim.gp_camera_capture.__func__
+
+    # recordings are kept until reset
+    camera.capture_image()
+    assert recording.snapshot()['functions']['gp_camera_capture'][
+        'count'] == 1
+    recording.reset()
+    assert recording.snapshot()['functions'] == dict()
+
+
+def test_tracer(simulate, recording):
+    simulate(SimulatedCamera('Canon EOS 5D'))
+    camera = simulate.camera()
+    spans = list()
+    recording.enable(spans.append)
+    camera.capture_image()
+    names = [span.function for span in spans]
+    assert 'gp_camera_capture' in names
+    span = spans[names.index('gp_camera_capture')]
+    assert span.result == 0
+    assert span.duration >= 0
+
+
+def test_percentile():
+    stats = instrument.CallStats()
+    assert stats.percentile(0.5) == 0.0
+    for i in range(99):
+        stats.add(0.001, 0, None)
+    stats.add(1.0, 0, None)
+    assert 0.001 <= stats.percentile(0.5) < 0.0013
+    assert stats.percentile(0.99) < 0.0013
+    assert stats.percentile(1.0) == 1.0
@@ -0,0 +1,95 @@
+import os
+import time
+
+from shutter.intervalometer import Intervalometer
+from shutter.shutter import GP_ERROR_CAMERA_BUSY
+from shutter.simulator import DCIM
+from shutter.simulator import SimulatedCamera
+from shutter.writer import DiskWriter
+
+
+class RepeatingCamera(SimulatedCamera):
+    """ Names every capture the same, like a camera with its counter reset
+    """
+
+    def capture(self):
+        self.captures = 0
+        return SimulatedCamera.capture(self)
+
+
+def test_schedule(simulate):
+    simulate(SimulatedCamera('Sim', image_size=4096))
+    lapse = Intervalometer(simulate.camera(), 0.05, count=5)
+    shots = lapse.run()
+    assert lapse.taken == 5
+    assert all(len(shot.files) == 1 for shot in shots)
+    assert lapse.stats()['interval'] >= 0.045
+
+
+def test_busy_camera_backs_off(simulate, tmpdir):
+    sim = simulate(SimulatedCamera('Sim', image_size=4096))
+    sim.fail('gp_camera_trigger_capture', GP_ERROR_CAMERA_BUSY, count=4)
+    dest_dir = os.path.join(str(tmpdir), 'night', 'one')
+    lapse = Intervalometer(simulate.camera(), 0.01, count=3,
+                           policy='extend', dest_dir=dest_dir, poll=20)
+    start = time.monotonic()
+    shots = lapse.run()
+
+    # every busy answer costs a poll interval, not a spin
+    assert time.monotonic() - start >= 4 * 0.02
+    assert sim.calls['gp_camera_trigger_capture'] == 3 + 4
+    assert lapse.taken == 3
+    for shot in shots:
+        (event, path), = shot.files
+        assert os.path.isfile(path)
+        assert os.path.dirname(path) == dest_dir
+        assert os.path.basename(path) == '%06d_%s' % (shot.index,
+                                                      event.name)
+
+
+def test_busy_camera_skips(simulate):
+    sim = simulate(SimulatedCamera('Sim', image_size=4096))
+    sim.fail('gp_camera_trigger_capture', GP_ERROR_CAMERA_BUSY, count=2)
+    lapse = Intervalometer(simulate.camera(), 0.05, count=4)
+    lapse.run()
+    assert lapse.taken + lapse.skipped == 4
+    assert lapse.skipped >= 1
+
+
+def test_repeated_names(simulate, tmpdir):
+    simulate(RepeatingCamera('Sim', image_size=4096))
+    dest_dir = str(tmpdir)
+    lapse = Intervalometer(simulate.camera(), 0.02, count=3,
+                           dest_dir=dest_dir)
+    lapse.run()
+    assert lapse.taken == 3
+    assert sorted(os.listdir(dest_dir)) == [
+        '000000_IMG_0001.JPG', '000001_IMG_0001.JPG', '000002_IMG_0001.JPG']
+
+
+def test_repeated_names_writer(simulate, tmpdir):
+    simulate(RepeatingCamera('Sim', image_size=4096))
+    dest_dir = str(tmpdir)
+    with DiskWriter() as writer:
+        lapse = Intervalometer(simulate.camera(), 0.02, count=3,
+                               dest_dir=dest_dir, writer=writer)
+        lapse.run()
+    assert len(os.listdir(dest_dir)) == 3
+
+
+def test_stray_files(simulate):
+    sim = simulate(SimulatedCamera('Sim', image_size=4096))
+    cam = sim.cameras[0]
+
+    def press_shutter(shot):
+        # a file added between shots, ie. from the shutter button
+        if shot.index == 0:
+            cam.events.append((time.time(), 'raw', (DCIM, 'IMG_9000.JPG')))
+
+    lapse = Intervalometer(simulate.camera(), 0.1, count=2,
+                           callback=press_shutter)
+    shots = lapse.run()
+    assert lapse.stats()['stray'] == 1
+    assert lapse.stray[0].name == 'IMG_9000.JPG'
+    assert [event.name for shot in shots for event, data in shot.files] == [
+        'IMG_0001.JPG', 'IMG_0002.JPG']
@@ -0,0 +1,61 @@
+import time
+
+import pytest
+
+from shutter.liveview import LiveView
+from shutter.shutter import GP_ERROR_IO
+from shutter.shutter import ShutterError
+from shutter.simulator import SimulatedCamera
+
+
+@pytest.fixture(params=[False, True], ids=['unthreaded', 'threaded'])
+def threaded(request):
+    return request.param
+
+
+def test_frames(simulate, threaded):
+    simulate(SimulatedCamera('Sim', preview_size=1000))
+    numbers = list()
+    with LiveView(simulate.camera(), threaded=threaded) as live:
+        for frame in live:
+            assert len(frame) == 1000
+            numbers.append(frame.number)
+            if len(numbers) == 5:
+                live.stop()
+    assert numbers == sorted(numbers)
+    assert len(numbers) == 5
+
+
+def test_capture_error_is_raised(simulate, threaded):
+    sim = simulate(SimulatedCamera('Sim'))
+    live = LiveView(simulate.camera(), threaded=threaded)
+    frames = 0
+    with pytest.raises(ShutterError) as info:
+        with live:
+            for frame in live:
+                frames += 1
+                if frames == 3:
+                    sim.fail('gp_camera_capture_preview', GP_ERROR_IO)
+                assert frames < 50
+    assert info.value.result == GP_ERROR_IO
+
+
+def test_error_before_first_frame(simulate):
+    sim = simulate(SimulatedCamera('Sim'))
+    sim.fail('gp_camera_capture_preview', GP_ERROR_IO)
+    with LiveView(simulate.camera()) as live:
+        with pytest.raises(ShutterError):
+            next(live)
+
+
+def test_threaded_drops_when_behind(simulate):
+    simulate(SimulatedCamera('Sim'), latency={
+        'gp_camera_capture_preview': 0.002})
+    with LiveView(simulate.camera(), buffer_size=1) as live:
+        first = live.get(5)
+        # the consumer falls behind the camera
+        while live.captured < first.number + 10:
+            time.sleep(0.005)
+        second = live.get(5)
+    assert second.number > first.number + 1
+    assert live.dropped > 0
@@ -0,0 +1,46 @@
+import subprocess
+import sys
+import threading
+import time
+
+from shutter import shutter as core
+from shutter.simulator import SimulatedCamera
+from shutter.simulator import SimulatedLibrary
+
+
+def test_import_does_not_load():
+    code = ('import shutter, sys\n'
+            'from shutter import shutter as core\n'
+            'assert not core.gp.loaded\n'
+            'assert "numpy" not in sys.modules\n')
+    subprocess.check_call([sys.executable, '-c', code])
+
+
+def test_first_calls_load_once(simulate, monkeypatch):
+    sim = SimulatedLibrary([SimulatedCamera('Sim')])
+    loads = list()
+    real_load = core.load
+
+    def slow_load(path=None, backend=None):
+        loads.append(threading.current_thread())
+        time.sleep(0.05)
+        real_load(backend=sim)
+
+    # as if nothing had been loaded yet
+    core.gp.reset(None)
+    monkeypatch.setattr(core, 'load', slow_load)
+    start = threading.Barrier(8)
+    results = list()
+
+    def first_call():
+        start.wait()
+        results.append(core.gp.gp_result_as_string(-6))
+
+    threads = [threading.Thread(target=first_call) for i in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(loads) == 1
+    assert len(results) == 8
+    assert core.gp._dll is sim
@@ -0,0 +1,59 @@
+import threading
+import time
+
+import pytest
+
+from shutter.operation import CancelToken
+from shutter.shutter import GP_ERROR_CANCEL
+from shutter.shutter import GP_ERROR_TIMEOUT
+from shutter.shutter import ShutterError
+from shutter.simulator import SimulatedCamera
+
+FOLDER = '/store_00010001/DCIM/100SIMUL'
+SIZE = 4 * 1024 * 1024
+
+
+@pytest.fixture
+def camera(simulate):
+    # four seconds a file
+    simulate(SimulatedCamera('Sim', files={FOLDER: {'MVI_0001.MOV': SIZE}}),
+             transfer_rate=SIZE / 4.0)
+    return simulate.camera()
+
+
+def test_deadline_times_out(camera):
+    start = time.monotonic()
+    with pytest.raises(ShutterError) as info:
+        with camera.operation(timeout=0.2):
+            camera.download(FOLDER, 'MVI_0001.MOV')
+    assert info.value.result == GP_ERROR_TIMEOUT
+    assert time.monotonic() - start < 2.0
+
+    # the shared context is back in use, without a deadline
+    camera.capture_preview()
+
+
+def test_token_cancels(camera):
+    token = CancelToken()
+    threading.Timer(0.2, token.cancel).start()
+    with pytest.raises(ShutterError) as info:
+        with camera.operation(token=token):
+            camera.download(FOLDER, 'MVI_0001.MOV')
+    assert info.value.result == GP_ERROR_CANCEL
+
+
+def test_progress_error_cancels(camera):
+    seen = list()
+
+    def progress(current, total, rate):
+        seen.append((current, total))
+        if current >= total / 4:
+            raise ValueError(current)
+
+    start = time.monotonic()
+    with pytest.raises(ValueError):
+        with camera.operation(progress=progress):
+            camera.download(FOLDER, 'MVI_0001.MOV')
+    assert time.monotonic() - start < 3.0
+    assert seen[0][1] == SIZE
+    assert all(current <= total for current, total in seen)
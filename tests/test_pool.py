@@ -0,0 +1,106 @@
+import threading
+import time
+
+import pytest
+
+from shutter import ShutterError
+from shutter.pool import CameraPool
+from shutter.shutter import GP_ERROR_IO
+from shutter.shutter import GP_ERROR_TIMEOUT
+from shutter.shutter import get_context
+from shutter.simulator import SimulatedCamera
+
+
+def cameras():
+    return [SimulatedCamera('Canon EOS 5D', port='usb:001,004'),
+            SimulatedCamera('Nikon D850', port='usb:002,007')]
+
+
+def contexts(sim):
+    return sum(1 for obj in list(sim._objects.values())
+               if isinstance(obj, dict) and 'camera' not in obj)
+
+
+def test_reuse(simulate):
+    sim = simulate(*cameras())
+    with CameraPool() as pool:
+        with pool.lease('usb:002,007') as camera:
+            assert camera.capture_image()
+        with pool.lease('usb:002,007') as camera:
+            assert camera.capture_image()
+        assert sim.calls['gp_camera_init'] == 1
+        assert (pool.opened, pool.reused) == (1, 1)
+
+
+def test_any_lends_free_camera(simulate):
+    simulate(*cameras())
+    with CameraPool() as pool:
+        first = pool.lease()
+        second = pool.lease()
+        assert {first.path, second.path} == {'usb:001,004', 'usb:002,007'}
+        first.release()
+        second.release()
+
+
+def test_reconnect_after_broken_lease(simulate):
+    sim = simulate(*cameras())
+    with CameraPool(backoff=0) as pool:
+        with pytest.raises(ShutterError):
+            with pool.lease('usb:001,004') as camera:
+                sim.fail('gp_camera_capture', GP_ERROR_IO)
+                camera.capture_image()
+        with pool.lease('usb:001,004') as camera:
+            assert camera.capture_image()
+        assert sim.calls['gp_camera_init'] == 2
+        assert pool.reconnects == 1
+
+
+def test_contexts_freed(simulate):
+    sim = simulate(*cameras())
+    get_context()
+    before = contexts(sim)
+    pool = CameraPool(backoff=0)
+    for path in ('usb:001,004', 'usb:002,007'):
+        pool.lease(path).release()
+    assert contexts(sim) == before + 2
+
+    # a broken session frees its context before opening again
+    pool.lease('usb:001,004').release(broken=True)
+    assert contexts(sim) == before + 1
+    pool.lease('usb:001,004').release()
+    assert contexts(sim) == before + 2
+
+    # one that failed to open doesn't keep one either
+    sim.fail('gp_camera_init', GP_ERROR_IO, count=None)
+    pool.lease('usb:001,004').release(broken=True)
+    pool.retries = 2
+    with pytest.raises(ShutterError):
+        pool.lease('usb:001,004')
+    sim.fail('gp_camera_init', count=0)
+
+    pool.close()
+    assert contexts(sim) == before
+
+
+def test_timeout_while_rescanning(simulate):
+    sim = simulate(SimulatedCamera('Canon EOS 5D'))
+    with CameraPool(rescan_interval=0) as pool:
+        lease = pool.lease()
+        start = time.monotonic()
+        with pytest.raises(ShutterError) as info:
+            pool.lease(timeout=0.2)
+        assert info.value.result == GP_ERROR_TIMEOUT
+        assert time.monotonic() - start < 2
+        assert sim.calls['gp_camera_autodetect'] > 1
+        lease.release()
+
+
+def test_waits_for_release(simulate):
+    simulate(SimulatedCamera('Canon EOS 5D'))
+    with CameraPool(rescan_interval=60) as pool:
+        lease = pool.lease()
+        timer = threading.Timer(0.1, lease.release)
+        timer.start()
+        with pool.lease(timeout=5) as camera:
+            assert camera.capture_image()
+        timer.join()
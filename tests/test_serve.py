@@ -0,0 +1,52 @@
+import socket
+import time
+
+from urllib.request import urlopen
+
+import pytest
+
+from shutter.serve import PreviewServer
+from shutter.simulator import SimulatedCamera
+
+JPEG = b'\xff\xd8simulated frame\xff\xd9'
+
+
+@pytest.fixture
+def server(simulate):
+    simulate(SimulatedCamera('Sim', preview_data=JPEG))
+    with PreviewServer({'sim': simulate.camera()}, timeout=5.0,
+                       client_timeout=0.5) as server:
+        yield server
+
+
+def test_still(server):
+    for i in range(3):
+        assert urlopen(server.url('sim', 'jpg'), timeout=5).read() == JPEG
+    stats = server.stats()['sim']
+    assert stats['sent'] == 3
+    assert stats['dropped'] == 0
+
+
+def test_stream(server):
+    response = urlopen(server.url('sim'), timeout=5)
+    assert response.headers['Content-Type'].startswith(
+        'multipart/x-mixed-replace')
+    frames = 0
+    while frames < 5:
+        line = response.readline()
+        if line.startswith(b'Content-Length:'):
+            response.readline()
+            assert response.read(int(line.split()[1])) == JPEG
+            frames += 1
+    response.close()
+    assert server.stats()['sim']['sent'] >= 5
+
+
+def test_idle_client_dropped(server):
+    client = socket.create_connection(server.address, timeout=5)
+    start = time.monotonic()
+    # no request is sent; the server gives up on the connection
+    assert client.recv(1024) == b''
+    assert time.monotonic() - start < 3.0
+    client.close()
+    assert urlopen(server.url('sim', 'jpg'), timeout=5).read() == JPEG
@@ -0,0 +1,88 @@
+import os
+
+import pytest
+
+from shutter.shutter import GP_ERROR_IO
+from shutter.shutter import ShutterError
+from shutter.simulator import SimulatedCamera
+from shutter.sync import PART_SUFFIX
+
+FOLDER = '/store_00010001/DCIM/100SIMUL'
+SIZE = 300 * 1024
+CHUNK = 64 * 1024
+
+
+def card():
+    return SimulatedCamera('Sim', files={FOLDER: {
+        'IMG_0001.JPG': SIZE, 'IMG_0002.JPG': SIZE}})
+
+
+def local_dir(dest_dir):
+    return os.path.join(dest_dir, *FOLDER.strip('/').split('/'))
+
+
+def parts(dest_dir):
+    return [name for name in os.listdir(local_dir(dest_dir))
+            if name.endswith(PART_SUFFIX)]
+
+
+def test_sync_skips_current(simulate, tmpdir):
+    simulate(card())
+    camera = simulate.camera()
+    first = camera.sync(str(tmpdir))
+    assert len(first.downloaded) == 2
+    assert first.bytes == 2 * SIZE
+
+    again = camera.sync(str(tmpdir))
+    assert not again.downloaded
+    assert len(again.skipped) == 2
+
+
+def test_sync_resumes_part_file(simulate, tmpdir):
+    sim = simulate(card())
+    camera = simulate.camera()
+
+    def interrupt(path, done, total):
+        # the read after the second chunk fails, as if unplugged
+        if done == 2 * CHUNK:
+            sim.fail('gp_camera_file_read', GP_ERROR_IO)
+
+    with pytest.raises(ShutterError):
+        camera.sync(str(tmpdir), chunk_size=CHUNK, progress=interrupt)
+    assert parts(str(tmpdir)) == ['IMG_0001.JPG' + PART_SUFFIX]
+    part = os.path.join(local_dir(str(tmpdir)), parts(str(tmpdir))[0])
+    assert os.path.getsize(part) == 2 * CHUNK
+    size, mtime = sim.cameras[0].folders[FOLDER]['IMG_0001.JPG']
+    assert int(os.path.getmtime(part)) == mtime
+
+    result = camera.sync(str(tmpdir), chunk_size=CHUNK)
+    assert not parts(str(tmpdir))
+    # only the rest of the interrupted file was read again
+    assert result.bytes == 2 * SIZE - 2 * CHUNK
+    local = local_dir(str(tmpdir))
+    for name in ('IMG_0001.JPG', 'IMG_0002.JPG'):
+        with open(os.path.join(local, name), 'rb') as fp:
+            assert fp.read() == camera.download(FOLDER, name).get_data()
+
+
+@pytest.mark.parametrize('stale', ['mtime', 'size'])
+def test_sync_ignores_stale_part_file(simulate, tmpdir, stale):
+    cam = card()
+    simulate(cam)
+    camera = simulate.camera()
+    size, mtime = cam.folders[FOLDER]['IMG_0001.JPG']
+    os.makedirs(local_dir(str(tmpdir)))
+    part = os.path.join(local_dir(str(tmpdir)),
+                        'IMG_0001.JPG' + PART_SUFFIX)
+    with open(part, 'wb') as fp:
+        fp.write(b'x' * (1000 if stale == 'mtime' else SIZE + 1))
+    # left by a download of a file that has since been replaced
+    os.utime(part, (mtime - 100, mtime - 100) if stale == 'mtime'
+             else (mtime, mtime))
+
+    result = camera.sync(str(tmpdir), chunk_size=CHUNK)
+    assert result.bytes == 2 * SIZE
+    with open(os.path.join(local_dir(str(tmpdir)), 'IMG_0001.JPG'),
+              'rb') as fp:
+        assert fp.read() == camera.download(FOLDER,
+                                            'IMG_0001.JPG').get_data()
@@ -0,0 +1,79 @@
+import pytest
+
+from shutter.cache import LRUCache
+from shutter.simulator import SimulatedCamera
+
+FOLDER = '/store_00010001/DCIM/100SIMUL'
+NAMES = ['IMG_%04d.JPG' % i for i in range(1, 6)]
+
+
+@pytest.fixture
+def camera(simulate):
+    simulate.sim = simulate(SimulatedCamera(
+        'Sim', thumbnail_size=2000,
+        files={FOLDER: dict((name, 100000) for name in NAMES)}))
+    return simulate.camera()
+
+
+def test_kinds(camera):
+    assert camera.supports('preview')
+    assert camera.supports('exif')
+    assert len(camera.download(FOLDER, NAMES[0], 'preview').get_data()) == \
+        2000
+    exif = camera.download(FOLDER, NAMES[0], 'exif').get_data()
+    assert 0 < len(exif) <= 4096
+    with pytest.raises(ValueError):
+        camera.download(FOLDER, NAMES[0], 'sketch')
+
+
+def test_thumbnails_cached(camera, simulate):
+    sim = simulate.sim
+    first = dict(camera.thumbnails(FOLDER))
+    assert sorted(first) == NAMES
+    assert all(len(data) == 2000 for data in first.values())
+    assert sim.calls['gp_camera_file_get'] == 5
+
+    again = dict(camera.thumbnails(FOLDER))
+    assert again == first
+    assert sim.calls['gp_camera_file_get'] == 5
+    assert camera.thumbnail_cache.hits == 5
+
+
+def test_changed_file_fetched_again(camera, simulate):
+    sim = simulate.sim
+    list(camera.thumbnails(FOLDER, names=NAMES[:2]))
+    # the file is replaced, so its modification time changes
+    size, mtime = sim.cameras[0].folders[FOLDER][NAMES[0]]
+    sim.cameras[0].folders[FOLDER][NAMES[0]] = size, mtime + 60
+    list(camera.thumbnails(FOLDER, names=NAMES[:2]))
+    assert sim.calls['gp_camera_file_get'] == 3
+
+
+def test_own_cache(camera):
+    cache = LRUCache(4000)
+    list(camera.thumbnails(FOLDER, cache=cache))
+    # only two 2000 byte thumbnails fit
+    assert len(cache) == 2
+    assert cache.size == 4000
+
+
+def test_lru_cache_evicts_least_recent():
+    cache = LRUCache(10)
+    cache.put('a', b'aaaa', 4)
+    cache.put('b', b'bbbb', 4)
+    assert cache.get('a') == b'aaaa'
+    cache.put('c', b'cccc', 4)
+    assert 'b' not in cache
+    assert 'a' in cache and 'c' in cache
+    assert cache.size == 8
+
+    cache.put('big', b'x' * 11, 11)
+    assert 'big' not in cache
+    cache.put('a', b'aa', 2)
+    assert cache.size == 6
+    cache.discard('c')
+    assert cache.size == 2
+    assert cache.get('c', 'missing') == 'missing'
+    assert (cache.hits, cache.misses) == (1, 1)
+    cache.clear()
+    assert len(cache) == 0 and cache.size == 0
@@ -0,0 +1,79 @@
+import threading
+
+import pytest
+
+from shutter.shutter import get_context
+from shutter.simulator import SimulatedCamera
+from shutter.worker import CameraWorker
+
+
+def test_jobs_run_in_order_on_one_thread(simulate):
+    simulate(SimulatedCamera('Sim', image_size=4096))
+    with CameraWorker() as worker:
+        threads = list()
+
+        def job(camera, i):
+            threads.append(threading.current_thread())
+            return i
+
+        futures = [worker.submit(job, i) for i in range(20)]
+        assert [f.result(5) for f in futures] == list(range(20))
+        assert len(set(threads)) == 1
+        assert threads[0] is not threading.current_thread()
+        assert len(worker.capture_image().result(5)) == 4096
+
+
+def test_job_error_reaches_future(simulate):
+    simulate(SimulatedCamera('Sim'))
+    with CameraWorker() as worker:
+        def fail(camera):
+            raise KeyError('boom')
+
+        with pytest.raises(KeyError):
+            worker.submit(fail).result(5)
+        # the worker carries on
+        assert worker.capture_preview().result(5)
+
+
+def test_submit_after_close(simulate):
+    simulate(SimulatedCamera('Sim'))
+    worker = CameraWorker()
+    worker.close()
+    with pytest.raises(RuntimeError):
+        worker.capture_image()
+
+
+def test_submit_racing_close(simulate):
+    simulate(SimulatedCamera('Sim'))
+    worker = CameraWorker()
+    futures = list()
+    start = threading.Barrier(5)
+
+    def submitter():
+        start.wait()
+        for i in range(200):
+            try:
+                futures.append(worker.submit(lambda camera: None))
+            except RuntimeError:
+                return
+
+    threads = [threading.Thread(target=submitter) for i in range(4)]
+    for thread in threads:
+        thread.start()
+    start.wait()
+    worker.close()
+    for thread in threads:
+        thread.join()
+    # every accepted job ran; none is left waiting
+    for future in futures:
+        assert future.result(5) is None
+
+
+def test_context_freed(simulate):
+    sim = simulate(SimulatedCamera('Sim'))
+    get_context()
+    before = len(sim._objects)
+    for i in range(3):
+        with CameraWorker() as worker:
+            worker.capture_preview().result(5)
+    assert len(sim._objects) == before
@@ -0,0 +1,88 @@
+import os
+import queue
+import threading
+
+import pytest
+
+from shutter.simulator import SimulatedCamera
+from shutter.writer import DiskWriter
+
+
+def test_write(tmpdir):
+    paths = [os.path.join(str(tmpdir), '%d.jpg' % i) for i in range(20)]
+    with DiskWriter(batch=4) as writer:
+        futures = [writer.write(path, b'x' * i)
+                   for i, path in enumerate(paths)]
+    assert [future.result() for future in futures] == paths
+    assert sorted(os.listdir(str(tmpdir))) == sorted(
+        os.path.basename(path) for path in paths)
+    assert os.path.getsize(paths[7]) == 7
+    stats = writer.stats()
+    assert (stats['written'], stats['bytes'], stats['errors']) == (
+        20, sum(range(20)), 0)
+    assert stats['latency']['count'] == 20
+
+
+def test_capture(simulate, tmpdir):
+    simulate(SimulatedCamera('Canon EOS 5D', image_size=5000))
+    camera = simulate.camera()
+    path = os.path.join(str(tmpdir), 'a.jpg')
+    with DiskWriter() as writer:
+        camera.capture_image(path, writer=writer)
+    assert os.path.getsize(path) == 5000
+
+
+def test_error(tmpdir):
+    writer = DiskWriter()
+    good = writer.write(os.path.join(str(tmpdir), 'a'), b'a')
+    bad = writer.write(os.path.join(str(tmpdir), 'missing', 'b'), b'b')
+    with pytest.raises(OSError):
+        writer.flush()
+    assert good.result()
+    assert isinstance(bad.exception(), OSError)
+    # reported once
+    writer.flush()
+    writer.close()
+    assert os.listdir(str(tmpdir)) == ['a']
+
+
+def test_full():
+    writer = DiskWriter(threads=0, depth=1)
+    writer.write('unused', b'')
+    with pytest.raises(queue.Full):
+        writer.write('unused', b'', timeout=0.05)
+    writer.close(wait=False)
+
+
+def test_closed(tmpdir):
+    writer = DiskWriter()
+    writer.close()
+    with pytest.raises(RuntimeError):
+        writer.write(os.path.join(str(tmpdir), 'a'), b'a')
+
+
+def test_close_while_writing(tmpdir):
+    # every write that was queued is written; none is left behind a stop
+    writer = DiskWriter(depth=2)
+    futures = list()
+    refused = list()
+
+    def write(n):
+        for i in range(200):
+            try:
+                futures.append(writer.write(
+                    os.path.join(str(tmpdir), '%d-%d' % (n, i)), b'x'))
+            except RuntimeError:
+                refused.append(i)
+                return
+
+    threads = [threading.Thread(target=write, args=(n,)) for n in range(4)]
+    for thread in threads:
+        thread.start()
+    writer.close()
+    for thread in threads:
+        thread.join()
+    for future in futures:
+        assert future.result(timeout=1)
+    assert writer.depth == 0
+    assert len(os.listdir(str(tmpdir))) == len(futures)